@@ -0,0 +1,228 @@
+"""Undo and redo for changes made through MainApp.
+
+Every change is an action that records just what it needs to revert itself when it is applied:
+the previous date and count of a practice, the previous type of a session, the Session record a
+delete removed. Undoing applies that small inverse to the library, which records it with the
+storage backend like any other change, so nothing is ever restored from a copy of the whole data.
+A reset keeps the dict it swapped out (the records themselves, not a copy); the SQLite backend sets
+its rows aside in the database.
+"""
+from collections import deque
+
+
+class PracticeSession:
+
+    def __init__(self, name, duration=0, today=None):
+        """Log a practice today (see SessionLibrary.practice)."""
+        self.name = name
+        self.duration = duration
+        self.today = today
+        self.before = None  # (last practice ordinal, practice count) before the practice
+
+    @property
+    def description(self):
+        return f"practice of '{self.name}'"
+
+    def apply(self, library):
+        session = library.sessions.get(self.name)
+        if session is None:
+            return False
+        self.before = (session.last_practiced, session.practice_count)
+        library.practice(self.name, self.duration, self.today)
+        self.today = session.last_practiced_date  # Redo logs the same day, whenever it runs
+        return True
+
+    def revert(self, library):
+        library.unpractice(self.name, self.today.toordinal(), *self.before)
+
+
+class EditLastPracticed:
+
+    def __init__(self, name, selected_date):
+        """Change the last practice date (see SessionLibrary.set_last_practiced)."""
+        self.name = name
+        self.selected_date = selected_date
+        self.before = None  # Last practice ordinal before the edit
+        self.moved_from = None  # Day of the logged practice the edit moved, if there was one
+
+    @property
+    def description(self):
+        return f"date change of '{self.name}'"
+
+    def apply(self, library):
+        session = library.sessions.get(self.name)
+        if session is None:
+            return False
+        self.before = session.last_practiced
+        self.moved_from = session.history.days[-1] if session.history else None
+        library.set_last_practiced(self.name, self.selected_date)
+        return True
+
+    def revert(self, library):
+        library.revert_last_practiced(self.name, self.before, self.selected_date.toordinal(), self.moved_from)
+
+
+class ChangeSessionType:
+
+    def __init__(self, name, session_type):
+        """Change the color of a session (see SessionLibrary.set_session_type)."""
+        self.name = name
+        self.session_type = session_type
+        self.before = None
+
+    @property
+    def description(self):
+        return f"type change of '{self.name}'"
+
+    def apply(self, library):
+        session = library.sessions.get(self.name)
+        if session is None or session.session_type == self.session_type:
+            return False
+        self.before = session.session_type
+        library.set_session_type(self.name, self.session_type)
+        return True
+
+    def revert(self, library):
+        library.set_session_type(self.name, self.before)
+
+
+class SetTags:
+
+    def __init__(self, name, tags):
+        """Replace the tags of a session (see SessionLibrary.set_tags)."""
+        self.name = name
+        self.tags = tags
+        self.before = None
+
+    @property
+    def description(self):
+        return f"tag change of '{self.name}'"
+
+    def apply(self, library):
+        session = library.sessions.get(self.name)
+        if session is None or session.tags == self.tags:
+            return False
+        self.before = session.tags
+        library.set_tags(self.name, self.tags)
+        return True
+
+    def revert(self, library):
+        library.set_tags(self.name, self.before)
+
+
+class ToggleFavorite:
+
+    def __init__(self, name):
+        """Flip the favorite flag of a session; its own inverse."""
+        self.name = name
+
+    @property
+    def description(self):
+        return f"favorite toggle of '{self.name}'"
+
+    def apply(self, library):
+        return library.toggle_favorite(self.name) is not None
+
+    def revert(self, library):
+        library.toggle_favorite(self.name)
+
+
+class AddSession:
+
+    def __init__(self, name, last_practiced=None, practice_count=0, is_favorite=False, session_type=0):
+        """Add a session, or replace the one with the same name (see SessionLibrary.add)."""
+        self.name = name
+        self.fields = (last_practiced, practice_count, is_favorite, session_type)
+        self.replaced = None  # Session record the add replaced
+
+    @property
+    def description(self):
+        return f"addition of '{self.name}'"
+
+    def apply(self, library):
+        self.replaced = library.sessions.get(self.name)
+        library.add(self.name, *self.fields)
+        return True
+
+    def revert(self, library):
+        if self.replaced is None:
+            library.delete(self.name)
+        else:
+            library.put(self.replaced)
+
+
+class DeleteSession:
+
+    def __init__(self, name, position=None):
+        """Delete a session; position is where its row was, so undo can put the row back in place."""
+        self.name = name
+        self.position = position
+        self.removed = None  # The deleted Session record, history included
+
+    @property
+    def description(self):
+        return f"deletion of '{self.name}'"
+
+    def apply(self, library):
+        self.removed = library.delete(self.name)
+        return self.removed is not None
+
+    def revert(self, library):
+        library.put(self.removed)
+
+
+class ResetSessions:
+    name = None  # Affects every session
+    description = "reset"
+
+    def __init__(self):
+        """Remove every session."""
+        self.removed = None  # The dict reset() swapped out (None when paged: the database keeps the rows)
+
+    def apply(self, library):
+        self.removed = library.reset()
+        return True
+
+    def revert(self, library):
+        library.restore_all(self.removed)
+        self.removed = None
+
+
+class ActionLog:
+
+    def __init__(self, library, limit=100):
+        """Bounded undo and redo stacks of the actions applied to a SessionLibrary."""
+        self.library = library
+        self.undo_stack = deque(maxlen=limit)  # The oldest action is forgotten beyond the limit
+        self.redo_stack = []
+
+    def do(self, action):
+        """Apply an action and log it for undo. Returns False, logging nothing, if it changed nothing."""
+        if not action.apply(self.library):
+            return False
+        self.undo_stack.append(action)
+        self.redo_stack.clear()  # A new change ends the redo history
+        return True
+
+    def undo(self):
+        """Revert the latest action. Returns it (the caller updates the rows it touched), or None."""
+        if not self.undo_stack:
+            return None
+        action = self.undo_stack.pop()
+        action.revert(self.library)
+        self.redo_stack.append(action)
+        return action
+
+    def redo(self):
+        """Apply the latest undone action again. Returns it, or None."""
+        if not self.redo_stack:
+            return None
+        action = self.redo_stack.pop()
+        action.apply(self.library)
+        self.undo_stack.append(action)
+        return action
+
+    def clear(self):
+        """Forget every action, e.g. after a change that is not logged replaced the sessions under them."""
+        self.undo_stack.clear()
+        self.redo_stack.clear()
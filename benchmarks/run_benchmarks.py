@@ -0,0 +1,266 @@
+"""Headless benchmarks for the session model, persistence and sorting paths.
+
+Drives SessionLibrary (the data layer behind MainApp) without opening a window and reports wall
+time, bytes written by the storage backend and peak Python memory for each operation at several
+library sizes. Wall time is how long the calling (UI) thread is blocked; writes the JSON backend
+hands to its I/O thread are waited for outside the timed section. Results can be saved and compared so a regression shows up as a diff.
+The "paged" backend is the sqlite backend read a page at a time (PAGED_LOADING in main.py); orderings and
+searches are timed up to the first screenful of names, which is all the list reads up front.
+The "binary" backend loads the memory-mapped snapshot, decoding a session when it is first read.
+Of the four color filters only color_0 is timed: every color runs the same single pass over the
+alphabetical index (or the same two SQL queries), and the generated session types are uniform.
+
+The saved baseline.json has to be regenerated whenever an operation or a backend is added (and after
+a change that moves every number, such as taking writes off the UI thread); entries it lacks are
+reported as "not in baseline" rather than compared.
+
+    python benchmarks/run_benchmarks.py                                   # print the table
+    python benchmarks/run_benchmarks.py --save benchmarks/baseline.json   # keep the numbers
+    python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+os.environ.setdefault('KIVY_NO_FILELOG', '1')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from kivy.storage.jsonstore import JsonStore  # noqa: E402
+from practice_calendar import calendar_window  # noqa: E402
+from session_library import SessionLibrary  # noqa: E402
+
+SIZES = (10, 1000, 10000, 100000)
+BACKENDS = ('json', 'journal', 'sqlite', 'paged', 'binary')
+SORT_CRITERIA = ('alphabetical', 'practice_count', 'last_practice', 'favourites', 'color_0')
+SCREENFUL = 10  # Rows a phone shows at once
+TODAY = date(2026, 1, 1).toordinal()  # Fixed so generated data and results are reproducible
+
+
+def generate_sessions(count, seed=1):
+    """Build a stored-sessions dict shaped like sessions_data.json."""
+    rng = random.Random(seed)
+    sessions = {}
+    for i in range(count):
+        practice_count = rng.randrange(0, 60)
+        session = {
+            'last_practiced': None,
+            'practice_count': practice_count,
+            'is_favorite': rng.random() < 0.1,
+            'session_type': rng.randrange(4),
+        }
+        if practice_count:
+            days = sorted(TODAY - rng.randrange(365) for _ in range(min(practice_count, 8)))
+            session['last_practiced'] = date.fromordinal(days[-1]).strftime('%Y-%m-%d')
+            session['history'] = days
+        sessions[f"Session {i:06d}"] = session
+    return sessions
+
+
+class Workspace:
+    """A temporary working directory holding a seeded sessions_data.json and a loaded library."""
+
+    def __init__(self, backend, seed_path):
+        self.path = tempfile.mkdtemp(prefix='musapp-bench-')
+        shutil.copy(seed_path, os.path.join(self.path, 'sessions_data.json'))
+        self.previous = os.getcwd()
+        os.chdir(self.path)  # The journal and SQLite backends use paths relative to the app directory
+        self.library = SessionLibrary(JsonStore('sessions_data.json'), 'sqlite' if backend == 'paged' else backend,
+                                      paged=backend == 'paged')
+        self.library.load()
+        self.library.persistence.flush(wait=True)  # The binary backend converts the JSON file on its first load
+        self.names = list(self.library.sessions)
+
+    def bytes_written(self):
+        return getattr(self.library.persistence, 'bytes_written', None)
+
+    def wait(self):
+        """Let the writes queued so far reach the disk, without the extra flush the app makes when it pauses."""
+        persistence = self.library.persistence
+        worker = getattr(persistence, 'worker', None)
+        if worker is None:
+            persistence.flush(wait=True)
+        else:
+            persistence.flush()
+            worker.flush()
+
+    def close(self):
+        self.library.persistence.flush(wait=True)
+        close = getattr(self.library.persistence, 'close', None)
+        if close is not None:
+            close()
+        os.chdir(self.previous)
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def operations():
+    """(name, callable(workspace, run)) for every benchmarked path; `run` picks a distinct session."""
+    def load(ws, run):
+        ws.library.load()
+
+    def save(ws, run):
+        ws.library.persistence.flush(force=True)
+
+    def sort(criteria):
+        def op(ws, run):
+            ws.library.sort_indexes.reset(ws.library.sessions)  # Time the index build, not a cached read
+            ws.library.ordering(criteria)[:SCREENFUL]
+        return op
+
+    def up_next(ws, run):
+        ws.library.schedule.reset(ws.library.sessions)  # Time the heap build, not a cached read
+        ws.library.up_next(SCREENFUL)
+
+    def calendar(ws, run):
+        ws.library.calendar.clear()  # Time counting the whole year, not a cached read
+        ws.library.calendar.counts(*calendar_window(TODAY))
+
+    def calendar_recount(ws, run):
+        window = calendar_window(TODAY)
+        ws.library.calendar.counts(*window)  # Counted once; later runs only recount the day marked stale
+        ws.library.calendar.invalidate(ws.names[run % len(ws.names)], (TODAY,))
+        ws.library.calendar.counts(*window)
+
+    def search(ws, run):
+        ws.library.search(f"session {run:03d}")[:SCREENFUL]  # The first call also builds the name index
+
+    def practice(ws, run):
+        ws.library.practice(ws.names[run % len(ws.names)], 300, date.fromordinal(TODAY))
+        ws.library.persistence.flush()
+
+    def favorite(ws, run):
+        ws.library.toggle_favorite(ws.names[run % len(ws.names)])
+        ws.library.persistence.flush()  # Include the debounced write the app would make
+
+    def delete(ws, run):
+        ws.library.delete(ws.names[-1 - run % len(ws.names)])
+        ws.library.persistence.flush()
+
+    ops = [('load_data', load), ('save_data', save)]
+    ops += [(f'sort_{criteria}', sort(criteria)) for criteria in SORT_CRITERIA]
+    ops += [('up_next', up_next), ('calendar', calendar), ('calendar_recount', calendar_recount), ('search', search), ('update_session', practice), ('toggle_favorite', favorite), ('delete_session', delete)]
+    return ops
+
+
+def measure(backend, seed_path, operation, repeat):
+    """Median wall time, mean bytes written per call and peak traced memory of one operation."""
+    with contextlib.redirect_stdout(io.StringIO()):  # Keep the backends' MusApp- logging out of the table
+        return _measure(backend, seed_path, operation, repeat)
+
+
+def _measure(backend, seed_path, operation, repeat):
+    ws = Workspace(backend, seed_path)
+    try:
+        times = []
+        written = []
+        for run in range(repeat):
+            before = ws.bytes_written()
+            start = time.perf_counter()
+            operation(ws, run)
+            times.append(time.perf_counter() - start)
+            ws.wait()
+            if before is not None:
+                written.append(ws.bytes_written() - before)
+
+        # Memory is traced in a separate call; tracing slows everything down too much to time it
+        tracemalloc.start()
+        operation(ws, repeat)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        ws.close()
+
+    return {
+        'time_ms': round(statistics.median(times) * 1000, 3),
+        'bytes_written': int(statistics.mean(written)) if written else None,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run(backends, sizes, repeat):
+    results = {}
+    scratch = tempfile.mkdtemp(prefix='musapp-seed-')
+    try:
+        for size in sizes:
+            seed_path = os.path.join(scratch, f'sessions_{size}.json')
+            with open(seed_path, 'w', encoding='utf-8') as f:
+                json.dump({'sessions': {'data': generate_sessions(size)}}, f)
+            for backend in backends:
+                for name, operation in operations():
+                    result = measure(backend, seed_path, operation, repeat)
+                    results.setdefault(backend, {}).setdefault(str(size), {})[name] = result
+                    print_row(backend, size, name, result)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def print_row(backend, size, name, result):
+    written = '-' if result['bytes_written'] is None else f"{result['bytes_written']:,}"
+    print(f"{backend:8} {size:>7} {name:24} {result['time_ms']:11.3f} ms {written:>14} B "
+          f"{result['peak_kib']:12.1f} KiB", flush=True)
+
+
+def print_comparison(results, baseline, threshold):
+    """Show operations whose time moved by more than the threshold ratio, or whose bytes written changed."""
+    print(f"\nChanges against baseline (time > {threshold:.0%}, any change in bytes written):")
+    changed = False
+    for backend, sizes in results.items():
+        for size, ops in sizes.items():
+            for name, now in ops.items():
+                before = baseline.get(backend, {}).get(size, {}).get(name)
+                if before is None:
+                    changed = True
+                    print(f"  {backend:8} {size:>7} {name:24} not in baseline")
+                    continue
+                notes = []
+                if before['time_ms'] and abs(now['time_ms'] / before['time_ms'] - 1) > threshold:
+                    notes.append(f"time {before['time_ms']:.3f} -> {now['time_ms']:.3f} ms")
+                if now['bytes_written'] != before['bytes_written']:
+                    notes.append(f"bytes {before['bytes_written']} -> {now['bytes_written']}")
+                if notes:
+                    changed = True
+                    print(f"  {backend:8} {size:>7} {name:24} " + ', '.join(notes))
+    if not changed:
+        print("  none")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=BACKENDS + ('all',), default='json',
+                        help="storage backend to benchmark (default: json)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="library sizes to generate")
+    parser.add_argument('--repeat', type=int, default=3, help="timed calls per operation")
+    parser.add_argument('--save', metavar='FILE', help="write the results as JSON")
+    parser.add_argument('--compare', metavar='FILE', help="diff against saved JSON results")
+    parser.add_argument('--threshold', type=float, default=0.25, help="relative time change to report")
+    args = parser.parse_args()
+
+    backends = BACKENDS if args.backend == 'all' else (args.backend,)
+    print(f"{'backend':8} {'size':>7} {'operation':24} {'wall time':>14} {'bytes written':>16} {'peak memory':>16}")
+    results = run(backends, args.sizes, args.repeat)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(results, json.load(f), args.threshold)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print(f"\nSaved to {args.save}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,374 @@
+"""Binary session snapshot (sessions_data.bin): a fixed-size record per session, read through mmap.
+
+Layout, little-endian:
+
+    header      HEADER: magic, format version, record and practice counts, pool sizes and the
+                CRC-32 of everything after the header
+    records     RECORD per session, in display order
+    days        practice day ordinals (uint32) of every session, one run per session
+    durations   practice durations in seconds (uint32), parallel to days
+    names       string pool: UTF-8 session names in record order, NUL-separated
+    tags        string pool: each session's tags, space-separated, addressed from its record
+
+Opening a snapshot checks its size and checksum (zlib reads the mapped pages in C) and splits
+the name pool with one call. A record is only unpacked into a Session the first time the app
+asks for it, so startup decodes the first screen of rows and the list decodes the rest as it
+builds its rows. A snapshot failing its checks is rejected, and BinarySessionStore falls back
+to sessions_data.json, which it keeps as a copy written when the app is paused or closed.
+
+    python binary_snapshot.py sessions_data.json sessions_data.bin   # convert either way
+"""
+import json
+import mmap
+import os
+import sys
+import zlib
+from array import array
+from struct import Struct
+
+from instrumentation import tracer
+from practice_history import PracticeHistory
+from session_model import Session
+from session_store import SessionStore
+from tag_index import TagIndex
+
+MAGIC = b'MUSB'
+VERSION = 1
+# Magic, version, (reserved), records, practices, name pool size, tag pool size, CRC-32
+HEADER = Struct('<4sHHIIIII')
+# Last practiced ordinal, practice count, name size, favorite, session type, (padding),
+# first practice and practices in the days/durations columns, tags offset and size in the tag pool
+RECORD = Struct('<IIIBBxxIIII')
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+def column_bytes(column):
+    """An array('I') column as stored: little-endian uint32."""
+    if LITTLE_ENDIAN:
+        return column.tobytes()
+    swapped = array('I', column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def column_from_bytes(data):
+    column = array('I')
+    column.frombytes(data)
+    if not LITTLE_ENDIAN:
+        column.byteswap()
+    return column
+
+
+def session_row(session):
+    """A Session as the fields encode_snapshot() writes: (name, last_practiced, practice_count,
+    is_favorite, session_type, days, durations, tags), the columns as stored bytes.
+    """
+    history = session.history
+    return (session.name, session.last_practiced, session.practice_count, session.is_favorite,
+            session.session_type, column_bytes(history.days) if history else b'',
+            column_bytes(history.durations) if history else b'', ' '.join(session.tags))
+
+
+def snapshot_rows(sessions, names):
+    """Rows for encode_snapshot() of the named sessions; rows still undecoded are copied as stored."""
+    if isinstance(sessions, SnapshotSessions):
+        return sessions.rows(names)
+    return [session_row(sessions[name]) for name in names]
+
+
+def encode_snapshot(rows):
+    """The snapshot file for the rows, as a list of byte chunks (header first)."""
+    records = bytearray()
+    days, durations, names, tags = [], [], [], []
+    practices = tags_size = 0
+    for name, last_practiced, practice_count, is_favorite, session_type, day_bytes, duration_bytes, tag_text in rows:
+        count = len(day_bytes) // 4
+        name_bytes = name.encode('utf-8')
+        tag_bytes = tag_text.encode('utf-8')
+        records += RECORD.pack(last_practiced, practice_count, len(name_bytes), is_favorite, session_type,
+                               practices, count, tags_size, len(tag_bytes))
+        days.append(day_bytes)
+        durations.append(duration_bytes)
+        names.append(name_bytes)
+        tags.append(tag_bytes)
+        practices += count
+        tags_size += len(tag_bytes)
+
+    body = [bytes(records), b''.join(days), b''.join(durations), b'\0'.join(names), b''.join(tags)]
+    crc = 0
+    for part in body:
+        crc = zlib.crc32(part, crc)
+    return [HEADER.pack(MAGIC, VERSION, 0, len(names), practices, len(body[3]), tags_size, crc), *body]
+
+
+class SessionSnapshot:
+
+    def __init__(self, path):
+        """Open a snapshot read-only through mmap; raises ValueError if it fails its checks."""
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError("empty file") from None
+        try:
+            self.names = self._check()
+        except ValueError:
+            self.close()
+            raise
+
+    def _check(self):
+        """Validate the header, size and checksum and return the session names, in record order."""
+        data = self._map
+        if len(data) < HEADER.size:
+            raise ValueError("truncated header")
+        magic, version, _, count, practices, names_size, tags_size, crc = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a session snapshot")
+        if version != VERSION:
+            raise ValueError(f"unsupported version {version}")
+        self._days = HEADER.size + count * RECORD.size
+        self._durations = self._days + practices * 4
+        self._names = self._durations + practices * 4
+        self._tags = self._names + names_size
+        if self._tags + tags_size != len(data):
+            raise ValueError(f"size {len(data)} does not match the header")
+        with memoryview(data) as view, view[HEADER.size:] as body:
+            if zlib.crc32(body) != crc:
+                raise ValueError("checksum mismatch")
+
+        self.count = count
+        if not count:
+            return []
+        names = data[self._names:self._tags].decode('utf-8').split('\0')
+        if len(names) != count:
+            names = self._names_by_size()  # A name with a NUL in it
+        return names
+
+    def _names_by_size(self):
+        names = []
+        position = self._names
+        for row in range(self.count):
+            size = RECORD.unpack_from(self._map, HEADER.size + row * RECORD.size)[2]
+            names.append(self._map[position:position + size].decode('utf-8'))
+            position += size + 1
+        return names
+
+    def __len__(self):
+        return self.count
+
+    def session(self, row):
+        """The Session of one record, decoded from the mapped file."""
+        last_practiced, practice_count, _, is_favorite, session_type, start, length, tags_at, tags_size = \
+            RECORD.unpack_from(self._map, HEADER.size + row * RECORD.size)
+        history = None
+        if length:
+            history = PracticeHistory(
+                column_from_bytes(self._map[self._days + start * 4:self._days + (start + length) * 4]),
+                column_from_bytes(self._map[self._durations + start * 4:self._durations + (start + length) * 4]))
+        return Session(self.names[row], last_practiced, practice_count, bool(is_favorite), session_type, history,
+                       tuple(self._tag_text(tags_at, tags_size).split()))
+
+    def row(self, row):
+        """One record as a session_row(), its columns copied as stored without building a Session."""
+        last_practiced, practice_count, _, is_favorite, session_type, start, length, tags_at, tags_size = \
+            RECORD.unpack_from(self._map, HEADER.size + row * RECORD.size)
+        return (self.names[row], last_practiced, practice_count, is_favorite, session_type,
+                self._map[self._days + start * 4:self._days + (start + length) * 4],
+                self._map[self._durations + start * 4:self._durations + (start + length) * 4],
+                self._tag_text(tags_at, tags_size))
+
+    def tagged(self):
+        """(name, tags) of every tagged record, reading the record table and the tag pool only."""
+        for row, record in enumerate(RECORD.iter_unpack(self._map[HEADER.size:self._days])):
+            if record[8]:
+                yield self.names[row], tuple(self._tag_text(record[7], record[8]).split())
+
+    def _tag_text(self, offset, size):
+        return self._map[self._tags + offset:self._tags + offset + size].decode('utf-8')
+
+    def close(self):
+        self._map.close()
+
+
+class SnapshotSessions:
+    """Session records of a SessionSnapshot, each decoded the first time it is asked for.
+
+    Behaves like the dict of Sessions the library otherwise keeps, in the same order; the file stays
+    mapped until every record has been decoded, replaced or removed.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._entries = dict(zip(snapshot.names, range(len(snapshot))))  # name -> Session, or its record number
+        self.undecoded = len(self._entries)
+        if not self.undecoded:
+            snapshot.close()
+
+    def __getitem__(self, name):
+        entry = self._entries[name]
+        if entry.__class__ is int:
+            entry = self._entries[name] = self.snapshot.session(entry)
+            self._decoded_one()
+        return entry
+
+    def get(self, name, default=None):
+        if name not in self._entries:
+            return default
+        return self[name]
+
+    def __setitem__(self, name, session):
+        if self._entries.get(name).__class__ is int:
+            self._decoded_one()
+        self._entries[name] = session
+
+    def pop(self, name, default=None):
+        if name not in self._entries:
+            return default
+        session = self[name]
+        del self._entries[name]
+        return session
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def keys(self):
+        return self._entries.keys()
+
+    def values(self):
+        for name in list(self._entries):
+            yield self[name]
+
+    def items(self):
+        for name in list(self._entries):
+            yield name, self[name]
+
+    def tagged(self):
+        """(name, tags) of every tagged session, without decoding the records."""
+        for name, tags in self.snapshot.tagged() if self.undecoded else ():
+            if self._entries.get(name).__class__ is int:
+                yield name, tags
+        for name, entry in self._entries.items():
+            if entry.__class__ is not int and entry.tags:
+                yield name, entry.tags
+
+    def rows(self, names):
+        """session_row() of each named session, copying the records nobody has asked for."""
+        entries = self._entries
+        return [self.snapshot.row(entries[name]) if entries[name].__class__ is int else session_row(entries[name])
+                for name in names]
+
+    def _decoded_one(self):
+        self.undecoded -= 1
+        if not self.undecoded:
+            self.snapshot.close()  # Every record is a Session now
+
+
+class BinarySessionStore(SessionStore):
+
+    def __init__(self, store, snapshot, rows, path='sessions_data.bin', delay=0.5, worker=None):
+        """A SessionStore writing the binary snapshot on every save; sessions_data.json stays the fallback,
+        brought up to date when the app is paused or closed.
+        """
+        super().__init__(store, snapshot, delay, worker)
+        self.rows = rows  # Callable returning snapshot_rows() of the sessions, in display order
+        self.binary_path = os.path.abspath(path)
+        self.backup_dirty = False  # sessions_data.json is behind the binary snapshot
+        self._sessions = None  # SnapshotSessions of the last load, for load_tag_index()
+
+    def load_sessions(self):
+        """The Session records, decoded lazily from the binary snapshot, or read from sessions_data.json
+        when there is no snapshot yet or it fails its checks (it is then rewritten after the delay).
+        """
+        self._sessions = None
+        if os.path.exists(self.binary_path):
+            try:
+                with tracer.span('open_snapshot'):
+                    self._sessions = SnapshotSessions(SessionSnapshot(self.binary_path))
+                return self._sessions
+            except (OSError, ValueError) as e:
+                print(f"MusApp- Binary snapshot rejected ({e}); falling back to sessions_data.json.")
+        sessions = {name: Session.from_json(name, data) for name, data in self.load().items()}
+        if sessions:
+            self.mark_dirty("convert")
+        return sessions
+
+    def load_tag_index(self):
+        """The tag index, built from the snapshot's tags without decoding its records; None after a JSON load."""
+        sessions, self._sessions = self._sessions, None
+        if sessions is None:
+            return None
+        return TagIndex.build(sessions.tagged())
+
+    def flush(self, force=False, wait=False):
+        """Queue a write of the snapshot if anything changed; waiting (the app pausing or closing) also
+        rewrites sessions_data.json and blocks until both are on disk.
+        """
+        queued = super().flush(force)
+        if wait:
+            if self.backup_dirty:
+                self._write_backup()
+            self.worker.flush()
+        return queued
+
+    def _queue_write(self):
+        with tracer.span('save_data', backend='binary'):
+            return self._snapshot_and_submit()
+
+    def _submit_snapshot(self, on_error=None):
+        try:
+            # Rows are copied here, on the main thread; the I/O thread packs and writes them
+            rows = self.rows()
+        except Exception as e:
+            print(f"MusApp- Error saving the binary snapshot: {e}")
+            return False
+        self.worker.submit(self.binary_path, lambda: encode_snapshot(rows),
+                           self._on_written, on_error or self._on_write_error)
+        self.backup_dirty = True
+        return True
+
+    def _write_backup(self):
+        if self.store.exists('tag_index'):
+            # Left by the json backend; the sessions no longer match it, so it would be rebuilt anyway
+            self.store.store_delete('tag_index')
+        with tracer.span('save_data', backend='json'):
+            if SessionStore._submit_snapshot(self, self._on_backup_error):
+                self.backup_dirty = False
+
+    def _on_backup_error(self, error):
+        print(f"MusApp- Error saving data to JsonStore: {error}")
+        self.backup_dirty = True
+
+
+def json_to_snapshot(json_path, snapshot_path):
+    """Convert a sessions_data.json file to a binary snapshot. Returns the number of sessions."""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        stored = json.load(f).get('sessions', {}).get('data', {})
+    rows = [session_row(Session.from_json(name, data)) for name, data in stored.items()]
+    with open(snapshot_path, 'wb') as f:
+        f.writelines(encode_snapshot(rows))
+    return len(rows)
+
+
+def snapshot_to_json(snapshot_path, json_path):
+    """Convert a binary snapshot back to the sessions_data.json layout. Returns the number of sessions."""
+    snapshot = SessionSnapshot(snapshot_path)
+    try:
+        stored = {name: snapshot.session(row).to_json() for row, name in enumerate(snapshot.names)}
+    finally:
+        snapshot.close()
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'sessions': {'data': stored}}, f)
+    return len(stored)
+
+
+if __name__ == '__main__':
+    source, target = sys.argv[1:3]
+    convert = snapshot_to_json if source.endswith('.bin') else json_to_snapshot
+    print(f"MusApp- Converted {convert(source, target)} session(s) from {source} to {target}.")
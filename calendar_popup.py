@@ -0,0 +1,166 @@
+"""Practice calendar heatmap: a year of practice days, one session's or every session's.
+
+The whole calendar is one texture, sized to the widget so every day is a square of whole pixels,
+drawn by a single Rectangle: a year is one draw call, no cell is a widget and there is no layout
+pass per day. The texture is assembled a row of weeks at a time and sent with one blit.
+"""
+from datetime import date
+
+from kivy.graphics import Color, Rectangle
+from kivy.graphics.texture import Texture
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.widget import Widget
+from kivy.utils import get_color_from_hex
+from kivymd.uix.button import MDFlatButton
+from kivymd.uix.dialog import MDDialog
+from kivymd.uix.label import MDLabel
+
+from instrumentation import tracer
+from item_popup import reopen
+from practice_calendar import WEEKS, calendar_window
+
+# No practice, then four levels relative to the busiest day shown (the app's blue palette)
+LEVEL_COLORS = ("#E0E0E0", "#BBDEFB", "#64B5F6", "#1E88E5", "#0D47A1")
+
+
+def level(count, busiest):
+    """Shade of a day: 0 without practices, 4 for the busiest day."""
+    if not count:
+        return 0
+    return min(len(LEVEL_COLORS) - 1, -(-count * (len(LEVEL_COLORS) - 1) // busiest))
+
+
+class CalendarHeatmap(Widget):
+    """A week per column and a day per row (Monday on top), drawn from one texture."""
+
+    def __init__(self, weeks=WEEKS, **kwargs):
+        super().__init__(**kwargs)
+        self.weeks = weeks
+        self.texture = None  # Made to the widget's size by _draw()
+        self._colors = [bytes(int(channel * 255) for channel in get_color_from_hex(color)) for color in LEVEL_COLORS]
+        self._days = None  # (counts, first, last) last shown, redrawn when the widget is resized
+        with self.canvas:
+            Color(1, 1, 1, 1)
+            self._rectangle = Rectangle()
+        self.bind(pos=self._place, size=self._draw)
+
+    def show(self, counts, first, last):
+        """Draw the days first..last (first a Monday) from {day: practices}; later days stay blank."""
+        self._days = (counts, first, last)
+        self._draw()
+
+    def _draw(self, *args):
+        if self._days is None or self.width < self.weeks or self.height < 7:
+            return
+        counts, first, last = self._days
+        unit = int(min(self.width // self.weeks, self.height // 7))  # Pixels per day, gap included
+        gap = max(1, unit // 6)
+        cell = unit - gap
+        size = (self.weeks * unit - gap, 7 * unit - gap)
+
+        busiest = max(counts.values(), default=1)
+        cells = [color * cell for color in self._colors]  # One pixel row of a day per level
+        blank = bytes(cell * 4)  # Days after today
+        between = bytes(gap * 4)
+        buffer = bytearray()
+        for weekday in range(6, -1, -1):  # Texture rows run bottom up, so Sunday comes first
+            days = range(first + weekday, first + weekday + self.weeks * 7, 7)
+            row = between.join(cells[level(counts.get(day, 0), busiest)] if day <= last else blank for day in days)
+            buffer += row * cell
+            if weekday:
+                buffer += bytes(size[0] * 4 * gap)
+
+        if self.texture is None or self.texture.size != size:
+            self.texture = Texture.create(size=size, colorfmt='rgba')
+            self._rectangle.texture = self.texture
+            self._rectangle.size = size
+        self.texture.blit_buffer(bytes(buffer), colorfmt='rgba', bufferfmt='ubyte')
+        self.canvas.ask_update()
+        self._place()
+
+    def _place(self, *args):
+        """Center the texture, drawn pixel for pixel, in the widget."""
+        width, height = self._rectangle.size
+        self._rectangle.pos = (int(self.x + (self.width - width) / 2), int(self.y + (self.height - height) / 2))
+
+
+class CalendarPopup:
+
+    def __init__(self, calendar):
+        """A dialog with the heatmap of a session's practices, switchable to every session's."""
+        self.calendar = calendar  # PracticeCalendar with the cached per-day counts
+        self.session_name = None  # Session shown; None while every session is shown
+        self.bound_name = None  # Session the popup was opened for
+        self.dialog = None
+
+    def create_popup(self):
+        if not self.dialog:
+            title_label = MDLabel(
+                size_hint=(1, None),
+                height="32dp",
+                halign="center",
+                font_style="H6"
+            )
+            heatmap = CalendarHeatmap(size_hint=(1, None), height="48dp")
+            summary_label = MDLabel(
+                size_hint=(1, None),
+                height="20dp",
+                halign="center",
+                font_style="Caption"
+            )
+
+            layout = BoxLayout(
+                orientation='vertical',
+                size_hint=(1, None),
+                spacing=10,
+                height="120dp"
+            )
+            layout.add_widget(title_label)
+            layout.add_widget(heatmap)
+            layout.add_widget(summary_label)
+
+            self.scope_button = MDFlatButton(text="ALL SESSIONS", on_release=lambda x: self.toggle_scope())
+            self.dialog = MDDialog(
+                type="custom",
+                content_cls=layout,
+                size_hint=(None, None),
+                width='340dp',  # Fits a phone held upright
+                buttons=[
+                    self.scope_button,
+                    MDFlatButton(text="CLOSE", on_release=lambda x: self.dialog.dismiss()),
+                ],
+            )
+            self.title_label = title_label
+            self.heatmap = heatmap
+            self.summary_label = summary_label
+            self.refresh()
+            self.dialog.update_height()  # The dialog sizes itself to its content once
+        else:
+            self.refresh()
+        return self.dialog
+
+    def open(self, session_name=None):
+        """Open on a session's calendar, or every session's with no name."""
+        self.session_name = self.bound_name = session_name
+        reopen(self.create_popup())
+
+    def toggle_scope(self):
+        """Switch between the session the popup was opened for and every session."""
+        self.session_name = None if self.session_name is not None else self.bound_name
+        self.refresh()
+
+    def refresh(self):
+        """Draw the year up to today from the cached counts (only stale days are counted again)."""
+        first, last = calendar_window(date.today().toordinal(), self.heatmap.weeks)
+        with tracer.span('render_calendar', session=self.session_name is not None) as span:
+            counts = self.calendar.counts(first, last, self.session_name)
+            self.heatmap.show(counts, first, last)
+            span.args['practice_days'] = len(counts)
+
+        self.title_label.text = self.session_name if self.session_name is not None else "All sessions"
+        practices = sum(counts.values())
+        self.summary_label.text = (f"{practices} practice{'' if practices == 1 else 's'} on {len(counts)} "
+                                   f"day{'' if len(counts) == 1 else 's'} since "
+                                   f"{date.fromordinal(first).strftime('%b %d, %Y')}")
+        self.scope_button.text = "ALL SESSIONS" if self.session_name is not None else "THIS SESSION"
+        self.scope_button.disabled = self.bound_name is None
@@ -0,0 +1,66 @@
+from datetime import date, datetime, time, timedelta
+
+from kivy.clock import Clock
+
+from session_model import NEVER
+
+
+def relative_label(days_elapsed):
+    """'Today', '1 day ago' or 'N days ago'."""
+    if days_elapsed == 0:
+        return "Today"
+    elif days_elapsed == 1:
+        return "1 day ago"
+    return f"{days_elapsed} days ago"
+
+
+class RelativeDateLabels:
+
+    def __init__(self, on_rollover=None):
+        """'Last Practiced' labels keyed by day offset, computed once per day and dropped at local midnight."""
+        self.on_rollover = on_rollover  # Called on the main thread after the date changes
+        self.today = date.today().toordinal()
+        self._labels = {}  # days elapsed -> label
+        self._event = None
+
+    def label(self, ordinal):
+        """Label for a last-practiced ordinal (NEVER for sessions that were never practiced)."""
+        if ordinal == NEVER:
+            return "Never"
+        days_elapsed = self.today - ordinal
+        text = self._labels.get(days_elapsed)
+        if text is None:
+            text = self._labels[days_elapsed] = relative_label(days_elapsed)
+        return text
+
+    def start(self):
+        """Schedule the rollover for the next local midnight."""
+        self.stop()
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+        # One second late so date.today() has certainly moved on when it fires
+        self._event = Clock.schedule_once(self._on_midnight, (midnight - now).total_seconds() + 1)
+
+    def stop(self):
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def check(self):
+        """Roll over if the date has changed, e.g. after the app was suspended across midnight.
+
+        Returns True if it did.
+        """
+        today = date.today().toordinal()
+        if today == self.today:
+            return False
+        self.today = today
+        self._labels.clear()
+        if self.on_rollover is not None:
+            self.on_rollover()
+        return True
+
+    def _on_midnight(self, dt):
+        self._event = None
+        self.check()
+        self.start()
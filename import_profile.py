@@ -0,0 +1,111 @@
+"""Per-module import-time breakdown of main.py's cold start.
+
+Runs `python -X importtime -c "import main"` in fresh interpreters, takes the median of each
+module's timings over several runs and prints the most expensive modules and packages.
+
+    python import_profile.py                      # print the breakdown
+    python import_profile.py --save baseline.json # keep the numbers for later
+    python import_profile.py --compare baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_once(module):
+    """Return {module: (self_us, cumulative_us)} for one cold import in a fresh interpreter."""
+    env = dict(os.environ, KIVY_NO_ARGS='1', KIVY_NO_CONSOLELOG='1', KIVY_NO_FILELOG='1')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=HERE, env=env, capture_output=True, text=True)
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    if module not in timings:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return timings
+
+
+def measure(module, runs):
+    """Median self and cumulative time per module over several cold imports."""
+    samples = [measure_once(module) for _ in range(runs)]
+    names = set().union(*samples)
+    report = {}
+    for name in names:
+        values = [sample[name] for sample in samples if name in sample]
+        report[name] = {
+            'self_us': int(statistics.median(value[0] for value in values)),
+            'cumulative_us': int(statistics.median(value[1] for value in values)),
+        }
+    return report
+
+
+def by_package(report):
+    """Sum self time per top-level package."""
+    packages = {}
+    for name, timing in report.items():
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + timing['self_us']
+    return packages
+
+
+def print_report(report, module, top):
+    total = report[module]['cumulative_us']
+    print(f"import {module}: {total / 1000:.1f} ms total")
+
+    print(f"\nTop {top} modules by cumulative time:")
+    ranked = sorted(report.items(), key=lambda item: item[1]['cumulative_us'], reverse=True)
+    for name, timing in ranked[:top]:
+        print(f"  {timing['cumulative_us'] / 1000:8.1f} ms  {timing['self_us'] / 1000:8.1f} ms self  {name}")
+
+    print(f"\nTop {top} packages by self time:")
+    for package, self_us in sorted(by_package(report).items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {self_us / 1000:8.1f} ms  {package}")
+
+
+def print_comparison(report, baseline, threshold_us):
+    """Show modules whose cumulative import time moved by more than the threshold."""
+    print(f"\nChanges against baseline (> {threshold_us / 1000:.1f} ms):")
+    changed = False
+    for name in sorted(set(report) | set(baseline)):
+        now = report.get(name, {}).get('cumulative_us', 0)
+        before = baseline.get(name, {}).get('cumulative_us', 0)
+        if abs(now - before) > threshold_us:
+            changed = True
+            status = 'new' if name not in baseline else 'gone' if name not in report else ''
+            print(f"  {(now - before) / 1000:+8.1f} ms  {name} {status}".rstrip())
+    if not changed:
+        print("  none")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='main', help="module to import (default: main)")
+    parser.add_argument('--runs', type=int, default=5, help="cold imports to take the median of")
+    parser.add_argument('--top', type=int, default=20, help="rows to show per table")
+    parser.add_argument('--save', metavar='FILE', help="write the measurements as JSON")
+    parser.add_argument('--compare', metavar='FILE', help="diff against a saved JSON baseline")
+    parser.add_argument('--threshold-ms', type=float, default=2.0, help="smallest change to report")
+    args = parser.parse_args()
+
+    report = measure(args.module, args.runs)
+    print_report(report, args.module, args.top)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(report, json.load(f), args.threshold_ms * 1000)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+        print(f"\nSaved to {args.save}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Timing spans, counters and frame times for profiling the app, exportable as a Chrome trace.
+
+Spans and frame samples go into fixed-size ring buffers, so the instrumentation can stay on in
+release builds: a span costs two perf_counter() calls and a deque append. Open the exported file
+in chrome://tracing or https://ui.perfetto.dev for offline analysis.
+
+    from instrumentation import tracer
+
+    with tracer.span('sort_sessions', criteria=criteria):
+        ...
+    tracer.count('widgets_created')
+
+    @tracer.timed('sync_apply')  # Every call of a method, without arguments
+    def _apply(self, received, cursor):
+        ...
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Frames slower than this count as janky in the overlay (60 fps budget)
+FRAME_BUDGET = 1 / 60
+
+
+class Span:
+    __slots__ = ('tracer', 'name', 'args', 'start', 'duration')
+
+    def __init__(self, tracer, name, args):
+        """Times the block it wraps; args may be filled in inside the block (e.g. a size only known at the end)."""
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.duration = None  # Seconds, once the block has run
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.duration = time.perf_counter() - self.start
+        self.tracer.add_span(self.name, self.start, self.duration, self.args)
+        return False
+
+
+class Tracer:
+
+    def __init__(self, max_spans=2000, max_frames=600):
+        """Keep the most recent spans and frame times, plus running counters."""
+        self.spans = deque(maxlen=max_spans)  # (name, start, duration, thread id, args); appends are thread-safe
+        self.frames = deque(maxlen=max_frames)  # (time, frame duration), sampled while frame sampling is on
+        self.counters = {}
+        self.gauges = {}  # name -> callable returning a value owned elsewhere, read when reported
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()  # Counters are also bumped from the I/O thread
+        self._frame_event = None
+
+    def span(self, name, **args):
+        """Context manager recording how long the block it wraps takes."""
+        return Span(self, name, args)
+
+    def timed(self, name=None):
+        """Decorator recording every call of a function as a span."""
+        def decorate(function):
+            span_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with Span(self, span_name, {}):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def add_span(self, name, start, duration, args=None):
+        self.spans.append((name, start, duration, threading.get_ident(), args))
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, read):
+        """Report a value kept elsewhere (such as a backend's bytes written) alongside the counters."""
+        self.gauges[name] = read
+
+    def counter_values(self):
+        with self._lock:
+            values = dict(self.counters)
+        for name, read in self.gauges.items():
+            try:
+                values[name] = read()
+            except Exception as e:
+                values[name] = f"error: {e}"
+        return values
+
+    def recent(self, count=10):
+        """The latest spans, newest first, as (name, duration in ms, args)."""
+        spans = list(self.spans)[-count:]
+        return [(name, duration * 1000, args) for name, start, duration, thread, args in reversed(spans)]
+
+    def start_frames(self):
+        """Sample the duration of every frame until stop_frames()."""
+        from kivy.clock import Clock
+
+        if self._frame_event is None:
+            self._frame_event = Clock.schedule_interval(self._on_frame, 0)
+
+    def stop_frames(self):
+        if self._frame_event is not None:
+            self._frame_event.cancel()
+            self._frame_event = None
+
+    def frame_stats(self, window=2.0):
+        """(frames per second, mean ms, worst ms, frames over budget) over the last window seconds, or None."""
+        since = time.perf_counter() - window
+        durations = [duration for at, duration in self.frames if at >= since]
+        if not durations:
+            return None
+        mean = sum(durations) / len(durations)
+        slow = sum(1 for duration in durations if duration > FRAME_BUDGET * 1.5)
+        return 1 / mean if mean else 0.0, mean * 1000, max(durations) * 1000, slow
+
+    def export(self, path):
+        """Write the buffered spans, frame times and counters as a Chrome trace. Returns the number of events."""
+        from io_worker import atomic_write
+
+        pid = os.getpid()
+        now = time.perf_counter()
+        events = [
+            {'name': name, 'cat': 'musapp', 'ph': 'X', 'ts': self._micros(start), 'dur': duration * 1e6,
+             'pid': pid, 'tid': thread, 'args': args or {}}
+            for name, start, duration, thread, args in list(self.spans)
+        ]
+        events += [
+            {'name': 'frame_ms', 'ph': 'C', 'ts': self._micros(at), 'pid': pid, 'args': {'ms': duration * 1000}}
+            for at, duration in list(self.frames)
+        ]
+        counters = self.counter_values()
+        events.append({'name': 'counters', 'ph': 'C', 'ts': self._micros(now), 'pid': pid,
+                       'args': {name: value for name, value in counters.items() if isinstance(value, (int, float))}})
+        trace = {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'counters': counters, 'memory_bytes': memory_usage(), 'uptime_s': now - self.origin},
+        }
+        atomic_write(path, json.dumps(trace).encode('utf-8'))
+        return len(events)
+
+    def _micros(self, at):
+        return (at - self.origin) * 1e6
+
+    def _on_frame(self, dt):
+        self.frames.append((time.perf_counter(), dt))
+
+
+def memory_usage():
+    """Resident memory of the process in bytes (peak instead of current where /proc is missing), or None."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # Bytes on macOS, KiB elsewhere
+    except (ImportError, OSError):
+        return None
+
+
+# The app-wide tracer every module reports to
+tracer = Tracer()
@@ -0,0 +1,86 @@
+import os
+import threading
+from collections import OrderedDict
+
+from kivy.clock import Clock
+
+from instrumentation import tracer
+
+
+def atomic_write(path, data):
+    """Replace the file at path with data: write a temp file, fsync it, then rename over the original.
+
+    data is bytes or an iterable of bytes chunks. Returns the number of bytes written.
+    """
+    tmp_path = path + '.tmp'
+    size = 0
+    with open(tmp_path, 'wb') as f:
+        for chunk in ((data,) if isinstance(data, bytes) else data):
+            f.write(chunk)
+            size += len(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if hasattr(os, 'O_DIRECTORY'):
+        # Make the rename itself durable
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    return size
+
+
+class IOWorker:
+
+    def __init__(self, name='musapp-io'):
+        """A background thread that writes whole files in submission order, keeping only the newest per path."""
+        self.writes = 0
+        self.coalesced = 0  # Submissions dropped because a newer one for the same file replaced them
+        self._pending = OrderedDict()  # path -> (encode, on_written, on_error)
+        self._busy = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, path, encode, on_written=None, on_error=None):
+        """Queue a write of encode() to path.
+
+        encode runs on the I/O thread, so it must only read data nobody changes afterwards (a snapshot).
+        It returns bytes, or an iterable of bytes chunks: encoding in small pieces lets the main thread
+        take the GIL back in between, which one large json.dumps call would not.
+        on_written(size) is called on the I/O thread; on_error(exception) is scheduled on the main thread.
+        """
+        with self._condition:
+            if path in self._pending:
+                # The queued snapshot is superseded: drop it and commit the new one in its place in the order
+                del self._pending[path]
+                self.coalesced += 1
+            self._pending[path] = (encode, on_written, on_error)
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until every queued write has reached the disk. Returns False if the timeout ran out first."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+                path, (encode, on_written, on_error) = self._pending.popitem(last=False)
+                self._busy = True
+            try:
+                with tracer.span('write_file', path=os.path.basename(path)) as span:
+                    size = span.args['bytes'] = atomic_write(path, encode())
+            except Exception as e:
+                if on_error is not None:
+                    Clock.schedule_once(lambda dt, e=e, on_error=on_error: on_error(e))
+            else:
+                self.writes += 1
+                if on_written is not None:
+                    on_written(size)
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
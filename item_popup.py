@@ -3,30 +3,76 @@ from operator import index
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.button import MDRaisedButton, MDIconButton
 from kivymd.uix.label import MDLabel
-from kivymd.uix.pickers import MDDatePicker
+from kivymd.uix.textfield import MDTextField
 from kivy.uix.boxlayout import BoxLayout
 from kivy.utils import get_color_from_hex
 from kivymd.uix.gridlayout import MDGridLayout
 from kivy.graphics import Color, Line
+from kivy.animation import Animation
+
+
+def reopen(dialog):
+    """Open a pooled dialog, finishing a fade-out still running from its last use.
+
+    ModalView.open() is a no-op while the dismiss animation runs, and the animation would then
+    remove the freshly reopened dialog.
+    """
+    if dialog.parent:
+        Animation.cancel_all(dialog, '_anim_alpha')
+        dialog.dismiss(animation=False, force=True)
+    dialog.open()
 
 class ItemPopup:
 
-    def __init__(self, session_name, last_practiced_date, callback, session_type, session_colors):
+    def __init__(self, session_name, last_practiced_date, callback, session_type, session_colors, stats_text=None,
+                 tags=()):
         """Initialize the popup with a session name, last practice date, callback, session type, and colors."""
         self.session_name = session_name
+        self.stats_text = stats_text  # Optional one-line practice history summary
+        self.tags = tags
         self.last_practiced_date = last_practiced_date
         self.callback = callback
         self.session_type = session_type
         self.session_colors = session_colors  # Use session_colors passed from main.py
         self.dialog = None
+        self.confirmation_dialog = None
         self.color_buttons = []
+        self.check_icon = None  # The one highlight icon, moved between color buttons
+
+    def bind_session(self, session_name, last_practiced_date, session_type, stats_text=None, tags=()):
+        """Point the popup at another session, rebinding the widgets built by create_popup."""
+        self.session_name = session_name
+        self.last_practiced_date = last_practiced_date
+        self.session_type = session_type
+        self.stats_text = stats_text
+        self.tags = tags
+        if self.dialog:
+            self.refresh()
+
+    def refresh(self):
+        """Show the bound session's name, stats line, date button state, color and tags."""
+        self.title_label.text = f"{self.session_name}"
+        self.edit_button.disabled = self.last_practiced_date is None
+        self.tags_field.text = ", ".join(self.tags)
+
+        self.stats_label.text = self.stats_text or ""
+        if self.stats_text and not self.stats_label.parent:
+            self.main_layout.add_widget(self.stats_label, index=len(self.main_layout.children) - 1)
+            self.main_layout.height = '416dp'  # Make room for the stats line
+        elif not self.stats_text and self.stats_label.parent:
+            self.main_layout.remove_widget(self.stats_label)
+            self.main_layout.height = '386dp'
+        self.dialog.update_height()  # The dialog sizes itself to its content once; redo it for the new content
+
+        self.highlight_selected_button(self.session_type)
 
     def create_popup(self):
-        """Create the popup with raised buttons for 'Add Session', 'Edit Last Practice Date', 'Delete', and color buttons."""
+        """Create the popup with raised buttons for 'Add Session', 'Edit Last Practice Date', 'Calendar',
+        'Timer', 'Delete', and color buttons."""
         if not self.dialog:
 
             custom_title = MDLabel(
-                text=f"{self.session_name}",
+                text="",
                 size_hint=(1, None),
                 height="40dp",
                 halign="center",
@@ -55,8 +101,28 @@ class ItemPopup:
                 pos_hint={'center_x': 0.5},
                 on_release=lambda x: self.show_date_picker()
             )
-            if self.last_practiced_date is None:
-                edit_button.disabled = True
+
+            # Practice calendar and practice timer of the session, side by side
+            calendar_button = MDRaisedButton(
+                text="Calendar",
+                size_hint=(1, None),
+                height="48dp",
+                on_release=lambda x: self.on_button_press("Show Calendar")
+            )
+            timer_button = MDRaisedButton(
+                text="Timer",
+                size_hint=(1, None),
+                height="48dp",
+                on_release=lambda x: self.on_button_press("Practice Timer")
+            )
+            practice_layout = BoxLayout(
+                orientation='horizontal',
+                size_hint=(1, None),
+                height="36dp",  # Raised buttons draw at their minimum height, not the 48dp asked for
+                spacing=10
+            )
+            practice_layout.add_widget(calendar_button)
+            practice_layout.add_widget(timer_button)
 
             # Delete Button with Text
             delete_button = MDRaisedButton(
@@ -85,8 +151,12 @@ class ItemPopup:
                 color_button.bind(on_release=lambda btn, idx=index: self.on_color_button_press(idx))  # Bind event
                 self.color_buttons.append(color_button)
 
-            # Highlight the current session_type button
-            self.highlight_selected_button(self.session_type)
+            self.check_icon = MDIconButton(
+                icon="check-circle",  # You can use any suitable icon
+                theme_text_color="Custom",
+                text_color=(1, 1, 1, 1),  # White icon
+                pos_hint={'center_x': 0.5, 'center_y': 0.5},
+            )
 
             # Main layout to combine all action buttons and color buttons (stacked vertically)
             main_layout = BoxLayout(
@@ -95,15 +165,33 @@ class ItemPopup:
                 padding=[10, 5, 10, 10],  # Reduce padding, especially at the top
                 spacing=10,  # Reduce spacing between widgets
                 width="240dp",
-                height='260dp',
+                height='386dp',
                 pos_hint={'center_x': 0.5}
             )
 
+            # Shown under the title only while the bound session has a practice history
+            stats_label = MDLabel(
+                size_hint=(1, None),
+                height="20dp",
+                halign="center",
+                font_style="Caption"
+            )
+
+            # Comma-separated tags, saved when Enter is pressed
+            tags_field = MDTextField(
+                hint_text="Tags, separated by commas",
+                size_hint=(1, None),
+                height="58dp",
+                on_text_validate=lambda field: self.on_tags_entered(field.text)
+            )
+
             main_layout.add_widget(custom_title)
             main_layout.add_widget(add_button)
             main_layout.add_widget(edit_button)
+            main_layout.add_widget(practice_layout)
             main_layout.add_widget(delete_button)
             main_layout.add_widget(color_button_layout)
+            main_layout.add_widget(tags_field)
 
             # Create the dialog with the custom button layout
             self.dialog = MDDialog(
@@ -115,8 +203,19 @@ class ItemPopup:
                 buttons=[],
             )
 
+            self.title_label = custom_title
+            self.stats_label = stats_label
+            self.edit_button = edit_button
+            self.tags_field = tags_field
+            self.main_layout = main_layout
+
+        self.refresh()
         return self.dialog
 
+    def open(self):
+        """Build the popup on first use and open it for the bound session."""
+        reopen(self.create_popup())
+
     def create_color_button(self, color):
         """Helper function to create a color button."""
         return MDRaisedButton(
@@ -126,31 +225,28 @@ class ItemPopup:
 
     def highlight_selected_button(self, selected_index):
         """Highlight the selected button corresponding to the session_type with a white round icon."""
-        for idx, button in enumerate(self.color_buttons):
-            button.clear_widgets()  # Remove any existing icon from previous selections
-            if idx == selected_index:
-                # Add a round white icon to the selected button
-                icon = MDIconButton(
-                    icon="check-circle",  # You can use any suitable icon
-                    theme_text_color="Custom",
-                    text_color=(1, 1, 1, 1),  # White icon
-                    pos_hint={'center_x': 0.5, 'center_y': 0.5},
-                )
-                button.add_widget(icon)
+        if self.check_icon.parent:
+            self.check_icon.parent.remove_widget(self.check_icon)  # Take the icon off the previous selection
+        if 0 <= selected_index < len(self.color_buttons):
+            self.color_buttons[selected_index].add_widget(self.check_icon)
 
     def on_color_button_press(self, selected_index):
         """Handle color button press and update the session type."""
         # Highlight the selected button
-        print(selected_index)
         self.highlight_selected_button(selected_index)
 
         # Update the session type and pass it back to the main app
         self.session_type = selected_index
-        print(selected_index)
         self.callback("Update Session Type", self.session_name, self.session_type)
 
+    def on_tags_entered(self, text):
+        """Pass the typed tags back to the main app, which normalizes and saves them."""
+        self.callback("Set Tags", self.session_name, text)
+
     def show_date_picker(self):
         """Show a date picker to select a new last practice date."""
+        from kivymd.uix.pickers import MDDatePicker  # Heavy import, only needed when the picker is opened
+
         date_picker = MDDatePicker()
         date_picker.bind(on_save=self.set_last_practice_date)
         date_picker.open()
@@ -161,19 +257,22 @@ class ItemPopup:
 
     def show_add_session_confirmation(self):
         """Show confirmation dialog before adding a session."""
-        confirmation_dialog = MDDialog(
-            title="Confirm Session Addition",
-            text="Are you sure you want to update the session?",
-            buttons=[
-                MDRaisedButton(
-                    text="CANCEL", on_release=lambda x: confirmation_dialog.dismiss()
-                ),
-                MDRaisedButton(
-                    text="CONFIRM", on_release=lambda x: self.on_button_press("Add Session", confirmation_dialog)
-                ),
-            ]
-        )
-        confirmation_dialog.open()
+        if not self.confirmation_dialog:
+            # Built once; CONFIRM acts on whichever session is bound when it is pressed
+            self.confirmation_dialog = MDDialog(
+                title="Confirm Session Addition",
+                text="Are you sure you want to update the session?",
+                buttons=[
+                    MDRaisedButton(
+                        text="CANCEL", on_release=lambda x: self.confirmation_dialog.dismiss()
+                    ),
+                    MDRaisedButton(
+                        text="CONFIRM",
+                        on_release=lambda x: self.on_button_press("Add Session", self.confirmation_dialog)
+                    ),
+                ]
+            )
+        reopen(self.confirmation_dialog)
 
     def on_button_press(self, action, dialog=None):
         """Handle button press and call the provided callback with the action."""
@@ -1,19 +1,28 @@
 import os
 import json
+import time
 from kivy.lang import Builder
 from kivymd.app import MDApp
-from kivymd.uix.list import ThreeLineAvatarIconListItem, IconRightWidget, IconLeftWidget
-from kivymd.uix.dialog import MDDialog
-from kivymd.uix.button import MDFlatButton
-from kivymd.uix.textfield import MDTextField
 from datetime import datetime, timedelta
 from kivy.utils import platform
 from kivy.storage.jsonstore import JsonStore  # Import JsonStore
-from item_popup import ItemPopup  # Import the ItemPopup class
-from kivymd.uix.menu import MDDropdownMenu
 from kivy.utils import get_color_from_hex
 from kivy.metrics import dp
-from sort_popup import SortPopup
+from session_model import Session
+from practice_history import current_streak, weekly_counts, average_gap
+from session_list import SessionListItem, SessionRows  # Importing registers the row viewclass and FixedRowLayout
+from session_library import SessionLibrary
+from action_log import (ActionLog, AddSession, ChangeSessionType, DeleteSession, EditLastPracticed,
+                        PracticeSession, ResetSessions, SetTags, ToggleFavorite)
+from sync_engine import SyncClient
+from tag_index import parse_tags
+from date_labels import RelativeDateLabels
+from session_model import NEVER, SESSION_COLORS
+from instrumentation import tracer
+
+# Dialogs, popups (and the MDDatePicker behind ItemPopup), the dropdown menu and the optional
+# storage backends are imported where they are first used, keeping them off the cold-start path.
+# Run import_profile.py to see the per-module import cost.
 
 
 # Import permissions for Android
@@ -22,8 +31,25 @@ if platform == 'android':
     from android import mActivity
     from android.storage import app_storage_path
 
-# Define global list of 4 colors
-SESSION_COLORS = ['#FFCDD2', '#C8E6C9', '#BBDEFB', '#FFF9C4']  # Red, Green, Blue, Yellow
+# Number of rows built per frame after the first screenful when rendering many new rows
+RENDER_CHUNK_SIZE = 250
+
+# Storage backend: "json" rewrites sessions_data.json, "journal" appends one line per change,
+# "sqlite" keeps the sessions in an indexed SQLite database, "binary" rewrites a memory-mapped
+# snapshot decoded a session at a time (see binary_snapshot.py)
+STORAGE_BACKEND = "json"
+
+# With the sqlite backend, read the sessions a page at a time as the list scrolls instead of loading
+# them all at startup; memory is then bounded by the page cache rather than the library size
+PAGED_LOADING = True
+PAGE_SIZE = 100  # Sessions per page
+MAX_CACHED_PAGES = 30  # Pages (and their sessions) kept in the LRU cache
+
+# Sync server shared by the user's devices; run sync_server.py for a local one to test against
+SYNC_URL = "http://127.0.0.1:8765"
+
+# Sessions shown by the "Up next" view, due for practice first (see practice_scheduler.py)
+UP_NEXT_COUNT = 20
 
 
 KV = '''
@@ -36,12 +62,32 @@ MDScreen:
         MDTopAppBar:
             title: "Practice Sessions"
             left_action_items: [["menu", lambda x: app.show_settings_menu(x)]]
-            right_action_items: [["sort", lambda x: app.on_sort_button(x)]]
+            right_action_items: [["undo", lambda x: app.undo()], ["redo", lambda x: app.redo()], ["magnify", lambda x: app.toggle_search()], ["sort", lambda x: app.on_sort_button(x)]]
             elevation: 10
 
-        ScrollView:
-            MDList:
-                id: item_list
+        # Search row under the top bar; collapsed until the magnify action opens it
+        MDBoxLayout:
+            id: search_bar
+            size_hint_y: None
+            height: 0
+            opacity: 0
+            padding: [dp(16), 0, dp(16), 0]
+
+            MDTextField:
+                id: search_field
+                hint_text: "Search sessions, or #tags"
+                icon_left: "magnify"
+                disabled: True
+                on_text: app.filter_sessions(self.text)
+
+        RecycleView:
+            id: item_list
+            viewclass: 'SessionListItem'
+
+            FixedRowLayout:
+                orientation: 'vertical'
+                default_size: None, dp(88)
+                default_size_hint: 1, None
                 padding: [0, 0, 0, dp(10)]  # Bottom padding to avoid the FAB overlapping the last item
                 size_hint_y: None
                 height: self.minimum_height
@@ -61,19 +107,46 @@ MDScreen:
 class MainApp(MDApp):
     dialog = None
     settings_dialog = None
+    item_popup = None  # Built on the first tap, then rebound to whichever session is tapped
+    search_query = ""  # Current search filter; empty when the full list is shown
+    up_next = False  # True while the list shows just the sessions due first
+    import_job = None  # Running import/export; the Clock only holds weak references to their callbacks
+    export_job = None
+    perf_overlay = None  # Hidden until opened from the settings menu
+    calendar_popup = None  # Built the first time a practice calendar is shown
+    timer_popup = None  # Built the first time a practice timer is started
     data_file = None
-    sessions = {}  # Runtime dictionary for storing session data
+
+    @property
+    def sessions(self):
+        """Runtime dictionary of Session records, keyed by name (owned by the SessionLibrary)."""
+        return self.library.sessions
 
     def build(self):
         print("MusApp- Building the application UI...")
+        self.startup_time = time.perf_counter()
         self.theme_cls.primary_palette = "Blue"  # Set the primary color palette
         self.theme_cls.theme_style = "Light"  # Set the theme to Light or Dark
 
         # Initialize JsonStore without worrying about file paths
         self.store = JsonStore('sessions_data.json')
+        self.settings = JsonStore('settings.json')  # Small app preferences, kept apart from the session data
+        self.sort_mode = self.settings.get('sort')['mode'] if self.settings.exists('sort') else None
+        self.library = SessionLibrary(self.store, STORAGE_BACKEND, PAGED_LOADING, PAGE_SIZE, MAX_CACHED_PAGES)
+        self.persistence = self.library.persistence
+        self.actions = ActionLog(self.library)  # Undo/redo of every change made from the UI
+        self.sync = SyncClient(self.library, SYNC_URL, on_complete=self.on_sync_complete)
+        tracer.gauge('writes', lambda: self.persistence.writes)
+        if hasattr(self.persistence, 'bytes_written'):
+            tracer.gauge('bytes_written', lambda: self.persistence.bytes_written)
 
         self.menu = None  # Initialize the menu attribute to None
-        return Builder.load_string(KV)
+        with tracer.span('build_ui'):
+            root = Builder.load_string(KV)
+        self.session_rows = SessionRows(root.ids.item_list, self.build_session_row, RENDER_CHUNK_SIZE)
+        self.library.display_order = self.display_order  # Save in display order
+        self.date_labels = RelativeDateLabels(self.on_day_changed)
+        return root
 
     def on_start(self):
         """Called after the app is fully initialized and the UI is ready."""
@@ -84,7 +157,45 @@ class MainApp(MDApp):
             else:
                 print("MusApp- Permission granted after request.")
         self.load_data()
-        self.populate_ui()
+        # The saved sort mode is applied again unless the backend saved the sessions in display order
+        session_names = self.library.startup_order(self.sort_mode)
+        self.populate_ui(session_names, on_first_frame=self.report_first_frame, on_complete=self.report_full_list)
+        self.date_labels.start()  # Relabel the rows at midnight
+        self.restore_practice_timer()
+
+    def report_first_frame(self):
+        elapsed = (time.perf_counter() - self.startup_time) * 1000
+        print(f"MusApp- Startup: first frame after {elapsed:.0f} ms.")
+
+    def report_full_list(self):
+        elapsed = (time.perf_counter() - self.startup_time) * 1000
+        print(f"MusApp- Startup: full list of {len(self.sessions)} session(s) after {elapsed:.0f} ms.")
+
+    def on_pause(self):
+        """Flush pending changes before Android suspends the app."""
+        if self.timer_popup is not None and self.timer_popup.timer is not None:
+            self.timer_popup.pause()  # No clicks while suspended; the timer keeps counting
+            self.save_practice_timer(self.timer_popup.timer)  # In case Android kills the app meanwhile
+        self.persistence.flush(wait=True)
+        self.sync.save(wait=True)
+        return True
+
+    def on_resume(self):
+        """Catch up with a midnight that passed while the app was suspended."""
+        self.date_labels.check()
+        self.date_labels.start()
+        if self.timer_popup is not None:
+            self.timer_popup.resume()
+
+    def on_stop(self):
+        """Flush pending changes before the app exits; waits for the background writer to finish."""
+        if self.import_job is not None:
+            self.import_job.cancel()  # Saves what was merged so far
+        if self.timer_popup is not None and self.timer_popup.timer is not None:
+            self.timer_popup.pause()
+            self.save_practice_timer(self.timer_popup.timer)  # Reopened, still counting, on the next start
+        self.persistence.flush(wait=True)
+        self.sync.save(wait=True)  # Remembers which sessions the next sync has to push
 
     def request_android_permissions(self):
         """Request necessary Android permissions."""
@@ -96,129 +207,232 @@ class MainApp(MDApp):
             except Exception as e:
                 print(f"MusApp- Permission request failed: {e}")
 
-    def save_data(self):
-        """Save session data to JsonStore from the runtime dictionary."""
-        serializable_sessions = {}
-        for name, session in self.sessions.items():
-            try:
-                serializable_sessions[name] = {
-                    'last_practiced': session.get('last_practiced', None),
-                    'practice_count': session.get('practice_count', 0),
-                    'is_favorite': session.get('is_favorite', False),
-                    'session_type': session.get('session_type', 0)  # Default to 0 if not present
-                }
-            except Exception as e:
-                print(f"MusApp- Error processing session '{name}': {e}")
-
-        try:
-            self.store.put('sessions', data=serializable_sessions)
-            print("MusApp- Data saved successfully.")
-        except Exception as e:
-            print(f"MusApp- Error saving data to JsonStore: {e}")
-
     def load_data(self):
-        """Load session data from JsonStore into the runtime dictionary."""
-        if self.store.exists('sessions'):
-            self.sessions = self.store.get('sessions')['data']
-            for session_name, session_data in self.sessions.items():
-                last_practiced = session_data.get('last_practiced')
-                practice_count = session_data.get('practice_count', 0)
-                is_favorite = session_data.get('is_favorite', False)
-                session_type = session_data.get('session_type', 0)  # Default to 0 if missing
-
-                # Convert last_practiced to date
-                last_practiced_date = None if last_practiced is None else datetime.strptime(last_practiced,
-                                                                                            "%Y-%m-%d").date()
-
-                # Add the session to the UI
-                self.add_list_item(session_name, last_practiced_date, practice_count, is_favorite, session_type)
-            print("MusApp- Data loaded:", self.sessions)
+        """Load session data from the storage backend into the runtime dictionary (no UI work)."""
+        with tracer.span('load_data', backend=STORAGE_BACKEND) as span:
+            count = span.args['sessions'] = self.library.load()
+        if count:
+            print(f"MusApp- Loaded {count} session(s) in {span.duration * 1000:.0f} ms.")
         else:
             print("MusApp- No existing session data found.")
 
-    def populate_ui(self):
-        """Populate the UI from the session data in the runtime dictionary."""
-        self.root.ids.item_list.clear_widgets()  # Clear existing UI items
-        for session_name, session_data in self.sessions.items():
-            last_practiced = session_data.get('last_practiced')
-            practice_count = session_data.get('practice_count', 0)
-            is_favorite = session_data.get('is_favorite', False)  # Get the favorite state
-            session_type = session_data.get('session_type', 0)  # Get session type, default to 0 if not found
-
-            last_practiced_date = None if last_practiced is None else datetime.strptime(last_practiced,
-                                                                                        "%Y-%m-%d").date()
-
-            # Pass the is_favorite and session_type value to add_list_item
-            self.add_list_item(session_name, last_practiced_date, practice_count, is_favorite, session_type)
-
-    def add_list_item(self, name, last_practiced=None, practice_count=0, is_favorite=False, session_type=0):
-        """Add a new session to the UI and runtime dictionary."""
-        last_practiced_text = self.format_last_practiced(last_practiced)
+    def populate_ui(self, session_names=None, on_first_frame=None, on_complete=None):
+        """Populate the UI from the session data in the runtime dictionary, in the given order."""
+        if session_names is None:
+            session_names = list(self.sessions)
+        with tracer.span('populate_ui', rows=len(session_names)):
+            self.show_sessions(session_names, on_first_frame, on_complete)
 
+    def session_row(self, name, session):
+        """Build the RecycleView data entry for one session."""
         # Select background color based on session_type (default to 0 if session_type is out of range)
-        background_color = SESSION_COLORS[session_type % len(SESSION_COLORS)]
-
-        # Create a new ThreeLine list item with Name, Last Practiced, and Practice Count
-        list_item = ThreeLineAvatarIconListItem(
-            text=name,
-            secondary_text=f"Last Practiced: {last_practiced_text}",
-            tertiary_text=f"Practice Count: {practice_count}",
-            bg_color=get_color_from_hex(background_color)  # Set background color
-        )
-
-        list_item.ids._lbl_primary.bold = True
-
-        # Favorite icon
-        favorite_icon = IconLeftWidget(icon="star" if is_favorite else "star-outline")
-        favorite_icon.bind(on_release=lambda x: self.toggle_favorite(favorite_icon, name))
-        list_item.add_widget(favorite_icon)
-
-        # Trailing vertical dots icon (settings)
-        trailing_icon = IconRightWidget(icon="dots-vertical")
-        trailing_icon.bind(on_release=lambda x: self.show_item_popup(name))
-        list_item.add_widget(trailing_icon)
-
-        # Add the list item to the MDList
-        self.root.ids.item_list.add_widget(list_item)
-
-        # Ensure the runtime dictionary is updated with the favorite state and session_type
-        self.sessions[name] = {
-            'last_practiced': last_practiced.strftime('%Y-%m-%d') if last_practiced else None,
-            'practice_count': practice_count,
-            'is_favorite': is_favorite,
-            'session_type': session_type  # Include session_type in the saved data
+        background_color = SESSION_COLORS[session.session_type % len(SESSION_COLORS)]
+
+        return {
+            'session_name': name,
+            'text': name,
+            'secondary_text': self.last_practiced_text(session),
+            'tertiary_text': self.count_and_tags_text(session),
+            'bg_color': get_color_from_hex(background_color),
+            'is_favorite': session.is_favorite,
         }
 
-        self.save_data()
+    def count_and_tags_text(self, session):
+        text = f"Practice Count: {session.practice_count}"
+        if session.tags:
+            text += "   " + " ".join(f"#{tag}" for tag in session.tags)
+        return text
+
+    def last_practiced_text(self, session):
+        return f"Last Practiced: {self.date_labels.label(session.last_practiced)}"
+
+    def on_day_changed(self):
+        """Relabel 'Last Practiced' after midnight without re-sorting or rebuilding any row."""
+        changed = self.session_rows.refresh_field(
+            'secondary_text', lambda name: self.last_practiced_text(self.sessions[name]))
+        print(f"MusApp- New day: {changed} 'Last Practiced' label(s) updated.")
+
+    def build_session_row(self, session_name):
+        return self.session_row(session_name, self.sessions[session_name])
+
+    def show_sessions(self, session_names, on_first_frame=None, on_complete=None):
+        """Reconcile the list with a new ordering; only visible rows get widgets."""
+        self.up_next = False
+        if self.library.paged:
+            self.session_rows.show_paged(session_names, on_first_frame, on_complete)
+        else:
+            self.session_rows.show(session_names, on_first_frame, on_complete)
+
+    def show_search_results(self, criteria):
+        """Show just the sessions matching the search query, in the order of a sort criterion."""
+        names = self.library.search(self.search_query, criteria)
+        self.up_next = False
+        if self.library.paged:
+            self.session_rows.show_paged(names)
+        else:
+            self.session_rows.show_subset(names)
+
+    def show_up_next(self):
+        """Show the sessions due for practice first, read off the scheduler's heap without sorting."""
+        if self.search_query:
+            self.toggle_search()  # The view replaces the search results
+        with tracer.span('up_next', count=UP_NEXT_COUNT):
+            self.session_rows.show_subset(self.library.up_next(UP_NEXT_COUNT))
+        self.up_next = True
+
+    def full_order(self):
+        """Every session in the current sort order (the stored order until a sort is chosen)."""
+        if self.sort_mode or self.library.paged:
+            return self.library.ordering(self.sort_mode)  # Alphabetical when paged and unsorted
+        return list(self.sessions)
+
+    def display_order(self):
+        """The order the unfiltered list shows; sessions are saved in this order."""
+        if self.search_query or self.up_next:
+            return self.full_order()
+        return self.session_rows.order
+
+    def toggle_search(self):
+        """Open the search field under the top bar, or close it and show the full list again."""
+        search_bar = self.root.ids.search_bar
+        search_field = self.root.ids.search_field
+        if search_bar.height:
+            search_field.text = ""  # Clears the filter
+            search_field.focus = False
+            search_field.disabled = True
+            search_bar.height = 0
+            search_bar.opacity = 0
+        else:
+            search_bar.height = dp(64)
+            search_bar.opacity = 1
+            search_field.disabled = False
+            search_field.focus = True
+
+    def filter_sessions(self, text):
+        """Show only the sessions with a word starting with the text.
+
+        A keystroke costs time in proportion to the matches: the name index answers the query and
+        only matching rows go to the list; hidden rows stay cached for when the filter is cleared.
+        """
+        query = text.strip()
+        if query == self.search_query:
+            return
+        self.search_query = query
+        with tracer.span('search', query=query):
+            if query:
+                self.show_search_results(self.sort_mode)
+            else:
+                self.show_sessions(self.full_order())
 
-    def toggle_favorite(self, icon, session_name):
-        """Toggle the favorite state of the session explicitly."""
-        # Check the current state of the session's favorite status
-        is_favorite = self.sessions[session_name].get('is_favorite', False)
+    def refresh_row(self, session_name):
+        """Update the data entry of a single session so the RecycleView redraws just that row."""
+        self.session_rows.update(session_name)
+        if self.up_next:
+            self.show_up_next()  # The change moved the session's due day
 
-        # Toggle the favorite state
-        if not is_favorite:
-            icon.icon = "star"  # Switch to filled star if not favorited
-            self.sessions[session_name]['is_favorite'] = True  # Update to favorited
-        else:
-            icon.icon = "star-outline"  # Switch back to outlined star
-            self.sessions[session_name]['is_favorite'] = False  # Update to not favorited
+    def add_list_item(self, name, last_practiced=None, practice_count=0, is_favorite=False, session_type=0):
+        """Add a session to the runtime dictionary and storage backend, and its row to the UI."""
+        self.actions.do(AddSession(name, last_practiced, practice_count, is_favorite, session_type))
+        # Append the row to the list, or refresh it if the session already has one
+        self.sync_row(name)
 
-        # Save the updated favorite state after toggle
-        self.save_data()
+    def toggle_favorite(self, session_name):
+        """Toggle the favorite state of the session explicitly."""
+        # Toggle and save the favorite state; the row's star icon follows the data
+        if self.actions.do(ToggleFavorite(session_name)):
+            self.refresh_row(session_name)
 
     def show_item_popup(self, session_name):
         """Show the popup using ItemPopup when the settings icon is clicked."""
-        session_data = self.sessions.get(session_name, {})
-        last_practiced_str = session_data.get('last_practiced')
-        last_practiced_date = None if last_practiced_str is None else datetime.strptime(last_practiced_str,
-                                                                                        "%Y-%m-%d").date()
-        session_type = session_data.get('session_type', 0)  # Get session type, default to 0 if not found
+        from item_popup import ItemPopup
+
+        session = self.sessions.get(session_name) or Session(session_name)
+        stats_text = self.format_practice_stats(session)
 
-        # Pass SESSION_COLORS to ItemPopup
-        popup = ItemPopup(session_name, last_practiced_date, self.handle_action, session_type, SESSION_COLORS)
-        popup_dialog = popup.create_popup()
-        popup_dialog.open()
+        with tracer.span('create_popup', popup='ItemPopup', reused=self.item_popup is not None):
+            if self.item_popup is None:
+                # Pass SESSION_COLORS to ItemPopup
+                self.item_popup = ItemPopup(session_name, session.last_practiced_date, self.handle_action,
+                                            session.session_type, SESSION_COLORS, stats_text=stats_text,
+                                            tags=session.tags)
+            else:
+                self.item_popup.bind_session(session_name, session.last_practiced_date, session.session_type,
+                                             stats_text, session.tags)
+            self.item_popup.open()
+
+    def format_practice_stats(self, session):
+        """Summarize the session's practice history: streak, practices this week and average gap."""
+        if not session.history:
+            return None
+        days = session.history.days
+        today = datetime.now().date().toordinal()
+        gap = average_gap(days)
+        gap_text = "-" if gap is None else f"{gap:.1f} d"
+        return (f"Streak: {current_streak(days, today)} d   This week: {weekly_counts(days, today, 1)[0]}   "
+                f"Avg gap: {gap_text}")
+
+    def show_calendar(self, session_name=None):
+        """Show the practice calendar heatmap of a session, or of every session with no name."""
+        from calendar_popup import CalendarPopup
+
+        with tracer.span('create_popup', popup='CalendarPopup', reused=self.calendar_popup is not None):
+            if self.calendar_popup is None:
+                self.calendar_popup = CalendarPopup(self.library.calendar)
+            self.calendar_popup.open(session_name)
+
+    def show_practice_timer(self, session_name):
+        """Start timing a practice of a session; a practice already being timed is shown instead."""
+        from practice_timer import PracticeTimer
+
+        if self.timer_popup is not None and self.timer_popup.timer is not None:
+            if self.timer_popup.timer.session_name != session_name:
+                print(f"MusApp- Already timing '{self.timer_popup.timer.session_name}'.")
+            timer = self.timer_popup.timer
+        else:
+            timer = PracticeTimer(session_name)
+            timer.start()
+            self.save_practice_timer(timer)
+        self.open_timer_popup(timer)
+
+    def open_timer_popup(self, timer):
+        from timer_popup import TimerPopup
+
+        with tracer.span('create_popup', popup='TimerPopup', reused=self.timer_popup is not None):
+            if self.timer_popup is None:
+                bpm = self.settings.get('metronome')['bpm'] if self.settings.exists('metronome') else 60
+                self.timer_popup = TimerPopup(self.handle_timer_action, bpm)
+            self.timer_popup.open(timer)
+
+    def handle_timer_action(self, action, timer):
+        """Handle the practice timer's changes; a stopped practice is logged with its duration in one write."""
+        if action == "Timer Changed":
+            self.save_practice_timer(timer)
+        elif action == "Set BPM":
+            self.settings.put('metronome', bpm=self.timer_popup.metronome.bpm)
+        elif action in ("Save Practice", "Discard Practice"):
+            if self.settings.exists('timer'):
+                self.settings.delete('timer')
+            if action == "Save Practice":
+                duration = int(round(timer.elapsed()))
+                print(f"MusApp- Practiced '{timer.session_name}' for {duration // 60} min {duration % 60} s.")
+                self.update_session(timer.session_name, duration)
+
+    def save_practice_timer(self, timer):
+        """Keep the running practice in the settings, so closing the app does not lose it."""
+        self.settings.put('timer', **timer.to_json())
+
+    def restore_practice_timer(self):
+        """Reopen a practice that was being timed when the app was closed."""
+        from practice_timer import PracticeTimer
+
+        if not self.settings.exists('timer'):
+            return
+        timer = PracticeTimer.from_json(self.settings.get('timer'))
+        if timer.session_name not in self.sessions:
+            self.settings.delete('timer')  # The session was deleted (or synced away) since
+            return
+        print(f"MusApp- Resuming the practice of '{timer.session_name}'.")
+        self.open_timer_popup(timer)
 
     def handle_action(self, action, session_name, value=None):
         """Handle actions selected from the popup."""
@@ -231,82 +445,106 @@ class MainApp(MDApp):
         elif action == "Update Session Type":
             # Update session type
             self.update_session_type(session_name, value)
+        elif action == "Set Tags":
+            self.update_session_tags(session_name, parse_tags(value))
+        elif action == "Show Calendar":
+            self.show_calendar(session_name)
+        elif action == "Practice Timer":
+            self.show_practice_timer(session_name)
 
     def update_session_type(self, session_name, new_session_type):
         """Update the session type of a session."""
-        # Update the runtime dictionary
-        if session_name in self.sessions:
-            self.sessions[session_name]['session_type'] = new_session_type
+        # Update and save the runtime dictionary
+        if self.actions.do(ChangeSessionType(session_name, new_session_type)):
+            # Refresh the row to reflect the updated color based on session type
+            self.refresh_row(session_name)
 
-        # Re-populate the UI to reflect the updated color based on session type
-        self.populate_ui()
-
-        # Save the updated data
-        self.save_data()
+    def update_session_tags(self, session_name, tags):
+        """Replace the tags of a session; the tag index is updated in place."""
+        if self.actions.do(SetTags(session_name, tags)):
+            self.sync_row(session_name)  # A tag filter may now show or hide it
 
     def update_last_practiced_date(self, session_name, selected_date):
         """Update the last practiced date of a session."""
-        # Update the runtime dictionary
-        if session_name in self.sessions:
-            self.sessions[session_name]['last_practiced'] = selected_date.strftime('%Y-%m-%d')
-
-        # Format the selected date properly (e.g., "Today", "X days ago")
-        formatted_last_practiced = self.format_last_practiced(selected_date)
-
-        # Update the UI
-        for child in self.root.ids.item_list.children:
-            if isinstance(child, ThreeLineAvatarIconListItem) and child.text == session_name:
-                # Update the last practiced date in the UI with the formatted text
-                child.secondary_text = f"Last Practiced: {formatted_last_practiced}"
-                break
-
-        # Save the updated data after changes
-        self.save_data()
-
-    def update_session(self, session_name):
-        """Update the session with today's date and increment the practice count."""
-        today = datetime.now().date()
+        # The edit also corrects when the latest recorded practice happened
+        if self.actions.do(EditLastPracticed(session_name, selected_date)):
+            # Update the UI; the row formats the date (e.g., "Today", "X days ago")
+            self.refresh_row(session_name)
 
-        if session_name in self.sessions:
-            self.sessions[session_name]['last_practiced'] = today.strftime('%Y-%m-%d')
-            self.sessions[session_name]['practice_count'] += 1
-            # Leave session_type unchanged during this operation
-
-        self.populate_ui()
+    def update_session(self, session_name, duration=0):
+        """Update the session with today's date, increment the practice count and log the practice."""
+        if self.actions.do(PracticeSession(session_name, duration, datetime.now().date())):
+            self.refresh_row(session_name)
 
     def delete_session(self, session_name):
         """Delete a session by its name."""
-        # Remove from the runtime dictionary
-        if session_name in self.sessions:
-            del self.sessions[session_name]
+        # Remove from the runtime dictionary and save; the row position is kept for undo
+        self.actions.do(DeleteSession(session_name, self.session_rows.index_of(session_name)))
 
         # Remove from the UI
-        for child in self.root.ids.item_list.children[:]:
-            if isinstance(child, ThreeLineAvatarIconListItem) and child.text == session_name:
-                self.root.ids.item_list.remove_widget(child)
-                break
-
-        # Save the updated data after deletion
-        self.save_data()
+        self.session_rows.remove(session_name)
+        if self.up_next:
+            self.show_up_next()  # The next session due takes the free place
+
+    def undo(self):
+        """Revert the latest change; only its inverse reaches the model, the storage backend and its row."""
+        action = self.actions.undo()
+        if action is None:
+            print("MusApp- Nothing to undo.")
+            return
+        print(f"MusApp- Undid the {action.description}.")
+        self.show_action(action)
+
+    def redo(self):
+        """Apply the latest undone change again."""
+        action = self.actions.redo()
+        if action is None:
+            print("MusApp- Nothing to redo.")
+            return
+        print(f"MusApp- Redid the {action.description}.")
+        self.show_action(action)
+
+    def show_action(self, action):
+        """Bring the list in line with an undone or redone action."""
+        if action.name is None:
+            # A reset: every session came back (or went again)
+            self.session_rows.invalidate(list(self.session_rows.rows))
+            if self.search_query:
+                self.show_search_results(self.sort_mode)
+            else:
+                self.show_sessions(self.full_order())
+        else:
+            self.sync_row(action.name, getattr(action, 'position', None))
+
+    def sync_row(self, name, position=None):
+        """Add, update or remove one session's row to match the library."""
+        if name not in self.sessions:
+            self.session_rows.remove(name)
+        elif self.search_query and not self.library.matches(name, self.search_query):
+            # Hidden by the search filter, or just hidden by a tag change; shown again when the filter is cleared
+            if self.library.paged:
+                self.show_search_results(self.sort_mode)  # The results are a list, not a paged ordering
+            else:
+                self.session_rows.hide(name)
+        elif self.session_rows.index_of(name) is None:
+            self.session_rows.insert(name, position)
+        else:
+            self.session_rows.update(name)
+        if self.up_next:
+            self.show_up_next()
 
     def format_last_practiced(self, last_practiced):
         """Format the 'Last Practiced' field."""
-        if not last_practiced:
-            return "Never"  # If no date is set
-
-        today = datetime.now().date()
-        days_elapsed = (today - last_practiced).days
-
-        if days_elapsed == 0:
-            return "Today"
-        elif days_elapsed == 1:
-            return "1 day ago"
-        else:
-            return f"{days_elapsed} days ago"
+        # Labels are cached per day offset and recomputed after midnight
+        return self.date_labels.label(last_practiced.toordinal() if last_practiced else NEVER)
 
     def on_add_button(self):
         """Show a dialog to add a new session name."""
         if not self.dialog:
+            from kivymd.uix.dialog import MDDialog
+            from kivymd.uix.button import MDFlatButton
+            from kivymd.uix.textfield import MDTextField
+
             self.dialog = MDDialog(
                 title="Add Session",
                 type="custom",
@@ -329,9 +567,6 @@ class MainApp(MDApp):
             self.dialog.content_cls.text = ""
         self.dialog.open()
 
-    def close_dialog(self, obj):
-        self.dialog.dismiss()
-
     def add_session(self, obj):
         """Add a session based on user input from the dialog."""
         name_input = self.dialog.content_cls.text.strip()
@@ -343,17 +578,39 @@ class MainApp(MDApp):
     def show_settings_menu(self, button):
         """Display a dropdown menu for settings with 'About' and 'Reset' options."""
         if not hasattr(self, 'settings_menu'):
+            from kivymd.uix.menu import MDDropdownMenu
+
             menu_items = [
                 {
                     "text": "About",
                     "viewclass": "OneLineListItem",
                     "on_release": lambda: self.on_about()
                 },
+                {
+                    "text": "Import",
+                    "viewclass": "OneLineListItem",
+                    "on_release": lambda: self.on_import()
+                },
+                {
+                    "text": "Export",
+                    "viewclass": "OneLineListItem",
+                    "on_release": lambda: self.on_export()
+                },
+                {
+                    "text": "Sync",
+                    "viewclass": "OneLineListItem",
+                    "on_release": lambda: self.sync_sessions()
+                },
                 {
                     "text": "Reset",
                     "viewclass": "OneLineListItem",
                     "on_release": lambda: self.on_reset()
                 },
+                {
+                    "text": "Performance",
+                    "viewclass": "OneLineListItem",
+                    "on_release": lambda: self.toggle_perf_overlay()
+                },
             ]
             self.settings_menu = MDDropdownMenu(
                 caller=button,
@@ -365,21 +622,130 @@ class MainApp(MDApp):
     def on_about(self):
         """Show an 'About' dialog."""
         if not self.settings_dialog:
+            from kivymd.uix.dialog import MDDialog
+            from kivymd.uix.button import MDFlatButton
+
             self.settings_dialog = MDDialog(
                 title="About",
                 text="This is a Music Practice App.\nVersion 1.0",
-                buttons=[MDFlatButton(text="OK", on_release=self.close_dialog)],
+                buttons=[MDFlatButton(text="OK", on_release=lambda x: self.settings_dialog.dismiss())],
             )
         self.settings_menu.dismiss()  # Close the settings dropdown menu
         self.settings_dialog.open()
 
+    def toggle_perf_overlay(self):
+        """Show or hide the overlay with recent spans, frame times, memory and counters; it can export a trace."""
+        from perf_overlay import PerfOverlay
+
+        if hasattr(self, 'settings_menu'):
+            self.settings_menu.dismiss()
+        if self.perf_overlay is None:
+            self.perf_overlay = PerfOverlay(tracer)
+        self.perf_overlay.toggle(self.root)
+
+    def on_import(self):
+        """Ask for a CSV or JSON Lines file to import and how to treat sessions that already exist."""
+        from kivymd.uix.dialog import MDDialog
+        from kivymd.uix.button import MDFlatButton
+        from kivymd.uix.textfield import MDTextField
+
+        def start(policy):
+            path = import_dialog.content_cls.text.strip()
+            import_dialog.dismiss()
+            self.import_sessions(path, policy)
+
+        import_dialog = MDDialog(
+            title="Import Sessions",
+            type="custom",
+            content_cls=MDTextField(hint_text="CSV or JSON Lines file", text="sessions_import.csv"),
+            buttons=[
+                MDFlatButton(text="CANCEL", on_release=lambda x: import_dialog.dismiss()),
+                MDFlatButton(text="SKIP", on_release=lambda x: start("skip")),
+                MDFlatButton(text="MERGE", on_release=lambda x: start("merge")),
+                MDFlatButton(text="REPLACE", on_release=lambda x: start("replace")),
+            ],
+        )
+        self.settings_menu.dismiss()
+        import_dialog.open()
+
+    def import_sessions(self, path, policy="merge"):
+        """Stream a file into the library a chunk per frame; the data is saved and the list rendered once at the end."""
+        from session_transfer import SessionImport
+
+        if not os.path.exists(path):
+            print(f"MusApp- Import file not found: {path}")
+            return None
+        self.import_job = SessionImport(self.library, path, policy, on_complete=self.on_import_complete)
+        self.import_job.start()
+        return self.import_job
+
+    def on_import_complete(self, job):
+        self.import_job = None
+        self.actions.clear()  # Imports are not undoable, and logged inverses may no longer apply
+        # Existing sessions changed underneath their cached rows
+        self.session_rows.invalidate(job.updated + job.replaced)
+        if self.search_query:
+            self.show_search_results(self.sort_mode)
+        else:
+            self.show_sessions(self.full_order())
+
+    def sync_sessions(self):
+        """Exchange changed sessions with the sync server; the list is updated when the sync is done."""
+        if hasattr(self, 'settings_menu'):
+            self.settings_menu.dismiss()
+        if not self.sync.sync():
+            print("MusApp- A sync is already running.")
+
+    def on_sync_complete(self, names):
+        self.actions.clear()  # Sessions changed on other devices; logged inverses may no longer apply
+        self.session_rows.invalidate(names)
+        if self.search_query:
+            self.show_search_results(self.sort_mode)
+        else:
+            self.show_sessions(self.full_order())
+
+    def on_export(self):
+        """Ask for the file to export the sessions to; .jsonl writes JSON Lines, anything else CSV."""
+        from kivymd.uix.dialog import MDDialog
+        from kivymd.uix.button import MDFlatButton
+        from kivymd.uix.textfield import MDTextField
+
+        def start(instance):
+            path = export_dialog.content_cls.text.strip()
+            export_dialog.dismiss()
+            self.export_sessions(path)
+
+        export_dialog = MDDialog(
+            title="Export Sessions",
+            type="custom",
+            content_cls=MDTextField(hint_text="CSV or JSON Lines file", text="sessions_export.csv"),
+            buttons=[
+                MDFlatButton(text="CANCEL", on_release=lambda x: export_dialog.dismiss()),
+                MDFlatButton(text="EXPORT", on_release=start),
+            ],
+        )
+        self.settings_menu.dismiss()
+        export_dialog.open()
+
+    def export_sessions(self, path):
+        """Stream every session, in display order, to a file a chunk per frame."""
+        from session_transfer import SessionExport
+
+        self.export_job = SessionExport(self.sessions, self.full_order(), path, on_complete=self.on_export_complete)
+        self.export_job.start()
+        return self.export_job
+
+    def on_export_complete(self, job):
+        self.export_job = None
+
     def on_reset(self):
         """Reset all session data after confirmation."""
+        from kivymd.uix.dialog import MDDialog
+        from kivymd.uix.button import MDFlatButton
 
-        def confirm_reset(instance, obj):
-            self.sessions.clear()  # Clear the runtime dictionary
-            self.root.ids.item_list.clear_widgets()  # Clear the UI list
-            self.save_data()  # Save the empty state
+        def confirm_reset(instance):
+            self.actions.do(ResetSessions())  # Clear the runtime dictionary and save the empty state
+            self.session_rows.clear()  # Clear the UI list
             reset_dialog.dismiss()  # Close the confirmation dialog
 
         # Create a confirmation dialog for resetting
@@ -401,62 +767,43 @@ class MainApp(MDApp):
 
     def on_sort_button(self, button):
         """Open the sort popup with sorting options."""
-        if not hasattr(self, 'sort_popup'):
-            # Create the popup with the sorting options
-            self.sort_popup = SortPopup(self.sort_sessions, SESSION_COLORS)
+        with tracer.span('create_popup', popup='SortPopup', reused=hasattr(self, 'sort_popup')):
+            if not hasattr(self, 'sort_popup'):
+                from sort_popup import SortPopup
+
+                # Create the popup with the sorting options
+                self.sort_popup = SortPopup(self.sort_sessions, SESSION_COLORS)
 
-        sort_dialog = self.sort_popup.create_popup()
-        sort_dialog.open()
+            sort_dialog = self.sort_popup.create_popup()
+            sort_dialog.open()
 
     def sort_sessions_by_color(self, color_index):
         """Sort the sessions based on the selected session_type (color index)."""
-        sorted_sessions = sorted(
-            self.sessions.items(), key=lambda x: (x[1]['session_type'] == color_index, x[0].lower()), reverse=True
-        )
-
-        # Clear the current list and re-populate it with the sorted sessions
-        self.root.ids.item_list.clear_widgets()
-        for session_name, session_data in sorted_sessions:
-            last_practiced = session_data.get('last_practiced')
-            practice_count = session_data.get('practice_count', 0)
-            is_favorite = session_data.get('is_favorite', False)
-            session_type = session_data.get('session_type', 0)
-            last_practiced_date = None if last_practiced is None else datetime.strptime(last_practiced,
-                                                                                        "%Y-%m-%d").date()
-            self.add_list_item(session_name, last_practiced_date, practice_count, is_favorite, session_type)
-
-        self.sort_menu.dismiss()  # Close the sorting menu after sorting
+        self.sort_sessions(f"color_{color_index}")
 
     def sort_sessions(self, criteria):
-        """Sort the sessions based on the selected criteria."""
-        if "color_" in criteria:
-            color_index = int(criteria.split("_")[1])
-            sorted_sessions = sorted(
-                self.sessions.items(),
-                key=lambda x: x[1].get('session_type', 0) == color_index,
-                reverse=True
-            )
+        """Show the sessions in the order of the selected criteria and remember the choice."""
+        if criteria == "up_next":
+            self.show_up_next()  # A view of a few sessions rather than an order, so it is not remembered
+            return
+        with tracer.span('sort_sessions', criteria=criteria):
+            self._sort_sessions(criteria)
+
+    def _sort_sessions(self, criteria):
+        if self.search_query:
+            # Only the matches are shown; order just those
+            self.show_search_results(criteria)
         else:
-            if criteria == "alphabetical":
-                sorted_sessions = sorted(self.sessions.items(), key=lambda x: x[0].lower())
-            elif criteria == "practice_count":
-                sorted_sessions = sorted(self.sessions.items(), key=lambda x: x[1]['practice_count'], reverse=True)
-            elif criteria == "last_practice":
-                sorted_sessions = sorted(self.sessions.items(), key=lambda x: x[1]['last_practiced'] or "",
-                                         reverse=True)
-            elif criteria == "favourites":
-                sorted_sessions = sorted(self.sessions.items(), key=lambda x: (not x[1]['is_favorite'], x[0].lower()))
-
-        # Clear the current list and re-populate it with the sorted sessions
-        self.root.ids.item_list.clear_widgets()
-        for session_name, session_data in sorted_sessions:
-            last_practiced = session_data.get('last_practiced')
-            practice_count = session_data.get('practice_count', 0)
-            is_favorite = session_data.get('is_favorite', False)
-            session_type = session_data.get('session_type', 0)
-            last_practiced_date = None if last_practiced is None else datetime.strptime(last_practiced,
-                                                                                        "%Y-%m-%d").date()
-            self.add_list_item(session_name, last_practiced_date, practice_count, is_favorite, session_type)
+            # Read the maintained index (or the database index) for this criterion; no sort happens here
+            session_names = self.library.ordering(criteria)
+
+            # Reconcile the list with the new ordering
+            self.show_sessions(session_names)
+
+        # Persist the mode; the JSON file is rewritten (debounced) so its order matches the display
+        self.sort_mode = criteria
+        self.settings.put('sort', mode=criteria)
+        self.library.sort_changed()
 
 
 if __name__ == '__main__':
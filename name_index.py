@@ -0,0 +1,61 @@
+from bisect import bisect_left, insort
+
+
+def name_tokens(name):
+    """Case-folded suffixes of a name starting at each word, so a query can match the start of any word."""
+    folded = name.casefold()
+    tokens = [folded]
+    for position in range(1, len(folded)):
+        if folded[position].isalnum() and not folded[position - 1].isalnum():
+            tokens.append(folded[position:])
+    return tokens
+
+
+def matches(name, query):
+    """Whether the search index would return the name for the query."""
+    query = query.casefold()
+    return any(token.startswith(query) for token in name_tokens(name))
+
+
+class NameIndex:
+
+    def __init__(self, names=None):
+        """Sorted (token, name) pairs over session names, answering prefix queries with a binary search."""
+        self._source = names  # Iterable of names the index is built from the first time it is searched
+        self._entries = None  # Sorted list of (token, name)
+
+    def reset(self, names):
+        """Point the index at a new set of names; it is rebuilt the next time it is searched."""
+        self._source = names
+        self._entries = None
+
+    def search(self, query):
+        """Names with a word starting with the query, each once. Costs O(log n + matches)."""
+        query = query.casefold()
+        entries = self._built()
+        found = {}
+        position = bisect_left(entries, (query,))
+        while position < len(entries) and entries[position][0].startswith(query):
+            found[entries[position][1]] = None  # A name can match through several of its words
+            position += 1
+        return list(found)
+
+    def add(self, name):
+        if self._entries is None:
+            return  # Not built yet; the build picks the name up
+        for token in name_tokens(name):
+            insort(self._entries, (token, name))
+
+    def remove(self, name):
+        if self._entries is None:
+            return
+        for token in name_tokens(name):
+            position = bisect_left(self._entries, (token, name))
+            if position < len(self._entries) and self._entries[position] == (token, name):
+                del self._entries[position]
+
+    def _built(self):
+        if self._entries is None:
+            names = self._source if self._source is not None else ()
+            self._entries = sorted((token, name) for name in names for token in name_tokens(name))
+        return self._entries
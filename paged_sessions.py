@@ -0,0 +1,177 @@
+"""Read-through access to the SQLite session library, a page at a time.
+
+Only the pages the list has shown recently and the sessions on them are held in memory. Both
+caches are LRUs with a fixed capacity, so memory stays bounded however large the library grows,
+and opening it costs one COUNT query instead of reading every session.
+
+Startup still grows with the library, only far more slowly: the COUNT scans the table, and the
+list keeps one placeholder reference per session (see SessionRows.show_paged). At 300k sessions
+the two take about 10 ms (35 ms with a cold cache) and 4 ms, and the first frame comes after
+about 190 ms against 100 ms at 1k; the first page is the only one read.
+"""
+from collections import OrderedDict
+from collections.abc import Sequence
+
+from instrumentation import tracer
+from session_model import Session
+
+
+class LRUCache:
+
+    def __init__(self, capacity):
+        """A dict that forgets its least recently used entries beyond capacity (values must not be None)."""
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        return self._entries.pop(key, default)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PagedSessions:
+
+    def __init__(self, repository, page_size=100, max_pages=30):
+        """The sessions of a SessionRepository behind the dict interface SessionLibrary uses, read on demand."""
+        self.repository = repository
+        self.page_size = page_size
+        self.pages = LRUCache(max_pages)  # (criteria, query, page number) -> names on that page
+        self.cache = LRUCache(page_size * max_pages)  # name -> Session
+        self._counts = {}  # query -> number of matching sessions
+
+    def ordering(self, criteria=None, query=None):
+        """The names in the order of a SortPopup criterion, optionally only those a search query matches."""
+        return PagedOrdering(self, criteria or 'alphabetical', query or None)
+
+    def count(self, query=None):
+        count = self._counts.get(query)
+        if count is None:
+            count = self._counts[query] = self.repository.count(query)
+        return count
+
+    def page(self, criteria, query, number):
+        """Names on one page of an ordering, read with their sessions the first time it is needed."""
+        key = (criteria, query, number)
+        names = self.pages.get(key)
+        if names is None:
+            with tracer.span('read_page', criteria=criteria, page=number):
+                names = self.read(criteria, query, number * self.page_size, (number + 1) * self.page_size)
+            self.pages.put(key, names)
+            tracer.count('pages_read')
+        return names
+
+    def read(self, criteria, query, start, stop):
+        """Names at positions start to stop of an ordering, bypassing the page cache (used for slices)."""
+        names = self.repository.sorted_names(criteria, stop - start, start, query)
+        self.prefetch(names)
+        return names
+
+    def prefetch(self, names):
+        """Read the sessions that are not cached yet with a few IN queries instead of one query per name."""
+        missing = [name for name in names if name not in self.cache]
+        if missing:
+            self._load(missing)
+
+    def changed(self, resized=False):
+        """Forget the cached pages after a change that may reorder sessions, and the counts if sessions came or went.
+
+        Cached sessions stay: they are the records the change was made to.
+        """
+        self.pages.clear()
+        if resized:
+            self._counts.clear()
+
+    def get(self, name, default=None):
+        session = self.cache.get(name)
+        if session is None:
+            session = self._load([name]).get(name, default)
+        return session
+
+    def __getitem__(self, name):
+        session = self.get(name)
+        if session is None:
+            raise KeyError(name)
+        return session
+
+    def __setitem__(self, name, session):
+        """Cache a new or replaced session; the caller records it in the repository."""
+        self.cache.put(name, session)
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return self.repository.names()
+
+    def pop(self, name, default=None):
+        session = self.get(name)
+        self.cache.pop(name)
+        return default if session is None else session
+
+    def clear(self):
+        self.cache.clear()
+        self.changed(resized=True)
+
+    def __repr__(self):
+        return (f"PagedSessions({len(self)} session(s), {len(self.pages)} page(s) and "
+                f"{len(self.cache)} session(s) cached)")
+
+    def _load(self, names):
+        sessions = {name: Session.from_json(name, data) for name, data in self.repository.fetch(names).items()}
+        for name, session in sessions.items():
+            self.cache.put(name, session)
+        return sessions
+
+
+class PagedOrdering(Sequence):
+
+    def __init__(self, source, criteria, query=None):
+        """A sort criterion's names (matching an optional query) as a sequence that reads one page at a time."""
+        self.source = source
+        self.criteria = criteria
+        self.query = query
+
+    def __len__(self):
+        return self.source.count(self.query)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self.source.read(self.criteria, self.query, start, stop) if start < stop else []
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        page_size = self.source.page_size
+        return self.source.page(self.criteria, self.query, index // page_size)[index % page_size]
@@ -0,0 +1,115 @@
+import os
+
+from kivy import kivy_data_dir
+from kivy.clock import Clock
+from kivy.graphics import Color, Rectangle
+from kivy.metrics import dp
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.label import Label
+from kivymd.uix.button import MDFlatButton
+
+from instrumentation import memory_usage
+
+MONOSPACE_FONT = os.path.join(kivy_data_dir, 'fonts', 'RobotoMono-Regular.ttf')
+
+
+class PerfOverlay:
+
+    def __init__(self, tracer, trace_path='musapp_trace.json', interval=0.5):
+        """A translucent panel with frame times, memory, counters and the latest spans, refreshed while it is open."""
+        self.tracer = tracer
+        self.trace_path = trace_path
+        self.interval = interval
+        self.panel = None
+        self.label = None
+        self._event = None
+
+    @property
+    def is_open(self):
+        return self.panel is not None and self.panel.parent is not None
+
+    def toggle(self, parent):
+        if self.is_open:
+            self.close()
+        else:
+            self.open(parent)
+
+    def open(self, parent):
+        """Show the panel over parent and start sampling frame times (only done while it is open)."""
+        if self.panel is None:
+            self.panel = self.build_panel()
+        if self.panel.parent is None:
+            parent.add_widget(self.panel)
+        self.tracer.start_frames()
+        self.refresh()
+        if self._event is None:
+            self._event = Clock.schedule_interval(self.refresh, self.interval)
+
+    def close(self, *args):
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+        self.tracer.stop_frames()
+        if self.is_open:
+            self.panel.parent.remove_widget(self.panel)
+
+    def export_trace(self, *args):
+        try:
+            events = self.tracer.export(self.trace_path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"MusApp- Error exporting trace: {e}")
+            return
+        print(f"MusApp- Exported {events} trace event(s) to {os.path.abspath(self.trace_path)}.")
+
+    def report(self):
+        """The panel text: one line each for frames, memory and counters, then the latest spans."""
+        frames = self.tracer.frame_stats()
+        if frames is None:
+            lines = ["Frames  -"]
+        else:
+            fps, mean, worst, slow = frames
+            lines = [f"Frames  {fps:5.1f} fps  avg {mean:5.1f} ms  worst {worst:6.1f} ms  slow {slow}"]
+        memory = memory_usage()
+        lines.append(f"Memory  {memory / 2 ** 20:.1f} MB" if memory else "Memory  -")
+        counters = self.tracer.counter_values()
+        lines.append("  ".join(f"{name} {value}" for name, value in sorted(counters.items())))
+        lines.append("")
+        for name, milliseconds, args in self.tracer.recent(12):
+            detail = "  ".join(f"{key}={value}" for key, value in args.items()) if args else ""
+            lines.append(f"{milliseconds:8.1f} ms  {name}  {detail}")
+        return "\n".join(lines)
+
+    def refresh(self, dt=None):
+        self.label.text = self.report()
+
+    def build_panel(self):
+        panel = BoxLayout(
+            orientation='vertical',
+            size_hint=(0.96, None),
+            height=dp(340),
+            pos_hint={'center_x': 0.5, 'center_y': 0.5},
+            padding=dp(8),
+        )
+        with panel.canvas.before:
+            Color(0, 0, 0, 0.8)
+            background = Rectangle(pos=panel.pos, size=panel.size)
+        panel.bind(pos=lambda widget, pos: setattr(background, 'pos', pos),
+                   size=lambda widget, size: setattr(background, 'size', size))
+
+        self.label = Label(
+            font_name=MONOSPACE_FONT,
+            font_size='11sp',
+            halign='left',
+            valign='top',
+            color=(1, 1, 1, 1),
+        )
+        self.label.bind(size=self.label.setter('text_size'))  # Wrap long lines and align to the top left
+
+        buttons = BoxLayout(size_hint=(1, None), height=dp(40), spacing=dp(8))
+        for text, action in (("EXPORT TRACE", self.export_trace), ("CLOSE", self.close)):
+            buttons.add_widget(MDFlatButton(text=text, theme_text_color="Custom", text_color=(1, 1, 1, 1),
+                                            on_release=action))
+
+        panel.add_widget(self.label)
+        panel.add_widget(buttons)
+        return panel
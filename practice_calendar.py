@@ -0,0 +1,77 @@
+"""Practices per day, overall and per session, for the calendar heatmap.
+
+The counts for the window on screen are cached. A change to one practice only marks its day
+stale, and only the stale days are counted again the next time the calendar is drawn; bulk
+changes (imports, resets) drop the cache.
+"""
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+WEEKS = 53  # A year of full weeks, this one included
+MAX_SESSION_ENTRIES = 8  # Sessions whose counts stay cached besides the overall ones
+
+
+def calendar_window(today, weeks=WEEKS):
+    """(first, last) day ordinals of the calendar: from the Monday weeks - 1 weeks back to today."""
+    monday = today - (today - 1) % 7  # Ordinal 1 (0001-01-01) was a Monday
+    return monday - (weeks - 1) * 7, today
+
+
+def count_days(histories, first, last):
+    """{day: practices} between first and last (inclusive) across PracticeHistory columns."""
+    counts = Counter()
+    for history in histories:
+        days = history.days
+        start = bisect_left(days, first)
+        if start < len(days):
+            counts.update(days[start:bisect_right(days, last, start)])
+    return counts
+
+
+def count_day(histories, day):
+    """Practices logged on one day across PracticeHistory columns."""
+    return sum(bisect_right(history.days, day) - bisect_left(history.days, day) for history in histories)
+
+
+class PracticeCalendar:
+
+    def __init__(self, count_range, count_one):
+        """Cached per-day practice counts, recounted a day at a time as practices change.
+
+        count_range(first, last, name) returns {day: practices} over a window and count_one(day, name)
+        the practices of one day; name None means every session.
+        """
+        self.count_range = count_range
+        self.count_one = count_one
+        self._entries = {}  # name (None for every session) -> [first, last, {day: practices}, stale days]
+
+    def counts(self, first, last, name=None):
+        """{day: practices} for first..last; days without practices are left out."""
+        entry = self._entries.get(name)
+        if entry is None or entry[0] > first or entry[1] < last:
+            entry = self._entries[name] = [first, last, dict(self.count_range(first, last, name)), set()]
+            if name is not None and len(self._entries) > MAX_SESSION_ENTRIES + 1:
+                # Drop the session cached first (the overall entry does not count against the limit)
+                del self._entries[next(key for key in self._entries if key is not None)]
+        counts = entry[2]
+        for day in entry[3]:
+            count = self.count_one(day, name)
+            if count:
+                counts[day] = count
+            else:
+                counts.pop(day, None)
+        entry[3].clear()
+        if entry[0] == first and entry[1] == last:
+            return counts
+        return {day: count for day, count in counts.items() if first <= day <= last}
+
+    def invalidate(self, name, days):
+        """Mark the days a change to the named session's practices touched, overall and for the session."""
+        for key in (None, name):
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[3].update(day for day in days if entry[0] <= day <= entry[1])
+
+    def clear(self):
+        """Drop every cached count, after a change too broad to track day by day."""
+        self._entries.clear()
@@ -0,0 +1,113 @@
+from array import array
+from bisect import bisect_right
+
+
+class PracticeHistory:
+    """Every practice of one session as two parallel columns: day ordinals (sorted) and durations in seconds."""
+    __slots__ = ('days', 'durations')
+
+    def __init__(self, days=(), durations=None):
+        self.days = array('I', days)
+        self.durations = array('I', durations if durations is not None else [0] * len(self.days))
+
+    @classmethod
+    def from_json(cls, data):
+        """Build from the session's stored 'history' and optional 'durations' lists."""
+        days = data.get('history') or ()
+        durations = data.get('durations')
+        if durations is not None and len(durations) != len(days):
+            durations = None  # Columns out of step; keep the days and drop the durations
+        return cls(days, durations)
+
+    def to_json(self):
+        """Return the fields stored alongside the session; durations are left out if none were recorded."""
+        data = {'history': self.days.tolist()}
+        if any(self.durations):
+            data['durations'] = self.durations.tolist()
+        return data
+
+    def __len__(self):
+        return len(self.days)
+
+    def add(self, day, duration=0):
+        """Record a practice on a day ordinal; days stay sorted (appending is the common case)."""
+        position = len(self.days) if not self.days or day >= self.days[-1] else bisect_right(self.days, day)
+        self.days.insert(position, day)
+        self.durations.insert(position, duration)
+
+    def move_last(self, day):
+        """Move the most recent practice to another day (used when the last practice date is edited)."""
+        if not self.days:
+            return None
+        old_day = self.days.pop()
+        duration = self.durations.pop()
+        self.add(day, duration)
+        return old_day
+
+    def remove(self, day):
+        """Remove the practice recorded last on a day ordinal. Returns its duration, or None if there is none."""
+        position = bisect_right(self.days, day) - 1
+        if position < 0 or self.days[position] != day:
+            return None
+        del self.days[position]
+        return self.durations.pop(position)
+
+
+def current_streak(days, today):
+    """Consecutive practice days ending today (or yesterday, if today has not been practiced yet)."""
+    if not days or days[-1] < today - 1:
+        return 0
+    streak = 1
+    previous = days[-1]
+    for index in range(len(days) - 2, -1, -1):
+        day = days[index]
+        if day == previous:
+            continue  # Several practices on the same day
+        if day != previous - 1:
+            break
+        streak += 1
+        previous = day
+    return streak
+
+
+def longest_streak(days):
+    """Longest run of consecutive practice days."""
+    longest = run = 0
+    previous = None
+    for day in days:
+        if day == previous:
+            continue
+        run = run + 1 if previous is not None and day == previous + 1 else 1
+        longest = max(longest, run)
+        previous = day
+    return longest
+
+
+def weekly_counts(days, today, weeks=8):
+    """Practice counts for the last `weeks` Monday-based weeks, oldest first.
+
+    Walks backwards from the newest practice, so the cost is proportional to the practices in
+    the window rather than to the whole history.
+    """
+    counts = [0] * weeks
+    this_week = (today - 1) // 7  # Ordinal 1 (0001-01-01) was a Monday
+    for index in range(len(days) - 1, -1, -1):
+        age = this_week - (days[index] - 1) // 7
+        if age >= weeks:
+            break
+        if age >= 0:
+            counts[weeks - 1 - age] += 1
+    return counts
+
+
+def average_gap(days):
+    """Average number of days between distinct practice days, or None with fewer than two."""
+    distinct = 0
+    previous = None
+    for day in days:
+        if day != previous:
+            distinct += 1
+            previous = day
+    if distinct < 2:
+        return None
+    return (days[-1] - days[0]) / (distinct - 1)
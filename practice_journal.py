@@ -0,0 +1,257 @@
+import json
+import os
+from bisect import bisect_right
+from contextlib import contextmanager
+
+from instrumentation import tracer
+from tag_index import TagIndex
+
+# Defaults for a session record created by replaying a journal event
+DEFAULT_SESSION = {
+    'last_practiced': None,
+    'practice_count': 0,
+    'is_favorite': False,
+    'session_type': 0
+}
+
+
+def apply_event(sessions, event):
+    """Apply one journal event to a sessions dict."""
+    op = event.get('op')
+    name = event.get('name')
+    if op == 'reset':
+        sessions.clear()
+    elif op == 'add':
+        sessions[name] = {**DEFAULT_SESSION, **event.get('fields', {})}  # Replaces the record, tags included
+    elif op == 'delete':
+        sessions.pop(name, None)
+    elif op == 'history':
+        if name in sessions:
+            apply_history(sessions[name], event.get('fields', {}))
+    elif name is not None:
+        session = sessions.setdefault(name, dict(DEFAULT_SESSION))
+        session.update(event.get('fields', {}))
+
+
+def apply_history(session, fields):
+    """Add one practice to a stored session's history lists, move its latest one, or remove one (undo)."""
+    days = session.setdefault('history', [])
+    durations = session.get('durations') or [0] * len(days)
+    duration = fields.get('duration', 0)
+    if fields.get('remove'):
+        # The practice recorded last on that day, as PracticeHistory.remove() picks it
+        position = bisect_right(days, fields['day']) - 1
+        if position >= 0 and days[position] == fields['day']:
+            del days[position]
+            del durations[position]
+        return
+    if fields.get('replace_last'):
+        if not days:
+            return
+        days.pop()
+        duration = durations.pop()
+
+    day = fields['day']
+    if not days or day >= days[-1]:
+        days.append(day)
+        durations.append(duration)
+    else:
+        position = bisect_right(days, day)
+        days.insert(position, day)
+        durations.insert(position, duration)
+    if any(durations):
+        session['durations'] = durations
+
+
+class PracticeJournal:
+
+    def __init__(self, snapshot, path='sessions_journal.log', snapshot_path='sessions_snapshot.json',
+                 compact_threshold=256 * 1024, legacy_store=None, tag_snapshot=None):
+        """Append-only storage backend: one JSON line per change, compacted into a snapshot when it grows."""
+        self.snapshot = snapshot  # Callable returning the serializable session data
+        self.tag_snapshot = tag_snapshot  # Optional callable returning the tag index, saved in the snapshot
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.compact_threshold = compact_threshold
+        self.legacy_store = legacy_store  # JsonStore to migrate from on first run
+        self.writes = 0
+        self.bytes_written = 0  # Journal appends plus snapshot rewrites
+        self.journal_size = 0
+        self.generation = 0  # Bumped by every compaction so stale journal lines are never replayed twice
+        self._depth = 0
+        self._buffer = []
+        self._tag_index = None  # Read by load(), handed over by load_tag_index()
+
+    def load(self):
+        """Load the snapshot and replay the journal on top of it."""
+        if not os.path.exists(self.snapshot_path) and not os.path.exists(self.path):
+            return self._migrate_legacy()
+
+        sessions = {}
+        tag_index = None
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                sessions = snapshot.get('data', {})
+                self.generation = snapshot.get('generation', 0)
+                if 'tag_index' in snapshot:
+                    tag_index = TagIndex.from_json(snapshot['tag_index'])
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"MusApp- Error reading journal snapshot: {e}")
+
+        replayed = 0
+        journal_generation = 0
+        retagged = set()  # Sessions whose tags the replayed events may have changed
+        for event in self._read_events():
+            if event.get('op') == 'begin':
+                journal_generation = event.get('generation', 0)
+            elif journal_generation >= self.generation:
+                apply_event(sessions, event)
+                replayed += 1
+                if event.get('op') == 'reset':
+                    retagged.clear()
+                    tag_index = tag_index and TagIndex()
+                elif event.get('op') in ('add', 'delete', 'tags'):
+                    retagged.add(event.get('name'))
+            # Otherwise the crash hit between writing the snapshot and truncating: already folded in
+        print(f"MusApp- Journal replayed {replayed} event(s) over {len(sessions)} session(s).")
+        if tag_index is not None:
+            # Bring the snapshot's index up to date, rather than rebuilding it
+            for name in retagged:
+                tag_index.set(name, tuple(sessions[name].get('tags') or ()) if name in sessions else ())
+        self._tag_index = tag_index
+        return sessions
+
+    def load_tag_index(self):
+        """The TagIndex load() read from the snapshot and updated with the replayed events, or None."""
+        tag_index, self._tag_index = self._tag_index, None
+        return tag_index
+
+    def save_tag_index(self, index):
+        """Nothing to write now: tag changes are journaled and the next snapshot carries the whole index."""
+
+    def record(self, op, name=None, **fields):
+        """Append a single change to the journal."""
+        event = {'op': op}
+        if name is not None:
+            event['name'] = name
+        if fields:
+            event['fields'] = fields
+        self._buffer.append(json.dumps(event, separators=(',', ':')) + '\n')
+        if self._depth == 0:
+            self._write_buffer()
+
+    @contextmanager
+    def transaction(self, operation):
+        """Buffer every event recorded inside the block and append them with one write."""
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._write_buffer()
+
+    def flush(self, force=False, wait=False):
+        """Make sure everything appended so far has reached the disk (appends are synchronous, so wait is implied)."""
+        self._write_buffer()
+        if force:
+            self.compact()
+        return True
+
+    def compact(self):
+        """Write the current state to the snapshot file and start a new, empty journal."""
+        with tracer.span('compact_journal', journal_bytes=self.journal_size):
+            return self._compact()
+
+    def _compact(self):
+        tmp_path = self.snapshot_path + '.tmp'
+        generation = self.generation + 1
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                snapshot = {'data': self.snapshot(), 'generation': generation}
+                if self.tag_snapshot is not None:
+                    snapshot['tag_index'] = self.tag_snapshot()
+                json.dump(snapshot, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self.bytes_written += os.path.getsize(self.snapshot_path)
+            # Restart the journal only after the snapshot is in place; until then the old
+            # lines carry an older generation and are skipped on replay
+            header = json.dumps({'op': 'begin', 'generation': generation}) + '\n'
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(header)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"MusApp- Error compacting journal: {e}")
+            return False
+
+        print(f"MusApp- Journal compacted ({self.journal_size} bytes folded into snapshot).")
+        self.generation = generation
+        self.journal_size = len(header)
+        self.bytes_written += len(header)
+        return True
+
+    def _write_buffer(self):
+        if not self._buffer:
+            return
+        data = ''.join(self._buffer).encode('utf-8')
+        self._buffer.clear()
+        try:
+            with tracer.span('save_data', backend='journal', bytes=len(data)), open(self.path, 'ab') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"MusApp- Error appending to journal: {e}")
+            return
+
+        self.writes += 1
+        self.bytes_written += len(data)
+        self.journal_size += len(data)
+        if self.journal_size > self.compact_threshold:
+            self.compact()
+
+    def _read_events(self):
+        """Yield every complete event, truncating a partially written last line left by a crash."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        self.journal_size = len(data)
+
+        good_end = 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break  # Torn write at the end of the file
+            try:
+                event = json.loads(line)
+            except ValueError:
+                print("MusApp- Skipping corrupt journal line.")
+            else:
+                yield event
+            good_end += len(line)
+
+        if good_end < len(data):
+            print(f"MusApp- Journal ends with a truncated line, discarding {len(data) - good_end} byte(s).")
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_end)
+            self.journal_size = good_end
+
+    def _migrate_legacy(self):
+        """Seed the journal from the old JsonStore file the first time the backend is used."""
+        if self.legacy_store is None or not self.legacy_store.exists('sessions'):
+            return {}
+        sessions = self.legacy_store.get('sessions')['data']
+        print(f"MusApp- Migrating {len(sessions)} session(s) from JsonStore into the journal.")
+        snapshot, tag_snapshot = self.snapshot, self.tag_snapshot
+        self.snapshot = lambda: sessions
+        self.tag_snapshot = None  # The library has not indexed these sessions yet; it builds the index from them
+        try:
+            self.compact()
+        finally:
+            self.snapshot, self.tag_snapshot = snapshot, tag_snapshot
+        return sessions
@@ -0,0 +1,163 @@
+"""Spaced-repetition "Up next" ordering: which sessions are due for practice first.
+
+Each session is due a number of days after its last practice. The interval grows with the
+practice count and is shorter for favorites; the session type (color) means nothing the app
+knows of, so it does not count. Sessions never practiced are due first. A session's due day only
+changes when the session does, so the days passing never reorder anything and the due days can
+live in an indexed binary heap: a change moves one entry in O(log n), and the top k are read from
+the heap in O(k log k) without sorting the library.
+"""
+import heapq
+
+from session_model import NEVER, ordinal_from_string
+
+FIRST_INTERVAL = 1.0  # Days before a session practiced once is due again
+EASE = 1.5  # Each further practice stretches the interval by this factor
+MAX_INTERVAL = 30.0  # Even well-practiced sessions come back within a month
+FAVORITE_FACTOR = 0.5  # Favorites come back twice as often
+# Practices past which the interval stops growing (FIRST_INTERVAL * EASE ** 9 is already past MAX_INTERVAL)
+MAX_EXPONENT = 16
+
+
+def interval(practice_count, is_favorite=False):
+    """Days between the last practice and the next one."""
+    days = min(MAX_INTERVAL, FIRST_INTERVAL * EASE ** min(max(practice_count - 1, 0), MAX_EXPONENT))
+    if is_favorite:
+        days *= FAVORITE_FACTOR
+    return days
+
+
+def due_day(last_practiced, practice_count, is_favorite=False):
+    """Date ordinal (fractional) a session is due on; NEVER for sessions never practiced, so they come first."""
+    if last_practiced == NEVER:
+        return NEVER
+    return last_practiced + interval(practice_count, is_favorite)
+
+
+def stored_due_day(last_practiced, practice_count, is_favorite):
+    """due_day() of a row as SQLite stores it ("YYYY-MM-DD" date, integer flag); registered as an SQL function."""
+    return due_day(ordinal_from_string(last_practiced), practice_count, bool(is_favorite))
+
+
+def due_key(session):
+    """Heap key of a Session; the name comes last so keys are unique, with ties in alphabetical order."""
+    return (due_day(session.last_practiced, session.practice_count, session.is_favorite),
+            session.name.lower(), session.name)
+
+
+class IndexedHeap:
+
+    def __init__(self, entries=()):
+        """Binary min-heap of (key, item) with each item's position, so any key can change in O(log n)."""
+        self._heap = list(entries)
+        heapq.heapify(self._heap)  # Same layout as the sifts below, built in C
+        self._positions = {item: index for index, (key, item) in enumerate(self._heap)}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def push(self, item, key):
+        """Add an item, or move it to a new key if it is already in the heap."""
+        index = self._positions.get(item)
+        if index is not None:
+            old_key = self._heap[index][0]
+            self._heap[index] = (key, item)
+            if key < old_key:
+                self._sift_up(index)
+            elif old_key < key:
+                self._sift_down(index)
+            return
+        self._heap.append((key, item))
+        self._positions[item] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def remove(self, item):
+        index = self._positions.pop(item, None)
+        if index is None:
+            return
+        last = self._heap.pop()
+        if index < len(self._heap):
+            # Fill the hole with the last entry and move it whichever way its key needs
+            self._heap[index] = last
+            self._positions[last[1]] = index
+            self._sift_down(index)
+            self._sift_up(self._positions[last[1]])
+
+    def smallest(self, k):
+        """The k items with the smallest keys, in key order, read without popping anything.
+
+        A child is never smaller than its parent, so the next smallest entry is always a child of
+        one already taken: a small frontier heap walks the top of the tree in O(k log k).
+        """
+        heap = self._heap
+        items = []
+        frontier = [(heap[0][0], 0)] if heap else []
+        while frontier and len(items) < k:
+            key, index = heapq.heappop(frontier)
+            items.append(heap[index][1])
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child][0], child))
+        return items
+
+    def _sift_up(self, index):
+        heap = self._heap
+        entry = heap[index]
+        while index > 0:
+            parent = (index - 1) // 2
+            if not entry[0] < heap[parent][0]:
+                break
+            heap[index] = heap[parent]
+            self._positions[heap[index][1]] = index
+            index = parent
+        heap[index] = entry
+        self._positions[entry[1]] = index
+
+    def _sift_down(self, index):
+        heap = self._heap
+        size = len(heap)
+        entry = heap[index]
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1][0] < heap[child][0]:
+                child += 1
+            if not heap[child][0] < entry[0]:
+                break
+            heap[index] = heap[child]
+            self._positions[heap[index][1]] = index
+            index = child
+        heap[index] = entry
+        self._positions[entry[1]] = index
+
+
+class PracticeSchedule:
+
+    def __init__(self, sessions=None):
+        """Due days of the sessions in an IndexedHeap, kept up to date as sessions change."""
+        self.sessions = sessions if sessions is not None else {}
+        self._heap = None  # Built the first time it is read, like the sort indexes
+
+    def reset(self, sessions):
+        """Point the schedule at a new sessions dict; the heap is rebuilt the next time it is needed."""
+        self.sessions = sessions
+        self._heap = None
+
+    def update(self, session):
+        """Add a session or move it to its new due day."""
+        if self._heap is not None:
+            self._heap.push(session.name, due_key(session))
+
+    def remove(self, name):
+        if self._heap is not None:
+            self._heap.remove(name)
+
+    def up_next(self, count):
+        """Names of the count sessions due first."""
+        if self._heap is None:
+            self._heap = IndexedHeap((due_key(session), name) for name, session in self.sessions.items())
+        return self._heap.smallest(count)
@@ -0,0 +1,166 @@
+"""Practice timer and metronome.
+
+Neither counts ticks. The timer's elapsed time is the difference between two clock readings,
+so it is exact however rarely the label showing it is refreshed, and the clock it reads keeps
+running while the device sleeps. The metronome computes every beat's deadline from the time it
+started (start + n * period) and sleeps until it on a thread of its own, so a late beat does
+not push the ones after it back the way chained Clock.schedule_interval() ticks would, and a
+busy UI thread cannot make the grid drift. Each beat is handed on with its deadline, so whoever
+plays it on another thread can tell how late it got there. Beats missed altogether (the device
+was suspended) are skipped rather than played in a burst.
+"""
+import math
+import struct
+import threading
+import time
+import wave
+from collections import deque
+
+from instrumentation import tracer
+
+MIN_BPM = 30
+MAX_BPM = 240
+
+
+def now():
+    """Seconds on a clock that keeps counting while the device sleeps (CLOCK_BOOTTIME where there is one)."""
+    return time.clock_gettime(time.CLOCK_BOOTTIME)
+
+
+if not hasattr(time, 'CLOCK_BOOTTIME'):
+    now = time.monotonic  # noqa: F811  Not Linux or Android: stops while suspended, but never jumps
+
+
+def format_elapsed(seconds):
+    """'MM:SS', or 'H:MM:SS' from an hour on."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+class PracticeTimer:
+
+    def __init__(self, session_name, elapsed=0.0, clock=now):
+        """Time spent practicing one session: runs between start() and pause(), read with elapsed()."""
+        self.session_name = session_name
+        self.clock = clock
+        self._elapsed = elapsed  # Seconds of the runs before the current one
+        self._started = None  # clock() when the current run started; None while paused
+
+    @property
+    def running(self):
+        return self._started is not None
+
+    def start(self):
+        if self._started is None:
+            self._started = self.clock()
+
+    def pause(self):
+        if self._started is not None:
+            self._elapsed += self.clock() - self._started
+            self._started = None
+
+    def elapsed(self):
+        if self._started is None:
+            return self._elapsed
+        return self._elapsed + self.clock() - self._started
+
+    def to_json(self):
+        """The timer as saved in settings.json, so it survives the app being closed while it runs.
+
+        The clock above restarts with the device, so a running timer is saved with the wall time too.
+        """
+        return {'session': self.session_name, 'elapsed': self.elapsed(), 'running': self.running,
+                'saved_at': time.time()}
+
+    @classmethod
+    def from_json(cls, data, clock=now):
+        elapsed = data['elapsed']
+        if data['running']:
+            elapsed += max(0.0, time.time() - data['saved_at'])  # The practice went on while the app was closed
+        timer = cls(data['session'], elapsed, clock)
+        if data['running']:
+            timer.start()
+        return timer
+
+
+class Metronome:
+
+    def __init__(self, on_beat, bpm=60, history=64):
+        """Call on_beat(beat, deadline) on every beat, from the metronome's own thread, at bpm beats per minute.
+
+        deadline is the time.monotonic() the beat was due at.
+        """
+        self.on_beat = on_beat
+        self.bpm = bpm
+        self.beats = 0
+        self.skipped = 0  # Beats not played because their time had passed by more than half a beat
+        self.lateness = deque(maxlen=history)  # Seconds each recent beat was played after its deadline
+        self._stop = None  # threading.Event of the running thread
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        """Start on the grid beginning now; a running metronome is restarted (e.g. at a new tempo)."""
+        self.stop()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop, 60.0 / self.bpm, time.monotonic()),
+                                        name='musapp-metronome', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def set_bpm(self, bpm):
+        self.bpm = min(MAX_BPM, max(MIN_BPM, bpm))
+        if self.running:
+            self.start()
+
+    def jitter(self):
+        """(mean, worst) lateness of the recent beats, in milliseconds."""
+        if not self.lateness:
+            return 0.0, 0.0
+        return sum(self.lateness) * 1000 / len(self.lateness), max(self.lateness) * 1000
+
+    def _run(self, stop, period, start):
+        beat = 0
+        while True:
+            deadline = start + beat * period
+            delay = deadline - time.monotonic()
+            if stop.wait(max(delay, 0)):
+                return
+            late = time.monotonic() - deadline
+            if late > period / 2:
+                # Too late to be heard as this beat; carry on from the next one still ahead
+                missed = math.ceil((late - period / 2) / period)
+                self.skipped += missed
+                beat += missed
+                continue
+            self.lateness.append(late)
+            self.beats += 1
+            tracer.count('metronome_beats')
+            try:
+                self.on_beat(beat, deadline)
+            except Exception as e:
+                print(f"MusApp- Metronome beat failed: {e}")
+            beat += 1
+
+
+def write_click(path, frequency=1760, duration=0.03, rate=22050):
+    """Write the metronome's click: a short sine burst with a fast decay, as 16-bit mono WAV."""
+    frames = int(rate * duration)
+    samples = (int(32767 * 0.8 * math.exp(-8 * i / frames) * math.sin(2 * math.pi * frequency * i / rate))
+               for i in range(frames))
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(struct.pack(f'<{frames}h', *samples))
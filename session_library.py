@@ -0,0 +1,448 @@
+from datetime import date
+
+from name_index import NameIndex, matches
+from practice_calendar import PracticeCalendar, count_day, count_days
+from practice_scheduler import PracticeSchedule
+from session_model import Session
+from session_store import SessionStore
+from sort_index import SortIndexes
+from tag_index import TagIndex, is_tag_query, tags_match
+
+# Backends whose every save rewrites all the sessions, in display order (journal replays and SQLite rows keep none)
+DISPLAY_ORDER_BACKENDS = ("json", "binary")
+
+
+def open_backend(backend, store, snapshot, tag_snapshot=None, rows=None):
+    """Create the storage backend named by STORAGE_BACKEND; the optional ones are imported on demand."""
+    if backend == "journal":
+        from practice_journal import PracticeJournal
+        return PracticeJournal(snapshot, legacy_store=store, tag_snapshot=tag_snapshot)
+    if backend == "sqlite":
+        from session_repository import SessionRepository, migrate_from_json_store
+        repository = SessionRepository('sessions.db')
+        migrate_from_json_store(store, repository)
+        return repository
+    if backend == "binary":
+        from binary_snapshot import BinarySessionStore
+        return BinarySessionStore(store, snapshot, rows)
+    return SessionStore(store, snapshot, tag_snapshot=tag_snapshot)
+
+
+class SessionLibrary:
+
+    def __init__(self, store, backend="json", paged=False, page_size=100, max_pages=30):
+        """The session data model behind MainApp: Session records, sort indexes and the storage backend.
+
+        Nothing here touches widgets, so it can be driven headless (see benchmarks/). With paged=True
+        and the sqlite backend, sessions are read from the database on demand (see paged_sessions.py).
+        """
+        self.backend = backend
+        self.display_order = None  # Optional callable returning the names in display order
+        self.on_change = None  # Optional callable(op, name) told about every recorded change (sync tracking)
+        self.tag_index = TagIndex()  # Saved by the backend with the sessions, so startup does not rebuild it
+        self.persistence = open_backend(backend, store, self.serialize, self.serialize_tags, self.serialize_rows)
+        self.paged = paged and backend == "sqlite"  # The JSON files can only be read whole
+        if self.paged:
+            from paged_sessions import PagedSessions
+            self.sessions = PagedSessions(self.persistence, page_size, max_pages)
+        else:
+            self.sessions = {}  # Runtime dictionary of Session records, keyed by name
+        self.sort_indexes = SortIndexes(self.sessions)  # Unused when paged; the database orders the sessions
+        self.name_index = NameIndex(self.sessions)
+        self.schedule = PracticeSchedule(self.sessions)  # Unused when paged, like the sort indexes
+        self.calendar = PracticeCalendar(self.count_days, self.count_day)  # Feeds the calendar heatmap
+
+    def load(self):
+        """Load the stored sessions; dates are parsed exactly once here. Returns the number loaded."""
+        self.calendar.clear()
+        if self.paged:
+            self.sessions.clear()
+            self.tag_index = self._load_tag_index()
+            return len(self.sessions)  # Nothing else is read until a page is asked for
+        if self.backend == "binary":
+            self.sessions = self.persistence.load_sessions()  # Each record is decoded when first read
+        else:
+            stored_sessions = self.persistence.load()
+            self.sessions = {name: Session.from_json(name, data) for name, data in stored_sessions.items()}
+        self.sort_indexes.reset(self.sessions)
+        self.name_index.reset(self.sessions)
+        self.schedule.reset(self.sessions)
+        self.tag_index = self._load_tag_index()
+        return len(self.sessions)
+
+    def _load_tag_index(self):
+        """The tag index the backend saved with the sessions, or one built from the tagged sessions."""
+        tag_index = self.persistence.load_tag_index()
+        if tag_index is None:
+            tag_index = TagIndex.build(self._tagged())
+            print(f"MusApp- Tag index built over {len(tag_index)} tagged session(s).")
+            if self.backend == "sqlite":
+                self.persistence.save_tag_index(tag_index)
+                self.persistence.flush()
+        return tag_index
+
+    def _tagged(self):
+        if self.paged:
+            return self.persistence.tagged()  # Only the tagged rows are read
+        if hasattr(self.sessions, 'tagged'):
+            return self.sessions.tagged()  # Read off the binary snapshot without decoding its records
+        return ((name, session.tags) for name, session in self.sessions.items())
+
+    def serialize(self):
+        """Build the JSON-serializable copy of the sessions, in display order when it is known."""
+        serializable_sessions = {}
+        for name in self._saved_order():
+            try:
+                serializable_sessions[name] = self.sessions[name].to_json()
+            except Exception as e:
+                print(f"MusApp- Error processing session '{name}': {e}")
+        return serializable_sessions
+
+    def serialize_rows(self):
+        """The sessions as binary snapshot rows, in display order when it is known (see binary_snapshot.py)."""
+        from binary_snapshot import snapshot_rows
+        return snapshot_rows(self.sessions, self._saved_order())
+
+    def _saved_order(self):
+        displayed = self.display_order() if self.display_order is not None else ()
+        return displayed if len(displayed) == len(self.sessions) else list(self.sessions)
+
+    def serialize_tags(self):
+        return self.tag_index.to_json()
+
+    def record(self, op, session_name=None, **fields):
+        """Hand a single change to the storage backend, which decides when and how to write it."""
+        if self.tag_index.changed:
+            self.persistence.save_tag_index(self.tag_index)  # Committed with the change
+        self.persistence.record(op, session_name, **fields)
+        self._notify(op, session_name)
+        if self.paged:
+            self.sessions.changed(resized=op in ("add", "delete", "reset", "restore"))
+
+    @property
+    def saves_display_order(self):
+        """True when the stored order is the order the list showed at the last save."""
+        return self.backend in DISPLAY_ORDER_BACKENDS and not self.paged
+
+    def startup_order(self, sort_mode=None):
+        """Session names in the order the list opens in after a load, given the saved sort mode.
+
+        When paged, this is a PagedOrdering: nothing past the pages the list shows is read.
+        """
+        if self.saves_display_order or not (sort_mode or self.paged):
+            # The stored order already is the chosen sort (or, without one, the order sessions were added in)
+            return list(self.sessions)
+        return self.ordering(sort_mode)  # Alphabetical when paged and unsorted
+
+    def sort_changed(self):
+        """Save again after the list was sorted, so the stored order matches the display."""
+        if self.saves_display_order:
+            self.persistence.mark_dirty("sort")
+
+    def ordering(self, criteria):
+        """Session names in the order of a SortPopup criterion, without sorting the library."""
+        if self.paged:
+            return self.sessions.ordering(criteria)  # Read a page at a time as the list scrolls
+        if self.backend == "sqlite":
+            # Let the database walk the matching index
+            return self.persistence.sorted_names(criteria)
+        return self.sort_indexes.ordering(criteria)
+
+    def up_next(self, count):
+        """Names of the count sessions due for practice first (see practice_scheduler.py)."""
+        if self.paged:
+            return self.persistence.up_next(count)  # Nothing is in memory to keep a heap of
+        return self.schedule.up_next(count)
+
+    def count_days(self, first, last, name=None):
+        """{day: practices} between first and last, of one session or (name None) of all of them."""
+        if self.paged:
+            return self.persistence.count_days(first, last, name)  # Counted by the database
+        return count_days(self._histories(name), first, last)
+
+    def count_day(self, day, name=None):
+        if self.paged:
+            return self.persistence.count_day(day, name)
+        return count_day(self._histories(name), day)
+
+    def _histories(self, name):
+        if name is None:
+            return [session.history for session in self.sessions.values() if session.history]
+        session = self.sessions.get(name)
+        return [session.history] if session is not None and session.history else []
+
+    def search(self, query, criteria=None):
+        """Names with a word starting with the query, in the order of a sort criterion (alphabetical if none).
+
+        A query of '#' terms filters by tag instead (see tag_index.py).
+        """
+        if is_tag_query(query):
+            names = self.tag_index.search(query, self.sessions)
+            if self.paged:
+                self.sessions.prefetch(names)
+            return self.sort_indexes.sorted_subset(names, criteria)
+        if self.paged:
+            return self.sessions.ordering(criteria, query)
+        return self.sort_indexes.sorted_subset(self.name_index.search(query), criteria)
+
+    def matches(self, name, query):
+        """Whether search(query) would return the named session."""
+        if is_tag_query(query):
+            session = self.sessions.get(name)
+            return session is not None and tags_match(session.tags, query)
+        return matches(name, query)
+
+    def add(self, name, last_practiced=None, practice_count=0, is_favorite=False, session_type=0):
+        """Add (or replace) a session and record it."""
+        session = Session(name, practice_count=practice_count, is_favorite=is_favorite, session_type=session_type)
+        session.last_practiced_date = last_practiced
+        return self.put(session)
+
+    def put(self, session):
+        """Add (or replace) a Session record as it is, history included, and record it.
+
+        Also how a deleted or replaced session is put back when its removal is undone.
+        """
+        name = session.name
+        previous = self.sessions.get(name)
+        if previous is not None:
+            self.sort_indexes.remove(name)
+            self.name_index.remove(name)
+            self._invalidate_days(previous)
+        self.sessions[name] = session
+        self._invalidate_days(session)
+        self.sort_indexes.add(session)
+        self.name_index.add(name)
+        self.schedule.update(session)
+        self.tag_index.set(name, session.tags)
+        self.record("add", name, **session.to_json())
+        return session
+
+    def merge(self, imported, policy="merge"):
+        """Merge imported Session records into the library without recording anything yet.
+
+        The policy decides what happens to an existing session of the same name: "skip" keeps it,
+        "replace" swaps in the imported one, and "merge" keeps the higher practice count, the later
+        date and the existing history while taking the imported type and favorite flag (or-ed).
+        Returns (added, updated, replaced, skipped); call commit_import() when the import is done.
+        """
+        added, updated, replaced = [], [], []
+        skipped = 0
+        changed = []  # Session records to write when paged
+        if self.paged:
+            self.sessions.prefetch(incoming.name for incoming in imported)
+        for incoming in imported:
+            name = incoming.name
+            existing = self.sessions.get(name)
+            if existing is None:
+                self.sessions[name] = incoming
+                added.append(name)
+                changed.append(incoming)
+            elif policy == "skip":
+                skipped += 1
+            elif policy == "replace":
+                self.sessions[name] = incoming
+                replaced.append(name)
+                changed.append(incoming)
+            else:
+                existing.practice_count = max(existing.practice_count, incoming.practice_count)
+                existing.last_practiced = max(existing.last_practiced, incoming.last_practiced)
+                existing.is_favorite = existing.is_favorite or incoming.is_favorite
+                existing.session_type = incoming.session_type
+                existing.tags = tuple(sorted({*existing.tags, *incoming.tags}))
+                updated.append(name)
+                changed.append(existing)
+        for session in changed:
+            self.tag_index.set(session.name, session.tags)
+        if changed:
+            self.calendar.clear()  # Replaced records take their practices with them
+        if self.paged:
+            # Written with every chunk: the session cache may drop these records before commit_import()
+            self._write_sessions(changed, replaced)
+        elif added or updated or replaced:
+            # Rebuilt lazily on the next read; cheaper than inserting every imported session
+            self.sort_indexes.reset(self.sessions)
+            self.name_index.reset(self.sessions)
+            self.schedule.reset(self.sessions)
+        return added, updated, replaced, skipped
+
+    def commit_import(self, names, replaced=()):
+        """Persist the sessions touched by an import with one write."""
+        if self.paged:
+            return  # merge() already wrote each chunk
+        if self.backend in DISPLAY_ORDER_BACKENDS:
+            self.record("import")  # The next snapshot carries every imported session
+            self.persistence.flush()
+            return
+        if self.backend == "journal":
+            self.persistence.compact()  # One snapshot instead of a journal line per session
+            self._notify("import")
+            return
+        # Sessions deleted while the import was running are left out
+        sessions = [self.sessions[name] for name in dict.fromkeys([*names, *replaced]) if name in self.sessions]
+        self._write_sessions(sessions, replaced)
+
+    def _invalidate_days(self, session):
+        """Mark every day a session added or removed as a whole has practices on."""
+        if session.history:
+            self.calendar.invalidate(session.name, set(session.history.days))
+
+    def _notify(self, op, session_name=None):
+        if self.on_change is not None:
+            self.on_change(op, session_name)
+
+    def _write_sessions(self, sessions, replaced=()):
+        """Write imported Session records to the database in one transaction."""
+        with self.persistence.transaction("import"):
+            for name in replaced:
+                self.record("delete", name)  # The old practice history goes with the replaced record
+            for session in sessions:
+                self.record("add", session.name, **session.to_json())
+
+    def toggle_favorite(self, name):
+        session = self.sessions.get(name)
+        if session is None:
+            return None
+        session.is_favorite = not session.is_favorite
+        self.sort_indexes.update(session)
+        self.schedule.update(session)
+        self.record("favorite", name, is_favorite=session.is_favorite)
+        return session
+
+    def set_session_type(self, name, session_type):
+        session = self.sessions.get(name)
+        if session is None:
+            return None
+        # Color orderings are derived from the name index at read time, and the due day ignores colors
+        session.session_type = session_type
+        self.record("type", name, session_type=session_type)
+        return session
+
+    def set_tags(self, name, tags):
+        """Replace the tags of a session with normalized ones (see tag_index.parse_tags)."""
+        session = self.sessions.get(name)
+        if session is None:
+            return None
+        session.tags = tags
+        self.tag_index.set(name, tags)
+        self.record("tags", name, tags=list(tags))
+        return session
+
+    def set_last_practiced(self, name, selected_date):
+        """Change the last practice date; the latest logged practice moves with it."""
+        session = self.sessions.get(name)
+        if session is None:
+            return None
+        with self.persistence.transaction("date"):
+            session.last_practiced_date = selected_date
+            self.sort_indexes.update(session)
+            self.schedule.update(session)
+            if session.history:
+                moved_from = session.history.move_last(session.last_practiced)
+                self.calendar.invalidate(name, (moved_from, session.last_practiced))
+                self.record("history", name, day=session.last_practiced, replace_last=True)
+            self.record("date", name, last_practiced=selected_date.strftime('%Y-%m-%d'))
+        return session
+
+    def revert_last_practiced(self, name, last_practiced, day, moved_from=None):
+        """Undo set_last_practiced(): put back the previous date ordinal and, if the latest logged
+        practice was moved to day, move it back to the day it came from.
+        """
+        session = self.sessions.get(name)
+        if session is None:
+            return None
+        session.last_practiced = last_practiced
+        self.sort_indexes.update(session)
+        self.schedule.update(session)
+        with self.persistence.transaction("date"):
+            if moved_from is not None and session.history:
+                duration = session.history.remove(day)
+                if duration is not None:
+                    session.history.add(moved_from, duration)
+                    self.calendar.invalidate(name, (day, moved_from))
+                    self.record("history", name, day=day, remove=True)
+                    self.record("history", name, day=moved_from, duration=duration)
+            self.record("date", name, last_practiced=session.last_practiced_string)
+        return session
+
+    def practice(self, name, duration=0, today=None):
+        """Set the last practice date to today, increment the practice count and log the practice."""
+        session = self.sessions.get(name)
+        if session is None:
+            return None
+        session.last_practiced_date = today or date.today()
+        session.practice_count += 1
+        session.practice_history().add(session.last_practiced, duration)
+        self.calendar.invalidate(name, (session.last_practiced,))
+        self.sort_indexes.update(session)
+        self.schedule.update(session)
+        # Leave session_type unchanged during this operation
+        with self.persistence.transaction("practice"):
+            self.record("practice", name, last_practiced=session.last_practiced_string,
+                        practice_count=session.practice_count)
+            self.record("history", name, day=session.last_practiced, duration=duration)
+        return session
+
+    def unpractice(self, name, day, last_practiced, practice_count):
+        """Undo practice(): drop the practice it logged on day and put back the previous date and count."""
+        session = self.sessions.get(name)
+        if session is None:
+            return None
+        session.last_practiced = last_practiced
+        session.practice_count = practice_count
+        if session.history:
+            session.history.remove(day)
+        self.calendar.invalidate(name, (day,))
+        self.sort_indexes.update(session)
+        self.schedule.update(session)
+        with self.persistence.transaction("practice"):
+            self.record("practice", name, last_practiced=session.last_practiced_string,
+                        practice_count=practice_count)
+            self.record("history", name, day=day, remove=True)
+        return session
+
+    def delete(self, name):
+        session = self.sessions.pop(name, None)
+        if session is not None:
+            self.sort_indexes.remove(name)
+            self.name_index.remove(name)
+            self.schedule.remove(name)
+            self.tag_index.remove(name)
+            self._invalidate_days(session)
+        self.record("delete", name)
+        return session
+
+    def reset(self):
+        """Remove every session. Returns the removed sessions for restore_all(): the dict itself, not a copy."""
+        removed = None
+        if self.paged:
+            self.sessions.clear()  # The database sets the rows aside (see SessionRepository.stash)
+        else:
+            removed = self.sessions
+            self.sessions = {}
+        self.sort_indexes.reset(self.sessions)
+        self.name_index.reset(self.sessions)
+        self.schedule.reset(self.sessions)
+        self.tag_index = TagIndex()
+        self.calendar.clear()
+        self.record("reset")
+        return removed
+
+    def restore_all(self, sessions):
+        """Undo reset(): swap back the dict it returned while the backend restores what it stored."""
+        self.calendar.clear()
+        if not self.paged:
+            self.sessions = sessions
+            self.sort_indexes.reset(self.sessions)
+            self.name_index.reset(self.sessions)
+            self.schedule.reset(self.sessions)
+            self.tag_index = TagIndex.build(self._tagged())
+        if self.backend == "journal":
+            self.persistence.compact()  # One snapshot rather than a journal line per session
+            self._notify("restore")
+        else:
+            self.record("restore")  # The JSON file is rewritten; SQLite moves the stashed rows back
+        if self.paged:
+            self.tag_index = TagIndex.build(self._tagged())  # From the rows just moved back
+            self.persistence.save_tag_index(self.tag_index)
+            self.persistence.flush()
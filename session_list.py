@@ -0,0 +1,373 @@
+from collections.abc import Sequence
+
+from kivy.clock import Clock
+from kivy.lang import Builder
+from kivy.metrics import dp
+from kivy.properties import BooleanProperty, StringProperty
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivymd.uix.list import ThreeLineAvatarIconListItem
+
+from instrumentation import tracer
+
+KV = '''
+<SessionListItem>:
+    IconLeftWidget:
+        icon: "star" if root.is_favorite else "star-outline"
+        on_release: app.toggle_favorite(root.session_name)
+
+    IconRightWidget:
+        icon: "dots-vertical"
+        on_release: app.show_item_popup(root.session_name)
+'''
+
+# The data entry of every row of a paged list; the real row is built when a widget is bound to it
+PLACEHOLDER_ROW = {}
+
+
+class SessionListItem(RecycleDataViewBehavior, ThreeLineAvatarIconListItem):
+    """Recycled row for the session RecycleView; every field comes from the data dict it is bound to."""
+    session_name = StringProperty()
+    is_favorite = BooleanProperty(False)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        tracer.count('widgets_created')
+
+    def on_kv_post(self, base_widget):
+        super().on_kv_post(base_widget)
+        self.ids._lbl_primary.bold = True
+
+    def refresh_view_attrs(self, rv, index, data):
+        if data is PLACEHOLDER_ROW:
+            data = rv.session_rows.paged_row(index)
+        super().refresh_view_attrs(rv, index, data)
+
+
+class RowOptions(Sequence):
+
+    def __init__(self, layout, count):
+        """The per-row sizing options RecycleLayout expects, computed from the index for rows of one height."""
+        self.layout = layout
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        layout = self.layout
+        left, top, right, bottom = layout.padding
+        height = layout.default_height
+        return {
+            'size': [layout.width - left - right, height],
+            'size_hint': list(layout.default_size_hint),
+            'size_hint_min': list(layout.default_size_hint_min),
+            'size_hint_max': list(layout.default_size_hint_max),
+            'pos': [layout.x + left, layout.top - top - (index + 1) * height - index * layout.spacing],
+            'pos_hint': layout.default_pos_hint,
+            'viewclass': layout.viewclass,
+            'width_none': False,
+            'height_none': False,
+        }
+
+
+class FixedRowLayout(RecycleBoxLayout):
+    """Vertical RecycleView layout for full-width rows that are all default_height tall.
+
+    RecycleBoxLayout keeps a dict of sizing options and a position for every data entry and walks
+    them all on each change; here both are computed from the row index, so laying out the list
+    costs the same for a hundred rows as for a million.
+    """
+
+    def compute_sizes_from_data(self, data, flags):
+        self.clear_layout()
+        self.view_opts = RowOptions(self, len(data))
+
+    def compute_layout(self, data, flags):
+        self._size_needs_update = False
+        self._changed_views = None
+        self.clear_layout()  # Positions depend on the total height, so every visible row is placed again
+        left, top, right, bottom = self.padding
+        count = len(data)
+        self.minimum_size = (left + right,
+                             top + bottom + count * self.default_height + max(0, count - 1) * self.spacing)
+
+    def get_view_index_at(self, pos):
+        count = len(self.view_opts)
+        if not count:
+            return 0
+        index = int((self.top - self.padding[1] - pos[1]) // (self.default_height + self.spacing))
+        return min(max(index, 0), count - 1)
+
+    def compute_visible_views(self, data, viewport):
+        if not data:
+            return []
+        x, y, w, h = viewport
+        return list(range(self.get_view_index_at((x, y + h)), self.get_view_index_at((x, y)) + 1))
+
+
+class SessionRows:
+
+    def __init__(self, view, build_row, chunk_size=250, row_height=dp(88)):
+        """Keep one RecycleView data entry per session and an O(1) name -> position index."""
+        self.view = view
+        view.session_rows = self  # Lets the rows of a paged list find their data
+        self.build_row = build_row  # Callable: session name -> data dict
+        self.chunk_size = chunk_size
+        self.row_height = row_height
+        self.rows = {}  # name -> data dict, reused across reorderings
+        self.order = []  # Full target ordering; view.data holds a prefix of it while rendering
+        self.paged = False  # True while order is a lazily read sequence (see show_paged)
+        self._positions = {}
+        self._positions_valid = True
+        self._built = 0  # Rows of self.order built so far
+        self._render_event = None
+        self._on_complete = None
+
+    def show(self, names, on_first_frame=None, on_complete=None):
+        """Reconcile the list with a new ordering, reusing the rows that already exist.
+
+        When many rows still have to be built, the first screenful is shown straight away and
+        the rest is built chunk_size rows per frame. Built rows are handed to the RecycleView
+        in doubling batches because every data change makes it recompute the whole layout.
+        """
+        if self._render_event is not None:
+            self._render_event.cancel()  # A newer ordering supersedes the one still being rendered
+            self._render_event = None
+
+        names = list(names)
+        # The data is replaced in one assignment whatever changed: the layout is recomputed once either way
+        changed = self.paged or names != self.order or len(self.view.data) != len(self.order)
+        self.order = names
+        self.paged = False
+        self._positions_valid = False
+        for name in set(self.rows).difference(names):
+            del self.rows[name]
+
+        missing = sum(1 for name in names if name not in self.rows)
+        if missing <= self.chunk_size:
+            if changed or missing:
+                self.view.data = [self._row(name) for name in names]
+            self._built = len(names)
+            self._finish(on_first_frame, on_complete)
+            return
+
+        first_screen = int(self.view.height // self.row_height) + 2
+        self.view.data = [self._row(name) for name in names[:first_screen]]
+        self._built = min(first_screen, len(names))
+        self._on_complete = on_complete
+        if on_first_frame is not None:
+            Clock.schedule_once(lambda dt: on_first_frame())
+        self._render_event = Clock.schedule_once(self._render_next_chunk)
+
+    def show_paged(self, names, on_first_frame=None, on_complete=None):
+        """Show a lazily read ordering, such as a PagedOrdering, without building a row per session.
+
+        Every data entry is the same placeholder, and a row is read from the ordering only when a
+        widget is bound to it, so the list costs one reference per session however long it is.
+        """
+        if self._render_event is not None:
+            self._render_event.cancel()
+            self._render_event = None
+        self.order = names
+        self.paged = True
+        self.rows.clear()  # Rows are built per widget binding instead
+        self.view.data = [PLACEHOLDER_ROW] * len(names)
+        self.view.refresh_from_data()  # Placeholder lists of the same length compare equal, which is no change to Kivy
+        self._built = len(names)
+        self._finish(on_first_frame, on_complete)
+
+    def paged_row(self, index):
+        """Build the data entry of one row of a paged list."""
+        try:
+            row = self.build_row(self.order[index])
+        except (IndexError, KeyError):
+            return {}  # The ordering shrank under the widget; refresh_paged() rebinds it
+        tracer.count('rows_built')
+        return row
+
+    def refresh_paged(self):
+        """Resize a paged list to its ordering and rebind the bound widgets after the ordering changed.
+
+        Returns the number of widgets rebound.
+        """
+        data = self.view.data
+        count = len(self.order)
+        if count > len(data):
+            data.extend([PLACEHOLDER_ROW] * (count - len(data)))
+        elif count < len(data):
+            del data[count:]
+        rebound = 0
+        for index, widget in self._bound_views():
+            if index < count:
+                widget.refresh_view_attrs(self.view, index, PLACEHOLDER_ROW)
+                rebound += 1
+        return rebound
+
+    def invalidate(self, names):
+        """Drop the cached rows of sessions changed behind the list's back; the next show() rebuilds them."""
+        for name in names:
+            self.rows.pop(name, None)
+
+    def show_subset(self, names):
+        """Show only some sessions, e.g. search results, in the given order.
+
+        Costs O(len(names)): no diff against the current ordering, and the cached rows of hidden
+        sessions are kept (and still updated) so they are not rebuilt when they come back.
+        """
+        if self._render_event is not None:
+            self._render_event.cancel()
+            self._render_event = None
+        self.order = list(names)
+        self.paged = False
+        self._positions_valid = False
+        self.view.data = [self._row(name) for name in self.order]
+        self._built = len(self.order)
+
+    def update(self, name):
+        """Rebuild one session's row and push it to the view only if something visible changed."""
+        if self.paged:
+            return bool(self.refresh_paged())  # The change may have moved the session to another page
+        row = self.rows.get(name)
+        if row is None:
+            return False
+        changes = {key: value for key, value in self.build_row(name).items() if row.get(key) != value}
+        if not changes:
+            return False
+        row.update(changes)
+        position = self.index_of(name)
+        if position is not None and position < len(self.view.data):
+            self.view.data[position] = row  # Refreshes just this row
+        return True
+
+    def refresh_field(self, key, value_for):
+        """Recompute one field of every cached row and push it only to row widgets whose value changed.
+
+        Rows are updated in place and the RecycleView data is not reassigned, so nothing is
+        re-sorted, rebuilt or laid out again. Widgets on screen, and the ones just scrolled off
+        (which are reused without a refresh), get the new value directly; every other widget picks
+        it up when it is next bound to a row. Returns the number of rows that changed.
+        """
+        if self.paged:
+            return self.refresh_paged()  # No rows are cached; rebuilding the bound ones is enough
+        changed = 0
+        for name, row in self.rows.items():
+            value = value_for(name)
+            if row.get(key) != value:
+                row[key] = value
+                changed += 1
+
+        data = self.view.data
+        for index, widget in self._bound_views():
+            if index < len(data) and getattr(widget, key) != data[index][key]:
+                setattr(widget, key, data[index][key])
+        return changed
+
+    def append(self, name):
+        """Add a session at the end of the current ordering."""
+        if self.paged:
+            self.refresh_paged()  # The ordering already places the new session
+            return
+        self.order.append(name)
+        self._positions[name] = len(self.order) - 1
+        if self._render_event is None:
+            self.view.data.append(self._row(name))
+            self._built = len(self.order)
+        # Otherwise the chunk renderer reaches it when it gets to the end of the ordering
+
+    def insert(self, name, position=None):
+        """Add a session at a position of the current ordering, or at the end."""
+        if self.paged or position is None or position >= len(self.order):
+            self.append(name)
+            return
+        self.order.insert(position, name)
+        if position < len(self.view.data):
+            self.view.data.insert(position, self._row(name))
+        if position < self._built:
+            self._built += 1
+        self._positions_valid = False  # Later positions shifted; rebuilt on the next lookup
+
+    def remove(self, name):
+        """Remove a session's row from the ordering and the view."""
+        self.rows.pop(name, None)
+        return self.hide(name)
+
+    def hide(self, name):
+        """Take a session out of the ordering and the view but keep its cached row, brought up to date.
+
+        For a session that still exists but no longer matches the filter shown, so its row is not
+        rebuilt when the filter is cleared.
+        """
+        if self.paged:
+            self.refresh_paged()
+            return True
+        row = self.rows.get(name)
+        if row is not None:
+            row.update(self.build_row(name))
+        position = self.index_of(name)
+        if position is None:
+            return False
+        del self.order[position]
+        if position < len(self.view.data):
+            del self.view.data[position]
+        if position < self._built:
+            self._built -= 1
+        self._positions_valid = False  # Later positions shifted; rebuilt on the next lookup
+        return True
+
+    def clear(self):
+        self.show([])
+
+    def index_of(self, name):
+        """Position of a session in the current ordering, or None (always None for a paged list)."""
+        if self.paged:
+            return None  # Would read every page
+        if not self._positions_valid:
+            self._positions = {name: index for index, name in enumerate(self.order)}
+            self._positions_valid = True
+        return self._positions.get(name)
+
+    def _bound_views(self):
+        """(index, widget) for the widgets on screen and the ones just scrolled off, which are reused without a refresh."""
+        adapter = self.view.view_adapter
+        bound_views = list(adapter.views.items())
+        for views in adapter.dirty_views.values():
+            bound_views.extend(views.items())
+        return bound_views
+
+    def _row(self, name):
+        row = self.rows.get(name)
+        if row is None:
+            row = self.rows[name] = self.build_row(name)
+            tracer.count('rows_built')
+        return row
+
+    def _render_next_chunk(self, dt):
+        """Build the next chunk of rows, publishing them once they match what is already shown."""
+        end = min(self._built + self.chunk_size, len(self.order))
+        with tracer.span('render_chunk', rows=end - self._built):
+            for name in self.order[self._built:end]:
+                self._row(name)
+        self._built = end
+
+        data = self.view.data
+        if self._built == len(self.order) or self._built - len(data) >= len(data):
+            data.extend(self._row(name) for name in self.order[len(data):self._built])
+
+        if self._built < len(self.order):
+            self._render_event = Clock.schedule_once(self._render_next_chunk)
+        else:
+            self._render_event = None
+            self._finish(None, self._on_complete)
+            self._on_complete = None
+
+    def _finish(self, on_first_frame, on_complete):
+        if on_first_frame is not None:
+            Clock.schedule_once(lambda dt: on_first_frame())
+        if on_complete is not None:
+            Clock.schedule_once(lambda dt: on_complete())
+
+
+Builder.load_string(KV)
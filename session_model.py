@@ -0,0 +1,79 @@
+from datetime import date
+
+from practice_history import PracticeHistory
+
+DATE_FORMAT = "%Y-%m-%d"
+NEVER = 0  # Ordinal used for sessions that have never been practiced
+SESSION_COLORS = ['#FFCDD2', '#C8E6C9', '#BBDEFB', '#FFF9C4']  # Red, Green, Blue, Yellow; indexed by session_type
+
+
+class Session:
+    """One practice session; the last practice date is kept as a date ordinal so sorting compares ints."""
+    __slots__ = ('name', 'last_practiced', 'practice_count', 'is_favorite', 'session_type', 'history', 'tags')
+
+    def __init__(self, name, last_practiced=NEVER, practice_count=0, is_favorite=False, session_type=0,
+                 history=None, tags=()):
+        self.name = name
+        self.last_practiced = last_practiced
+        self.practice_count = practice_count
+        self.is_favorite = is_favorite
+        self.session_type = session_type
+        self.history = history  # PracticeHistory, created on the first recorded practice
+        self.tags = tags  # Sorted tuple of normalized tags (see tag_index.parse_tags)
+
+    @classmethod
+    def from_json(cls, name, data):
+        """Build a Session from its sessions_data.json entry; the only place dates get parsed."""
+        return cls(
+            name,
+            last_practiced=ordinal_from_string(data.get('last_practiced')),
+            practice_count=data.get('practice_count', 0),
+            is_favorite=data.get('is_favorite', False),
+            session_type=data.get('session_type', 0),  # Default to 0 if missing
+            history=PracticeHistory.from_json(data) if data.get('history') else None,
+            tags=tuple(data.get('tags') or ())
+        )
+
+    def to_json(self):
+        """Return the sessions_data.json entry for this session."""
+        data = {
+            'last_practiced': self.last_practiced_string,
+            'practice_count': self.practice_count,
+            'is_favorite': self.is_favorite,
+            'session_type': self.session_type
+        }
+        if self.tags:
+            data['tags'] = list(self.tags)
+        if self.history:
+            data.update(self.history.to_json())
+        return data
+
+    def practice_history(self):
+        """Return the session's history, creating an empty one the first time it is needed."""
+        if self.history is None:
+            self.history = PracticeHistory()
+        return self.history
+
+    @property
+    def last_practiced_date(self):
+        return None if self.last_practiced == NEVER else date.fromordinal(self.last_practiced)
+
+    @last_practiced_date.setter
+    def last_practiced_date(self, value):
+        self.last_practiced = NEVER if value is None else value.toordinal()
+
+    @property
+    def last_practiced_string(self):
+        return None if self.last_practiced == NEVER else date.fromordinal(self.last_practiced).strftime(DATE_FORMAT)
+
+    def __repr__(self):
+        return (f"Session({self.name!r}, last_practiced={self.last_practiced_string!r}, "
+                f"practice_count={self.practice_count}, is_favorite={self.is_favorite}, "
+                f"session_type={self.session_type}, tags={self.tags!r})")
+
+
+def ordinal_from_string(value):
+    """Convert a stored "YYYY-MM-DD" string (or None) to a date ordinal."""
+    if not value:
+        return NEVER
+    return date.fromisoformat(value).toordinal()
@@ -0,0 +1,395 @@
+import sqlite3
+from contextlib import contextmanager
+
+from instrumentation import tracer
+from name_index import matches
+from practice_scheduler import stored_due_day
+from tag_index import TagIndex
+
+SESSION_FIELDS = ('last_practiced', 'practice_count', 'is_favorite', 'session_type', 'tags')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    name TEXT PRIMARY KEY,
+    last_practiced TEXT,
+    practice_count INTEGER NOT NULL DEFAULT 0,
+    is_favorite INTEGER NOT NULL DEFAULT 0,
+    session_type INTEGER NOT NULL DEFAULT 0,
+    tags TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_name ON sessions (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_sessions_practice_count ON sessions (practice_count DESC, name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_sessions_last_practiced ON sessions (last_practiced DESC, name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_sessions_favorite ON sessions (is_favorite DESC, name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_sessions_type ON sessions (session_type, name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS practice_log (
+    name TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    duration INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_practice_log_name ON practice_log (name, day);
+CREATE INDEX IF NOT EXISTS idx_practice_log_day ON practice_log (day);
+CREATE TABLE IF NOT EXISTS sessions_reset (
+    generation INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    last_practiced TEXT,
+    practice_count INTEGER NOT NULL DEFAULT 0,
+    is_favorite INTEGER NOT NULL DEFAULT 0,
+    session_type INTEGER NOT NULL DEFAULT 0,
+    tags TEXT
+);
+CREATE TABLE IF NOT EXISTS practice_log_reset (
+    generation INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    duration INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tag_ids (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tag_bits (
+    tag TEXT PRIMARY KEY,
+    bits BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+# ORDER BY clause for every SortPopup criterion; each one is covered by an index above
+ORDER_BY = {
+    'alphabetical': 'name COLLATE NOCASE',
+    'practice_count': 'practice_count DESC, name COLLATE NOCASE',
+    'last_practice': 'last_practiced DESC, name COLLATE NOCASE',
+    'favourites': 'is_favorite DESC, name COLLATE NOCASE',
+}
+
+COLUMNS = 'name, last_practiced, practice_count, is_favorite, session_type, tags'
+
+# Names per "IN (...)" query, well under SQLite's bound parameter limit
+FETCH_BATCH = 500
+
+
+def search_filter(query):
+    """WHERE clause and parameters for the sessions with a word starting with query (all sessions if empty).
+
+    matches_query is name_index.matches, so results agree with the in-memory search; for ASCII
+    queries a LIKE runs first so Python only sees the candidate rows.
+    """
+    if not query:
+        return '1', ()
+    if query.isascii():
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return "name LIKE ? ESCAPE '\\' AND matches_query(name, ?)", (pattern, query)
+    return 'matches_query(name, ?)', (query,)  # LIKE only folds ASCII case
+
+
+class SessionRepository:
+
+    def __init__(self, path='sessions.db'):
+        """Open (or create) the SQLite session database in WAL mode."""
+        self.path = path
+        self.writes = 0
+        self._depth = 0
+        self._stashes = []  # Generations of the rows set aside by resets, newest last
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        for table in ('sessions', 'sessions_reset'):
+            self._add_column(table, 'tags', 'TEXT')  # Databases made before sessions had tags
+        # Resets can only be undone while the app runs; drop what a previous run set aside
+        self.conn.execute('DELETE FROM sessions_reset')
+        self.conn.execute('DELETE FROM practice_log_reset')
+        self.conn.commit()
+        self.conn.create_function('matches_query', 2, matches, deterministic=True)
+        self.conn.create_function('due_day', 3, stored_due_day, deterministic=True)
+
+    def load(self):
+        """Return every session as the same dict-of-dicts layout MainApp.sessions uses."""
+        return self._with_history(
+            self.conn.execute(f'SELECT {COLUMNS} FROM sessions'),
+            self.conn.execute('SELECT name, day, duration FROM practice_log ORDER BY name, day, rowid'))
+
+    def fetch(self, names):
+        """Return the named sessions that exist, in the load() layout, reading only their rows."""
+        names = list(names)
+        sessions = {}
+        for start in range(0, len(names), FETCH_BATCH):
+            batch = names[start:start + FETCH_BATCH]
+            marks = ', '.join('?' * len(batch))
+            sessions.update(self._with_history(
+                self.conn.execute(f'SELECT {COLUMNS} FROM sessions WHERE name IN ({marks})', batch),
+                self.conn.execute(f'SELECT name, day, duration FROM practice_log WHERE name IN ({marks}) '
+                                  'ORDER BY name, day, rowid', batch)))
+        return sessions
+
+    def names(self):
+        """Iterate over every session name without building a list (do not write while iterating)."""
+        for (name,) in self.conn.execute('SELECT name FROM sessions'):
+            yield name
+
+    @staticmethod
+    def _with_history(session_rows, log_rows):
+        sessions = {}
+        for name, last_practiced, practice_count, is_favorite, session_type, tags in session_rows:
+            sessions[name] = {
+                'last_practiced': last_practiced,
+                'practice_count': practice_count,
+                'is_favorite': bool(is_favorite),
+                'session_type': session_type
+            }
+            if tags:
+                sessions[name]['tags'] = tags.split()
+        for name, day, duration in log_rows:
+            session = sessions.get(name)
+            if session is not None:
+                session.setdefault('history', []).append(day)
+                session.setdefault('durations', []).append(duration)
+        return sessions
+
+    def record(self, op, name=None, **fields):
+        """Apply a single change to the database."""
+        if op == 'reset':
+            self.stash()
+            self.conn.execute('DELETE FROM sessions')
+            self.conn.execute('DELETE FROM practice_log')
+        elif op == 'restore':
+            self.unstash()
+        elif op == 'delete':
+            self.conn.execute('DELETE FROM sessions WHERE name = ?', (name,))
+            self.conn.execute('DELETE FROM practice_log WHERE name = ?', (name,))
+        elif op == 'history':
+            self.record_practice(name, fields['day'], fields.get('duration', 0), fields.get('replace_last', False),
+                                 fields.get('remove', False))
+        elif op == 'add':
+            self.upsert(name, fields)
+        elif fields:
+            columns = [field for field in fields if field in SESSION_FIELDS]
+            assignments = ', '.join(f'{column} = ?' for column in columns)
+            values = [tags_column(fields[column]) if column == 'tags' else fields[column] for column in columns]
+            self.conn.execute(f'UPDATE sessions SET {assignments} WHERE name = ?', (*values, name))
+        if self._depth == 0:
+            self.flush()
+
+    def upsert(self, name, session):
+        """Insert or replace one session row."""
+        self.conn.execute(
+            f'INSERT OR REPLACE INTO sessions ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)',
+            (name, session.get('last_practiced'), session.get('practice_count', 0),
+             int(bool(session.get('is_favorite', False))), session.get('session_type', 0),
+             tags_column(session.get('tags')))
+        )
+        # The replaced session's practices go too, whether or not the new one brings any
+        self.conn.execute('DELETE FROM practice_log WHERE name = ?', (name,))
+        days = session.get('history')
+        if days:
+            durations = session.get('durations') or [0] * len(days)
+            self.conn.executemany('INSERT INTO practice_log (name, day, duration) VALUES (?, ?, ?)',
+                                  [(name, day, duration) for day, duration in zip(days, durations)])
+
+    def record_practice(self, name, day, duration=0, replace_last=False, remove=False):
+        """Log one practice, move the latest logged practice of the session to another day, or remove one."""
+        if remove:
+            # The practice logged last on that day, as PracticeHistory.remove() picks it
+            self.conn.execute('DELETE FROM practice_log WHERE rowid = (SELECT rowid FROM practice_log '
+                              'WHERE name = ? AND day = ? ORDER BY rowid DESC LIMIT 1)', (name, day))
+            return
+        if replace_last:
+            row = self.conn.execute('SELECT rowid, duration FROM practice_log WHERE name = ? '
+                                    'ORDER BY day DESC, rowid DESC LIMIT 1', (name,)).fetchone()
+            if row is None:
+                return
+            self.conn.execute('DELETE FROM practice_log WHERE rowid = ?', (row[0],))
+            duration = row[1]
+        self.conn.execute('INSERT INTO practice_log (name, day, duration) VALUES (?, ?, ?)',
+                          (name, day, duration))
+
+    def stash(self):
+        """Set every row aside before a reset, so unstash() can bring them back without Python reading them."""
+        generation = self._stashes[-1] + 1 if self._stashes else 1
+        self.conn.execute(f'INSERT INTO sessions_reset SELECT ?, {COLUMNS} FROM sessions', (generation,))
+        self.conn.execute('INSERT INTO practice_log_reset SELECT ?, name, day, duration FROM practice_log '
+                          'ORDER BY rowid', (generation,))
+        self._stashes.append(generation)
+
+    def unstash(self):
+        """Put back the rows the latest reset set aside (resets are undone newest first)."""
+        if not self._stashes:
+            return
+        generation = self._stashes.pop()
+        self.conn.execute(f'INSERT OR REPLACE INTO sessions ({COLUMNS}) '
+                          f'SELECT {COLUMNS} FROM sessions_reset WHERE generation = ?', (generation,))
+        self.conn.execute('INSERT INTO practice_log (name, day, duration) SELECT name, day, duration '
+                          'FROM practice_log_reset WHERE generation = ? ORDER BY rowid', (generation,))
+        self.conn.execute('DELETE FROM sessions_reset WHERE generation = ?', (generation,))
+        self.conn.execute('DELETE FROM practice_log_reset WHERE generation = ?', (generation,))
+
+    @contextmanager
+    def transaction(self, operation):
+        """Commit every change made inside the block together."""
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self.flush()
+
+    def flush(self, force=False, wait=False):
+        """Commit pending changes (commits are synchronous, so wait is implied)."""
+        if self.conn.in_transaction or force:
+            with tracer.span('save_data', backend='sqlite'):
+                self.conn.commit()
+            self.writes += 1
+            return True
+        return False
+
+    def count(self, query=None):
+        """Number of sessions, or of those a search query matches."""
+        where, params = search_filter(query)
+        return self.conn.execute(f'SELECT COUNT(*) FROM sessions WHERE {where}', params).fetchone()[0]
+
+    def sorted_names(self, criteria, limit=-1, offset=0, query=None):
+        """Return session names for a SortPopup criterion using an indexed ORDER BY ... LIMIT/OFFSET query.
+
+        With a query, only the names it matches (see search_filter).
+        """
+        where, params = search_filter(query)
+        if criteria.startswith('color_'):
+            return self._names_by_color(int(criteria.split('_')[1]), limit, offset, where, params)
+
+        order_by = ORDER_BY.get(criteria, ORDER_BY['alphabetical'])
+        rows = self.conn.execute(f'SELECT name FROM sessions WHERE {where} ORDER BY {order_by} LIMIT ? OFFSET ?',
+                                 (*params, limit, offset))
+        return [row[0] for row in rows]
+
+    def up_next(self, limit):
+        """Names of the sessions due for practice first (see practice_scheduler.py).
+
+        The due day is computed per row, so this scans the table; only the paged library asks, having
+        no sessions in memory to keep a heap of.
+        """
+        rows = self.conn.execute('SELECT name FROM sessions ORDER BY due_day(last_practiced, practice_count, '
+                                 'is_favorite), lower(name), name LIMIT ?', (limit,))
+        return [row[0] for row in rows]
+
+    def count_days(self, first, last, name=None):
+        """{day: practices} between first and last, of one session or (name None) of all of them."""
+        if name is None:
+            rows = self.conn.execute('SELECT day, COUNT(*) FROM practice_log WHERE day BETWEEN ? AND ? '
+                                     'GROUP BY day', (first, last))
+        else:
+            rows = self.conn.execute('SELECT day, COUNT(*) FROM practice_log WHERE name = ? AND day BETWEEN ? AND ? '
+                                     'GROUP BY day', (name, first, last))
+        return dict(rows)
+
+    def count_day(self, day, name=None):
+        if name is None:
+            return self.conn.execute('SELECT COUNT(*) FROM practice_log WHERE day = ?', (day,)).fetchone()[0]
+        return self.conn.execute('SELECT COUNT(*) FROM practice_log WHERE name = ? AND day = ?',
+                                 (name, day)).fetchone()[0]
+
+    def _names_by_color(self, color_index, limit, offset, where='1', params=()):
+        """Sessions of the selected color first, then the rest, both alphabetical.
+
+        Two range scans over idx_sessions_type instead of one ORDER BY on a computed expression,
+        which SQLite could not serve from an index.
+        """
+        matching = self.conn.execute(f'SELECT COUNT(*) FROM sessions WHERE session_type = ? AND {where}',
+                                     (color_index, *params)).fetchone()[0]
+        names = []
+        if offset < matching:
+            rows = self.conn.execute(f'SELECT name FROM sessions WHERE session_type = ? AND {where} '
+                                     'ORDER BY session_type, name COLLATE NOCASE LIMIT ? OFFSET ?',
+                                     (color_index, *params, limit, offset))
+            names.extend(row[0] for row in rows)
+        if limit < 0 or len(names) < limit:
+            rest_limit = -1 if limit < 0 else limit - len(names)
+            rows = self.conn.execute(f'SELECT name FROM sessions WHERE session_type != ? AND {where} '
+                                     'ORDER BY name COLLATE NOCASE LIMIT ? OFFSET ?',
+                                     (color_index, *params, rest_limit, max(0, offset - matching)))
+            names.extend(row[0] for row in rows)
+        return names
+
+    def tagged(self):
+        """(name, tags) of every tagged session, for building the tag index."""
+        rows = self.conn.execute('SELECT name, tags FROM sessions WHERE tags IS NOT NULL')
+        return [(name, tuple(tags.split())) for name, tags in rows]
+
+    def load_tag_index(self):
+        """The TagIndex kept in tag_ids and tag_bits, or None if none was saved yet."""
+        if self.get_meta('tag_index') is None:
+            return None
+        ids = dict(self.conn.execute('SELECT id, name FROM tag_ids'))
+        names = [ids.get(number) for number in range(max(ids, default=-1) + 1)]
+        rows = self.conn.execute('SELECT tag, bits FROM tag_bits')
+        return TagIndex.from_parts(names, {tag: int.from_bytes(data, 'little') for tag, data in rows})
+
+    def save_tag_index(self, index):
+        """Write the ids and bitsets that changed since the index was last saved.
+
+        Called before the change that caused them is recorded, so both are committed together;
+        nothing is committed here.
+        """
+        if index.rebuilt:
+            self.conn.execute('DELETE FROM tag_ids')
+            self.conn.execute('DELETE FROM tag_bits')
+            changed_ids, changed_tags = range(len(index.names)), list(index.bits)
+        else:
+            changed_ids, changed_tags = index.changed_ids, index.changed_tags
+        for number in changed_ids:
+            name = index.names[number] if number < len(index.names) else None
+            if name is None:
+                self.conn.execute('DELETE FROM tag_ids WHERE id = ?', (number,))
+            else:
+                self.conn.execute('INSERT OR REPLACE INTO tag_ids (id, name) VALUES (?, ?)', (number, name))
+        for tag in changed_tags:
+            bits = index.bits.get(tag)
+            if bits is None:
+                self.conn.execute('DELETE FROM tag_bits WHERE tag = ?', (tag,))
+            else:
+                self.conn.execute('INSERT OR REPLACE INTO tag_bits (tag, bits) VALUES (?, ?)',
+                                  (tag, bits.to_bytes((bits.bit_length() + 7) // 8, 'little')))
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('tag_index', '1')")
+        index.mark_saved()
+
+    def _add_column(self, table, column, declaration):
+        if column not in {row[1] for row in self.conn.execute(f'PRAGMA table_info({table})')}:
+            self.conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+        if self._depth == 0:
+            self.flush()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def tags_column(tags):
+    """A session's tags as stored in the tags column: space-separated (tags never contain spaces), NULL if none."""
+    return ' '.join(tags) if tags else None
+
+
+def migrate_from_json_store(store, repository):
+    """One-shot import of the JsonStore sessions_data.json into the repository.
+
+    Returns the number of sessions migrated; does nothing if the migration already ran.
+    """
+    if repository.get_meta('migrated_from_json') is not None:
+        return 0
+    sessions = store.get('sessions')['data'] if store.exists('sessions') else {}
+    with repository.transaction('migrate'):
+        for name, session in sessions.items():
+            repository.upsert(name, session)
+        repository.set_meta('migrated_from_json', '1')
+    print(f"MusApp- Migrated {len(sessions)} session(s) from JsonStore into SQLite.")
+    return len(sessions)
@@ -0,0 +1,161 @@
+import json
+import os
+from contextlib import contextmanager
+
+from kivy.clock import Clock
+
+from instrumentation import tracer
+from io_worker import IOWorker
+from tag_index import TagIndex
+
+
+def encode_store(contents, batch=500):
+    """Encode JsonStore contents the way JsonStore writes them, yielding bytes a few hundred sessions at a time."""
+    parts = []
+    for position, (key, value) in enumerate(contents.items()):
+        parts.append(('{' if position == 0 else ', ') + json.dumps(key) + ': ')
+        data = value.get('data') if isinstance(value, dict) and len(value) == 1 else None
+        if not isinstance(data, dict):
+            parts.append(json.dumps(value))
+            continue
+        parts.append('{"data": {')
+        for index, (name, entry) in enumerate(data.items()):
+            parts.append((', ' if index else '') + json.dumps(name) + ': ' + json.dumps(entry))
+            if len(parts) >= batch:
+                yield ''.join(parts).encode('utf-8')
+                parts = []
+        parts.append('}}')
+    parts.append('}' if contents else '{}')
+    yield ''.join(parts).encode('utf-8')
+
+
+class SessionStore:
+
+    def __init__(self, store, snapshot, delay=0.5, worker=None, tag_snapshot=None):
+        """Wrap a JsonStore so repeated save requests are coalesced into a single write, made off the main thread."""
+        self.store = store
+        self.snapshot = snapshot  # Callable returning the serializable session data
+        self.tag_snapshot = tag_snapshot  # Optional callable returning the tag index, saved in the same file
+        self.delay = delay
+        self.worker = worker or IOWorker()
+        self.path = os.path.abspath(store.filename)  # Resolved now; the I/O thread writes later
+        self.dirty = False
+        self.writes = 0
+        self.bytes_written = 0  # Total size of every sessions file written (updated by the I/O thread)
+        self.stats = {}  # operation -> {'requests': n, 'writes': n}
+        self._depth = 0
+        self._operation = None
+        self._pending = {}  # operation -> save requests since the last write
+        self._trigger = Clock.create_trigger(self._on_debounce, delay)
+
+    def load(self):
+        """Return the stored session data, or an empty dict if nothing has been saved yet."""
+        if self.store.exists('sessions'):
+            return self.store.get('sessions')['data']
+        return {}
+
+    def load_tag_index(self):
+        """The TagIndex saved next to the sessions, or None if there is none."""
+        if not self.store.exists('tag_index'):
+            return None
+        try:
+            return TagIndex.from_json(self.store.get('tag_index'))
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            print(f"MusApp- Error reading the tag index: {e}")
+            return None
+
+    def save_tag_index(self, index):
+        """Nothing to write now: the next snapshot of the sessions carries the whole index."""
+
+    def record(self, op, name=None, **fields):
+        """Record a single change; a whole-file snapshot only needs to know that something is dirty."""
+        self.mark_dirty(op)
+
+    def mark_dirty(self, operation="save"):
+        """Record a save request; the actual write happens at the end of the transaction or after the delay."""
+        operation = self._operation or operation
+        self.dirty = True
+        self._pending[operation] = self._pending.get(operation, 0) + 1
+        self._stats_for(operation)['requests'] += 1
+        if self._depth == 0:
+            self._trigger()  # Restart the debounce timer
+
+    @contextmanager
+    def transaction(self, operation):
+        """Group every save request made inside the block into one write when the outermost block exits."""
+        if self._depth == 0:
+            self._operation = operation
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._operation = None
+                self.flush()
+
+    def flush(self, force=False, wait=False):
+        """Queue a write of the data if anything changed; with wait, block until it is on disk.
+
+        Returns True if a write was queued.
+        """
+        self._trigger.cancel()
+        queued = (self.dirty or force) and self._queue_write()
+        if wait:
+            self.worker.flush()
+        return queued
+
+    def _queue_write(self):
+        with tracer.span('save_data', backend='json'):
+            return self._snapshot_and_submit()
+
+    def _snapshot_and_submit(self):
+        if not self._submit_snapshot():
+            return False
+        self.dirty = False
+        self.writes += 1
+        for operation, requests in self._pending.items():
+            self._stats_for(operation)['writes'] += 1
+            print(f"MusApp- {operation}: {requests} save request(s) coalesced into 1 write "
+                  f"({self.avoided(operation)} avoided so far).")
+        self._pending.clear()
+        return True
+
+    def _submit_snapshot(self, on_error=None):
+        """Take the snapshot and queue its write. Returns False if the snapshot could not be taken."""
+        try:
+            # The snapshot is taken here, on the main thread; the I/O thread only encodes and writes it
+            self.store.store_put('sessions', {'data': self.snapshot()})  # Keep the store's copy current
+            if self.tag_snapshot is not None:
+                # In the same file and the same write, so the index always matches the sessions
+                self.store.store_put('tag_index', self.tag_snapshot())
+            contents = {key: self.store.get(key) for key in self.store.keys()}
+        except Exception as e:
+            print(f"MusApp- Error saving data to JsonStore: {e}")
+            return False
+
+        self.worker.submit(self.path, lambda: encode_store(contents),
+                           self._on_written, on_error or self._on_write_error)
+        return True
+
+    def avoided(self, operation=None):
+        """Number of writes avoided for an operation, or across all operations if none is given."""
+        if operation is not None:
+            stats = self.stats.get(operation, {'requests': 0, 'writes': 0})
+            return stats['requests'] - stats['writes']
+        return sum(stats['requests'] - stats['writes'] for stats in self.stats.values())
+
+    def _stats_for(self, operation):
+        return self.stats.setdefault(operation, {'requests': 0, 'writes': 0})
+
+    def _on_written(self, size):
+        self.bytes_written += size
+
+    def _on_write_error(self, error):
+        """Called on the main thread when the I/O thread failed to write; try again after the delay."""
+        print(f"MusApp- Error saving data to JsonStore: {error}")
+        self.dirty = True
+        self._trigger()
+
+    def _on_debounce(self, dt):
+        self.flush()
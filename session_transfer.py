@@ -0,0 +1,228 @@
+"""Streaming import and export of sessions as CSV or JSON Lines.
+
+Files hold one session per row/line with the fields in TRANSFER_FIELDS. Both directions work a
+chunk at a time from the Kivy clock, so a 100k-row file neither freezes the UI nor has to fit in
+memory at once. Practice history is not part of the format; merging keeps the existing history.
+Tags are written comma-separated; merging adds the imported tags to the existing ones.
+"""
+import csv
+import json
+import os
+
+from kivy.clock import Clock
+
+from session_model import SESSION_COLORS, Session, ordinal_from_string
+from tag_index import parse_tags
+
+TRANSFER_FIELDS = ('name', 'last_practiced', 'practice_count', 'is_favorite', 'session_type', 'tags')
+
+# What an imported row does to an existing session with the same name
+CONFLICT_POLICIES = ('skip', 'merge', 'replace')
+
+TRUE_STRINGS = ('1', 'true', 'yes', 'y')
+
+
+def file_format(path):
+    """'jsonl' for .jsonl/.ndjson/.json files, 'csv' otherwise."""
+    return 'jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.ndjson', '.json') else 'csv'
+
+
+def parse_row(row):
+    """Build a Session from one CSV row or JSON object; raises ValueError if it is not usable."""
+    name = str(row.get('name') or '').strip()
+    if not name:
+        raise ValueError("missing name")
+    practice_count = int(row.get('practice_count') or 0)
+    if practice_count < 0:
+        raise ValueError(f"negative practice count: {practice_count}")
+    session_type = int(row.get('session_type') or 0)
+    if session_type not in range(len(SESSION_COLORS)):
+        raise ValueError(f"no color for session type {session_type}")
+    is_favorite = row.get('is_favorite', False)
+    if isinstance(is_favorite, str):
+        is_favorite = is_favorite.strip().lower() in TRUE_STRINGS
+    return Session(
+        name,
+        last_practiced=ordinal_from_string(row.get('last_practiced') or None),
+        practice_count=practice_count,
+        is_favorite=bool(is_favorite),
+        session_type=session_type,
+        tags=parse_tags(row.get('tags') or ()),  # Comma-separated text, or a list in JSON Lines
+    )
+
+
+def read_rows(f, fmt):
+    """Yield raw rows from an open text file: dicts for CSV, undecoded lines for JSON Lines."""
+    if fmt == 'csv':
+        yield from csv.DictReader(f)
+    else:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def read_sessions(path, chunk_size=2000):
+    """Yield (sessions, rejected) chunks from a CSV or JSON Lines file; only one chunk is held at a time."""
+    fmt = file_format(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        rows = read_rows(f, fmt)
+        while True:
+            chunk = []
+            rejected = 0
+            for row in rows:
+                try:
+                    if isinstance(row, str):
+                        row = json.loads(row)
+                    chunk.append(parse_row(row))
+                except (ValueError, TypeError, AttributeError):
+                    rejected += 1
+                if len(chunk) + rejected >= chunk_size:
+                    break
+            if not chunk and not rejected:
+                return
+            yield chunk, rejected
+
+
+def export_row(session):
+    return {
+        'name': session.name,
+        'last_practiced': session.last_practiced_string or '',
+        'practice_count': session.practice_count,
+        'is_favorite': session.is_favorite,
+        'session_type': session.session_type,
+        'tags': ', '.join(session.tags),
+    }
+
+
+class SessionImport:
+
+    def __init__(self, library, path, policy='merge', chunk_size=2000, on_complete=None):
+        """Read a file into a SessionLibrary one chunk per frame, then persist everything with one write."""
+        if policy not in CONFLICT_POLICIES:
+            raise ValueError(f"Unknown conflict policy: {policy}")
+        self.library = library
+        self.path = path
+        self.policy = policy
+        self.chunk_size = chunk_size
+        self.on_complete = on_complete  # Called with this import once the data is saved
+        self.added = []
+        self.updated = []
+        self.replaced = []
+        self.skipped = 0
+        self.rejected = 0
+        self.error = None
+        self._chunks = None
+        self._event = None
+
+    def start(self):
+        self._chunks = read_sessions(self.path, self.chunk_size)
+        self._event = Clock.schedule_once(self._next_chunk)
+
+    def cancel(self):
+        """Stop reading; sessions merged so far stay in memory and are saved."""
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+            self._chunks.close()
+            self._finish()
+
+    def _next_chunk(self, dt):
+        try:
+            chunk, rejected = next(self._chunks)
+        except StopIteration:
+            self._event = None
+            self._finish()
+            return
+        except (OSError, ValueError, csv.Error) as e:
+            # Unreadable file, bad encoding or malformed CSV: keep what was merged so far
+            self.error = e
+            self._event = None
+            self._finish()
+            return
+
+        self.rejected += rejected
+        added, updated, replaced, skipped = self.library.merge(chunk, self.policy)
+        self.added.extend(added)
+        self.updated.extend(updated)
+        self.replaced.extend(replaced)
+        self.skipped += skipped
+        self._event = Clock.schedule_once(self._next_chunk)
+
+    def _finish(self):
+        self.library.commit_import(self.added + self.updated, self.replaced)
+        print(f"MusApp- Imported {self.path}: {len(self.added)} added, {len(self.updated)} merged, "
+              f"{len(self.replaced)} replaced, {self.skipped} kept, {self.rejected} rejected row(s).")
+        if self.on_complete is not None:
+            self.on_complete(self)
+
+
+class SessionExport:
+
+    def __init__(self, sessions, names, path, chunk_size=2000, on_complete=None):
+        """Write sessions to a CSV or JSON Lines file one chunk per frame, replacing the file when done."""
+        self.sessions = sessions
+        self.names = names  # Export order
+        self.path = path
+        self.chunk_size = chunk_size
+        self.on_complete = on_complete  # Called with this export once the file is in place
+        self.exported = 0
+        self.error = None
+        self._position = 0
+        self._file = None
+        self._writer = None
+        self._event = None
+
+    def start(self):
+        try:
+            self._file = open(self.path + '.tmp', 'w', encoding='utf-8', newline='')
+        except OSError as e:
+            self.error = e
+            self._finish()
+            return
+        if file_format(self.path) == 'csv':
+            self._writer = csv.DictWriter(self._file, TRANSFER_FIELDS)
+            self._writer.writeheader()
+        self._event = Clock.schedule_once(self._next_chunk)
+
+    def _next_chunk(self, dt):
+        end = min(self._position + self.chunk_size, len(self.names))
+        try:
+            for name in self.names[self._position:end]:
+                session = self.sessions.get(name)
+                if session is None:
+                    continue  # Deleted since the export started
+                row = export_row(session)
+                if self._writer is not None:
+                    self._writer.writerow(row)
+                else:
+                    self._file.write(json.dumps(row, separators=(',', ':')) + '\n')
+                self.exported += 1
+        except OSError as e:
+            self.error = e
+            self._event = None
+            self._finish()
+            return
+
+        self._position = end
+        if self._position < len(self.names):
+            self._event = Clock.schedule_once(self._next_chunk)
+        else:
+            self._event = None
+            self._finish()
+
+    def _finish(self):
+        if self._file is not None:
+            try:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                if self.error is None:
+                    os.replace(self.path + '.tmp', self.path)
+            except OSError as e:
+                self.error = e
+        if self.error is not None:
+            print(f"MusApp- Error exporting to {self.path}: {self.error}")
+        else:
+            print(f"MusApp- Exported {self.exported} session(s) to {self.path}.")
+        if self.on_complete is not None:
+            self.on_complete(self)
@@ -0,0 +1,79 @@
+from bisect import bisect_left, insort
+
+# Sort key for every SortPopup criterion; the name always comes last so keys are unique
+SORT_KEYS = {
+    'alphabetical': lambda session: (session.name.lower(), session.name),
+    'practice_count': lambda session: (-session.practice_count, session.name.lower(), session.name),
+    'last_practice': lambda session: (-session.last_practiced, session.name.lower(), session.name),
+    'favourites': lambda session: (not session.is_favorite, session.name.lower(), session.name),
+}
+
+
+class SortIndexes:
+
+    def __init__(self, sessions=None):
+        """Sorted key lists for each sort criterion, kept up to date as sessions change."""
+        self.sessions = sessions if sessions is not None else {}
+        self._indexes = {}  # criterion -> sorted list of keys
+        self._keys = {}  # criterion -> {name: key currently stored in the index}
+
+    def reset(self, sessions):
+        """Point the indexes at a new sessions dict; each index is rebuilt the next time it is needed."""
+        self.sessions = sessions
+        self._indexes.clear()
+        self._keys.clear()
+
+    def ordering(self, criteria):
+        """Session names in the order of a SortPopup criterion, read from the maintained index."""
+        if criteria.startswith('color_'):
+            # Selected color first, then the rest, both alphabetical: one pass over the name index
+            color_index = int(criteria.split('_')[1])
+            names = self._names('alphabetical')
+            matching = [name for name in names if self.sessions[name].session_type == color_index]
+            return matching + [name for name in names if self.sessions[name].session_type != color_index]
+        return self._names(criteria)
+
+    def sorted_subset(self, names, criteria=None):
+        """Order a few names the way ordering(criteria) would, without reading the whole index."""
+        if criteria and criteria.startswith('color_'):
+            color_index = int(criteria.split('_')[1])
+            alphabetical = SORT_KEYS['alphabetical']
+            sort_key = lambda session: (session.session_type != color_index, alphabetical(session))
+        else:
+            sort_key = SORT_KEYS.get(criteria, SORT_KEYS['alphabetical'])
+        return sorted(names, key=lambda name: sort_key(self.sessions[name]))
+
+    def add(self, session):
+        for criteria, index in self._indexes.items():
+            key = SORT_KEYS[criteria](session)
+            insort(index, key)
+            self._keys[criteria][session.name] = key
+
+    def remove(self, name):
+        for criteria, index in self._indexes.items():
+            key = self._keys[criteria].pop(name, None)
+            if key is not None:
+                del index[bisect_left(index, key)]
+
+    def update(self, session):
+        """Move a changed session within every index whose key it affects."""
+        for criteria, index in self._indexes.items():
+            key = SORT_KEYS[criteria](session)
+            old_key = self._keys[criteria].get(session.name)
+            if key == old_key:
+                continue
+            if old_key is not None:
+                del index[bisect_left(index, old_key)]
+            insort(index, key)
+            self._keys[criteria][session.name] = key
+
+    def _names(self, criteria):
+        if criteria not in SORT_KEYS:
+            criteria = 'alphabetical'
+        if criteria not in self._indexes:
+            # Built once per criterion; afterwards only add/remove/update touch it
+            sort_key = SORT_KEYS[criteria]
+            keys = {name: sort_key(session) for name, session in self.sessions.items()}
+            self._keys[criteria] = keys
+            self._indexes[criteria] = sorted(keys.values())
+        return [key[-1] for key in self._indexes[criteria]]
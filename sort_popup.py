@@ -42,6 +42,12 @@ class SortPopup:
                 height="48dp",
                 on_release=lambda x: self.on_sort("favourites")
             )
+            up_next_button = MDRaisedButton(
+                text="Up Next",
+                size_hint=(1, None),
+                height="48dp",
+                on_release=lambda x: self.on_sort("up_next")
+            )
 
             # Create color buttons for session_type sorting
             color_button_layout = GridLayout(
@@ -69,12 +75,13 @@ class SortPopup:
                 padding=10,
                 spacing=10,
                 width='240dp',
-                height='300dp'
+                height='358dp'
             )
             main_layout.add_widget(alphabetical_button)
             main_layout.add_widget(practice_count_button)
             main_layout.add_widget(last_practice_button)
             main_layout.add_widget(favorites_button)
+            main_layout.add_widget(up_next_button)
             main_layout.add_widget(color_button_layout)
 
             # Create the popup dialog
@@ -0,0 +1,373 @@
+"""Multi-device sync of the session library against a sync server (see sync_server.py).
+
+Every session is exchanged as a CRDT record, so devices that changed the same session while apart
+end up with the same result whichever order their changes arrive in:
+
+- last_practiced, is_favorite, session_type, tags and deleted are last-writer-wins registers,
+  each stamped with a hybrid logical clock: [wall time in ms, counter, device id].
+- Every device owns a slot holding the practice count and the practices it contributed. Only its
+  owner writes a slot, so a merge keeps the newer slot per device, and the practice count is the
+  sum over the slots. Practices logged on two phones both count; neither overwrites the other.
+
+Local changes are stamped with the time they were made. A sync pulls the records changed on the
+server since the last sync point, merges them, then pushes the records this device changed, in
+gzip-compressed JSON batches. The first sync of a device pulls before stamping anything, so a
+library copied from another phone joins the server's records instead of counting twice.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+
+from instrumentation import tracer
+from practice_history import PracticeHistory
+from session_model import Session, ordinal_from_string
+
+REGISTERS = ('last_practiced', 'is_favorite', 'session_type', 'tags', 'deleted')
+
+BATCH_SIZE = 500  # Records pushed per request
+PAGE_LIMIT = 1000  # Records the server returns per response
+
+
+class HybridClock:
+
+    def __init__(self, device, last=(0, 0), now=time.time):
+        """Timestamps that follow wall time but never go backwards, even past clocks seen from other devices."""
+        self.device = device
+        self.ms, self.counter = last
+        self.now = now
+
+    def tick(self, at=None):
+        """Timestamp for a local change made at wall time at (in ms; now if None)."""
+        wall = int(self.now() * 1000) if at is None else at
+        if wall > self.ms:
+            self.ms, self.counter = wall, 0
+        else:
+            self.counter += 1
+        return [self.ms, self.counter, self.device]
+
+    def observe(self, stamp):
+        """Move past a timestamp received from another device, so later local changes win over it."""
+        if (stamp[0], stamp[1]) > (self.ms, self.counter):
+            self.ms, self.counter = stamp[0], stamp[1]
+
+
+def merge_records(a, b):
+    """Merge two records of one session (either may be None); commutative, associative and idempotent."""
+    if a is None:
+        return b
+    if b is None or a == b:
+        return a
+    merged = {}
+    for field in REGISTERS:
+        x, y = a.get(field), b.get(field)
+        merged[field] = y if x is None or (y is not None and y[1] > x[1]) else x
+    devices = dict(a.get('devices', {}))
+    for device, slot in b.get('devices', {}).items():
+        mine = devices.get(device)
+        if mine is None or slot['hlc'] > mine['hlc']:
+            devices[device] = slot
+    merged['devices'] = devices
+    return merged
+
+
+def latest_stamp(record):
+    return max([register[1] for register in map(record.get, REGISTERS) if register is not None] +
+               [slot['hlc'] for slot in record.get('devices', {}).values()], default=None)
+
+
+def is_deleted(record):
+    """A delete only wins over changes stamped before it: a practice logged concurrently keeps the session."""
+    deleted = record.get('deleted')
+    return bool(deleted and deleted[0] and deleted[1] == latest_stamp(record))
+
+
+def register_value(record, field, default=None):
+    register = record.get(field)
+    return default if register is None else register[0]
+
+
+def materialize(name, record):
+    """The Session a record describes, or None if it is deleted."""
+    if record is None or is_deleted(record):
+        return None
+    slots = record.get('devices', {}).values()
+    practices = sorted(tuple(practice) for slot in slots for practice in slot['history'])
+    last_practiced = ordinal_from_string(register_value(record, 'last_practiced'))
+    if practices:
+        last_practiced = max(last_practiced, practices[-1][0])
+    return Session(
+        name,
+        last_practiced=last_practiced,
+        practice_count=sum(slot['count'] for slot in slots),
+        is_favorite=bool(register_value(record, 'is_favorite', False)),
+        session_type=register_value(record, 'session_type', 0),
+        history=PracticeHistory(*zip(*practices)) if practices else None,
+        tags=tuple(register_value(record, 'tags', ())),
+    )
+
+
+def practices_of(session):
+    """A session's practices as a multiset of (day, duration) pairs."""
+    if not session.history:
+        return Counter()
+    return Counter(zip(session.history.days, session.history.durations))
+
+
+def session_view(session):
+    """What a sync compares between two Session records (same-day practices may be stored in any order)."""
+    if session is None:
+        return None
+    return (session.last_practiced, session.practice_count, session.is_favorite, session.session_type,
+            session.tags, sorted(practices_of(session).elements()))
+
+
+def with_local_changes(name, record, baseline, session, clock, at=None):
+    """Stamp what changed in the library since the sessions were last made to match baseline.
+
+    record is the merged record to add the changes to; session is the library's record (None if
+    it is not in the library), changed at wall time at. This device's slot takes whatever the other
+    slots in baseline do not account for. Returns record itself when nothing changed locally,
+    otherwise a new record.
+    """
+    base = materialize(name, baseline)
+    if session is None:
+        if base is None:
+            return record
+        record = dict(record)
+        record['deleted'] = [True, clock.tick(at)]  # Deleted here since the last sync
+        return record
+
+    changed = dict(record) if record is not None else {'devices': {}}
+    if base is None:
+        changed['deleted'] = [False, clock.tick(at)]  # New here, or added again after a delete
+    local = dict(session.to_json(), tags=list(session.tags))  # to_json() leaves out empty tags
+    stored = dict(base.to_json(), tags=list(base.tags)) if base is not None else {}
+    for field in ('last_practiced', 'is_favorite', 'session_type', 'tags'):
+        if field not in stored or local[field] != stored[field]:
+            changed[field] = [local[field], clock.tick(at)]
+
+    others = [slot for device, slot in (baseline or {}).get('devices', {}).items() if device != clock.device]
+    count = session.practice_count - sum(slot['count'] for slot in others)
+    practices = practices_of(session)
+    for slot in others:
+        practices -= Counter(tuple(practice) for practice in slot['history'])
+    history = [list(practice) for practice in sorted(practices.elements())]
+    devices = changed['devices'] = dict(changed.get('devices', {}))
+    own = devices.get(clock.device)
+    if own is None or own['count'] != count or own['history'] != history:
+        devices[clock.device] = {'count': count, 'history': history, 'hlc': clock.tick(at)}
+    return changed if changed != record else record
+
+
+def post_json(url, payload, timeout=10):
+    """POST payload as gzip-compressed JSON. Returns (decoded response, bytes sent, bytes received)."""
+    from urllib.request import Request, urlopen
+
+    body = gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    request = Request(url, data=body, method='POST', headers={
+        'Content-Type': 'application/json',
+        'Content-Encoding': 'gzip',
+        'Accept-Encoding': 'gzip',
+    })
+    with urlopen(request, timeout=timeout) as response:
+        data = response.read()
+        received = len(data)
+        if response.headers.get('Content-Encoding') == 'gzip':
+            data = gzip.decompress(data)
+    return json.loads(data), len(body), received
+
+
+class SyncClient:
+
+    def __init__(self, library, url, state_path='sync_state.json', on_complete=None, timeout=10):
+        """Syncs a SessionLibrary with a sync server; requests run on a background thread.
+
+        The sync state (last records seen, sync point, changes not pushed yet) is read the first
+        time a sync runs. on_complete(changed names) is called after a sync changed the library.
+        """
+        self.library = library
+        self.url = url.rstrip('/') + '/sync'
+        self.state_path = state_path
+        self.on_complete = on_complete
+        self.timeout = timeout
+        self.running = False
+        self.records = None  # name -> record as of the last sync; None until the state is read
+        self.touched = {}  # name -> wall time in ms of its latest change not stamped yet
+        self.touched_all = False  # A change without a name (reset, import) may have touched any session
+        self.stats = {}
+        self._applying = False
+        self._worker = None
+        library.on_change = self.touch
+
+    def touch(self, op, name=None):
+        """Note a library change (SessionLibrary.on_change) so the next sync only compares what changed."""
+        if self._applying:
+            return
+        if name is None:
+            self.touched_all = True
+        else:
+            self.touched[name] = int(time.time() * 1000)
+
+    def sync(self):
+        """Pull the server's changes, then push this device's. Returns False if a sync is already running."""
+        if self.running:
+            return False
+        if self.records is None:
+            self._load_state()
+        self.running = True
+        self.stats = {'sent': 0, 'received': 0, 'bytes_sent': 0, 'bytes_received': 0}
+        if self.cursor:
+            self._collect_changes()  # Stamped before the pull moves the clock past remote changes
+        self._exchange([], self._on_pulled)
+        return True
+
+    def save(self, wait=False):
+        """Write the sync state; changes made before the first sync of this run are folded in first."""
+        from io_worker import IOWorker
+
+        if self.records is None:
+            if not (self.touched or self.touched_all) or not os.path.exists(self.state_path):
+                return  # Never synced: the first sync compares every session anyway
+            self._load_state()
+        state = {
+            'device': self.device,
+            'cursor': self.cursor,
+            'clock': [self.clock.ms, self.clock.counter],
+            'records': dict(self.records),  # Records are replaced, never changed in place
+            'pending': sorted(self.pending),
+            'dirty': None if self.dirty is None else sorted(self.dirty.union(self.touched)),
+        }
+        if self._worker is None:
+            self._worker = IOWorker('musapp-sync')
+        self._worker.submit(self.state_path, lambda: json.dumps(state, separators=(',', ':')).encode('utf-8'))
+        if wait:
+            self._worker.flush()
+
+    def _load_state(self):
+        state = {}
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"MusApp- Error reading sync state, starting over: {e}")
+        self.device = state.get('device') or uuid.uuid4().hex[:12]
+        self.cursor = state.get('cursor', 0)
+        self.clock = HybridClock(self.device, tuple(state.get('clock', (0, 0))))
+        self.records = state.get('records', {})
+        self.pending = set(state.get('pending', ()))  # Changed here but not pushed yet
+        # None: never synced, or a crash lost track of what changed; every session gets compared
+        dirty = state.get('dirty')
+        self.dirty = None if dirty is None or self.touched_all else set(dirty)
+
+    def _exchange(self, changes, done):
+        """Send batches of changed records, collecting every page of changes the server returns, off the main thread."""
+        batches = [dict(changes[start:start + BATCH_SIZE]) for start in range(0, len(changes), BATCH_SIZE)]
+        threading.Thread(target=self._run, args=(self.cursor, batches, done), name='musapp-sync',
+                         daemon=True).start()
+
+    def _run(self, cursor, batches, done):
+        from kivy.clock import Clock
+
+        received = {}
+        pushed = []
+        try:
+            more = True
+            while batches or more:
+                batch = batches.pop(0) if batches else {}
+                response, sent_bytes, received_bytes = post_json(
+                    self.url, {'device': self.device, 'cursor': cursor, 'changes': batch, 'limit': PAGE_LIMIT},
+                    self.timeout)
+                pushed.extend(batch)
+                for name, record in response['records'].items():
+                    received[name] = merge_records(received.get(name), record)
+                cursor = response['cursor']
+                more = response['more']
+                self.stats['sent'] += len(batch)
+                self.stats['bytes_sent'] += sent_bytes
+                self.stats['bytes_received'] += received_bytes
+        except (OSError, ValueError, KeyError) as e:
+            # Batches the server took are merged again next time; merging is idempotent
+            Clock.schedule_once(lambda dt, e=e: self._on_error(e))
+            return
+        Clock.schedule_once(lambda dt: done(received, cursor, pushed))
+
+    def _on_pulled(self, received, cursor, pushed):
+        changed = self._apply(received, cursor)
+        self._exchange(self._collect_changes(), lambda *args: self._on_pushed(changed, *args))
+
+    def _on_pushed(self, changed, received, cursor, pushed):
+        self.pending.difference_update(pushed)
+        changed += self._apply(received, cursor)
+        self.running = False
+        self.save()
+        stats = self.stats
+        print(f"MusApp- Sync: sent {stats['sent']} and received {stats['received']} record(s), "
+              f"{stats['bytes_sent'] + stats['bytes_received']} bytes compressed; "
+              f"{len(changed)} session(s) changed here.")
+        if changed and self.on_complete is not None:
+            self.on_complete(changed)
+
+    def _on_error(self, error):
+        self.running = False
+        print(f"MusApp- Sync failed: {error}")
+
+    @tracer.timed('sync_apply')
+    def _apply(self, received, cursor):
+        """Merge records from the server and bring the library in line. Returns the names changed here."""
+        library = self.library
+        changed = []
+        self._applying = True
+        try:
+            with library.persistence.transaction("sync"):
+                for name, incoming in received.items():
+                    stamp = latest_stamp(incoming)
+                    if stamp is not None:
+                        self.clock.observe(stamp)
+                    synced = self.records.get(name)
+                    merged = merge_records(synced, incoming)
+                    session = library.sessions.get(name)
+                    if synced is None and session is None:
+                        record = merged  # New on another device
+                    else:
+                        # Changes made here since the last sync are kept, and pushed with the next batch
+                        record = with_local_changes(name, merged, synced or incoming, session, self.clock)
+                    if record is not merged:
+                        self.pending.add(name)
+                    self.records[name] = record
+                    result = materialize(name, record)
+                    if session_view(result) != session_view(session):
+                        if result is None:
+                            library.delete(name)
+                        else:
+                            library.put(result)
+                        changed.append(name)
+        finally:
+            self._applying = False
+        self.stats['received'] += len(received)
+        self.cursor = cursor
+        return changed
+
+    @tracer.timed('sync_collect')
+    def _collect_changes(self):
+        """Stamp the sessions changed here since the last sync and return the records to push."""
+        if self.touched_all or self.dirty is None:
+            names = set(self.library.sessions).union(self.records)
+        else:
+            names = self.dirty.union(self.touched)
+        # In the order the changes were made, so the clock only moves forward
+        for name in sorted(names, key=lambda name: self.touched.get(name, 0)):
+            synced = self.records.get(name)
+            record = with_local_changes(name, synced, synced, self.library.sessions.get(name), self.clock,
+                                        self.touched.get(name))
+            if record is not synced:
+                self.records[name] = record
+                self.pending.add(name)
+        self.dirty = set()
+        self.touched.clear()
+        self.touched_all = False
+        return [(name, self.records[name]) for name in sorted(self.pending)]
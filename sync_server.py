@@ -0,0 +1,140 @@
+"""Reference sync server for testing multi-device sync offline.
+
+    python sync_server.py --port 8765 --data sync_server.json
+
+Keeps the merged CRDT record of every session (see sync_engine.py) and a sequence number of when
+each last changed. POST /sync takes a gzip-compressed JSON batch:
+
+    {"device": id, "cursor": last sequence number seen, "changes": {name: record}, "limit": n}
+
+merges the changes, and answers with up to limit records changed since the cursor, leaving out
+ones the device itself sent unchanged: {"records": {name: record}, "cursor": n, "more": bool}.
+Uses the standard library only.
+"""
+import argparse
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sync_engine import PAGE_LIMIT, merge_records
+
+
+class SyncStore:
+
+    def __init__(self, path=None):
+        """Every session's merged record, optionally kept in a JSON file between runs."""
+        self.path = path
+        self.records = {}
+        self.changes = OrderedDict()  # name -> sequence number of its last change, oldest first
+        self.origins = {}  # name -> device whose batch the record matches exactly, or None if merged
+        self.seq = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.records = state['records']
+            self.changes = OrderedDict(state['changes'])
+            self.origins = state['origins']
+            self.seq = state['seq']
+
+    def exchange(self, device, cursor, changes, limit=PAGE_LIMIT):
+        """Merge a device's changed records and return a page of the records changed since cursor."""
+        with self._lock:
+            updated = 0
+            for name, record in changes.items():
+                current = self.records.get(name)
+                merged = merge_records(current, record)
+                if merged == current:
+                    continue
+                self.seq += 1
+                self.records[name] = merged
+                self.changes[name] = self.seq
+                self.changes.move_to_end(name)
+                self.origins[name] = device if merged == record else None
+                updated += 1
+            response = self._page(device, cursor, limit)
+            if updated and self.path:
+                self._save()
+        return response
+
+    def _page(self, device, cursor, limit):
+        newer = []
+        for name, seq in reversed(self.changes.items()):
+            if seq <= cursor:
+                break
+            newer.append((name, seq))
+        records = {}
+        for name, seq in reversed(newer):
+            if len(records) == limit:
+                return {'records': records, 'cursor': cursor, 'more': True}
+            cursor = seq
+            if self.origins.get(name) != device:
+                records[name] = self.records[name]
+        return {'records': records, 'cursor': max(cursor, self.seq), 'more': False}
+
+    def _save(self):
+        state = {'records': self.records, 'changes': list(self.changes.items()), 'origins': self.origins,
+                 'seq': self.seq}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+
+class SyncHandler(BaseHTTPRequestHandler):
+    store = None  # The SyncStore shared by every request
+
+    def do_POST(self):
+        if self.path != '/sync':
+            self.send_error(404)
+            return
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            request = json.loads(body)
+            response = self.store.exchange(request['device'], request.get('cursor', 0), request.get('changes', {}),
+                                           request.get('limit', PAGE_LIMIT))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.send_error(400, str(e))
+            return
+
+        data = json.dumps(response, separators=(',', ':')).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            data = gzip.compress(data)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(host='127.0.0.1', port=8765, path=None):
+    """A ThreadingHTTPServer serving /sync from a SyncStore; call serve_forever() on it."""
+    handler = type('Handler', (SyncHandler,), {'store': SyncStore(path)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765, help="port to listen on (default: 8765)")
+    parser.add_argument('--data', metavar='FILE', help="keep the records in this JSON file between runs")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.data)
+    print(f"Sync server listening on http://{args.host}:{args.port}/sync")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
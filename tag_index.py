@@ -0,0 +1,203 @@
+"""Free-form session tags and an inverted index answering tag queries with bitwise operations.
+
+Tags are lower case, with words joined by '-' ("Sight reading" becomes "sight-reading"). Every
+tagged session gets a small integer id, and each tag maps to a bitset of the ids of the sessions
+carrying it, held in a Python int: AND, OR and NOT across tags are single &, | and & ~ operations
+that run in C. Untagged sessions get no id, so the bitsets are only as long as the number of
+tagged sessions.
+
+Tag queries are typed in the search field, and every term starts with '#':
+
+    #scales #repertoire     both tags
+    #scales|#etudes         either tag
+    #scales -#warmup        scales, but not warmup
+    #sca                    any tag starting with "sca", so results follow the typing
+"""
+import heapq
+
+
+def normalize_tag(text):
+    return '-'.join(text.replace('#', ' ').casefold().split())
+
+
+def parse_tags(text):
+    """A session's tags from comma-separated text (or a list of tags): normalized, unique and sorted."""
+    parts = text.split(',') if isinstance(text, str) else text
+    return tuple(sorted({tag for tag in map(normalize_tag, parts) if tag}))
+
+
+def is_tag_query(query):
+    return query.lstrip('-').startswith('#')
+
+
+def parse_query(query):
+    """(excluded, prefixes) per term of a tag query; terms with nothing typed after the '#' are left out."""
+    terms = []
+    for term in query.split():
+        prefixes = [prefix for prefix in map(normalize_tag, term.lstrip('-').split('|')) if prefix]
+        if prefixes:
+            terms.append((term.startswith('-'), prefixes))
+    return terms
+
+
+def tags_match(tags, query):
+    """Whether a session with these tags matches a tag query, as TagIndex.search() decides it."""
+    for excluded, prefixes in parse_query(query):
+        if any(tag.startswith(prefix) for tag in tags for prefix in prefixes) == excluded:
+            return False
+    return True
+
+
+class TagIndex:
+
+    def __init__(self):
+        """Tag -> bitset of session ids, updated in place as sessions are tagged, untagged and deleted."""
+        self.names = []  # id -> session name; None for an id freed by a session that lost its tags
+        self.ids = {}  # session name -> id
+        self.bits = {}  # tag -> int with bit i set when session i carries the tag
+        self._free = []  # Heap of freed ids, reused before the bitsets grow
+        # What changed since the backend last saved the index (see SessionRepository.save_tag_index)
+        self.rebuilt = True  # Nothing of this index is saved yet
+        self.changed_ids = set()
+        self.changed_tags = set()
+
+    def __len__(self):
+        """Number of tagged sessions."""
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, tagged):
+        """Index (name, tags) pairs in one pass; each bitset is assembled in a bytearray, not an int per session."""
+        index = cls()
+        members = {}  # tag -> ids
+        for name, tags in tagged:
+            if tags:
+                index.ids[name] = len(index.names)
+                for tag in tags:
+                    members.setdefault(tag, []).append(len(index.names))
+                index.names.append(name)
+        for tag, ids in members.items():
+            buffer = bytearray(len(index.names) // 8 + 1)
+            for number in ids:
+                buffer[number >> 3] |= 1 << (number & 7)
+            index.bits[tag] = int.from_bytes(buffer, 'little')
+        return index
+
+    @classmethod
+    def from_parts(cls, names, bits):
+        """An index as saved: the name of every id (None for free ones) and each tag's bitset."""
+        index = cls()
+        index.names = list(names)
+        index.ids = {name: number for number, name in enumerate(index.names) if name is not None}
+        index._free = [number for number, name in enumerate(index.names) if name is None]  # Sorted, so a heap
+        index.bits = dict(bits)
+        index.rebuilt = False
+        return index
+
+    @classmethod
+    def from_json(cls, data):
+        return cls.from_parts(data['names'], {tag: int(bits, 16) for tag, bits in data['tags'].items()})
+
+    def to_json(self):
+        """The index as JSON-serializable data, bitsets in hex; the caller saves all of it."""
+        self.mark_saved()
+        return {'names': list(self.names), 'tags': {tag: format(bits, 'x') for tag, bits in self.bits.items()}}
+
+    def mark_saved(self):
+        self.rebuilt = False
+        self.changed_ids.clear()
+        self.changed_tags.clear()
+
+    @property
+    def changed(self):
+        return self.rebuilt or bool(self.changed_ids or self.changed_tags)
+
+    def set(self, name, tags):
+        """Make the session's tags exactly tags; with no tags it leaves the index."""
+        number = self.ids.get(name)
+        if number is None and not tags:
+            return  # The common case: an untagged session stays untagged
+        if number is not None:
+            bit = 1 << number
+            for tag, bits in list(self.bits.items()):
+                if bits & bit and tag not in tags:
+                    self._set_bits(tag, bits & ~bit)
+            if not tags:
+                self.names[number] = None
+                del self.ids[name]
+                heapq.heappush(self._free, number)
+                self.changed_ids.add(number)
+                return
+        else:
+            number = heapq.heappop(self._free) if self._free else len(self.names)
+            if number == len(self.names):
+                self.names.append(name)
+            else:
+                self.names[number] = name
+            self.ids[name] = number
+            self.changed_ids.add(number)
+        bit = 1 << number
+        for tag in tags:
+            bits = self.bits.get(tag, 0)
+            if not bits & bit:
+                self._set_bits(tag, bits | bit)
+
+    def remove(self, name):
+        self.set(name, ())
+
+    def tags_of(self, name):
+        number = self.ids.get(name)
+        if number is None:
+            return ()
+        return tuple(sorted(tag for tag, bits in self.bits.items() if bits >> number & 1))
+
+    def counts(self):
+        """Number of sessions per tag."""
+        return {tag: bin(bits).count('1') for tag, bits in self.bits.items()}
+
+    def prefixed(self, prefix):
+        """Bitset of the sessions with a tag starting with prefix."""
+        found = 0
+        for tag, bits in self.bits.items():
+            if tag.startswith(prefix):
+                found |= bits
+        return found
+
+    def search(self, query, every_name=()):
+        """Names of the sessions a tag query matches (see the module docstring), in id order.
+
+        every_name is only read for a query made of exclusions alone, since untagged sessions
+        (which have no id) match it too; an empty query matches every name.
+        """
+        included = None
+        excluded = 0
+        for is_excluded, prefixes in parse_query(query):
+            bits = 0
+            for prefix in prefixes:
+                bits |= self.prefixed(prefix)
+            if is_excluded:
+                excluded |= bits
+            else:
+                included = bits if included is None else included & bits
+        if included is None:
+            hidden = set(self.names_of(excluded))
+            return [name for name in every_name if name not in hidden]
+        return self.names_of(included & ~excluded)
+
+    def names_of(self, bits):
+        """Names of the ids set in a bitset; bin() lays the bits out so str.find() walks them in C."""
+        names = self.names
+        digits = bin(bits)[:1:-1]  # Character i is bit i
+        found = []
+        position = digits.find('1')
+        while position >= 0:
+            found.append(names[position])
+            position = digits.find('1', position + 1)
+        return found
+
+    def _set_bits(self, tag, bits):
+        if bits:
+            self.bits[tag] = bits
+        else:
+            del self.bits[tag]  # Nobody carries the tag any more
+        self.changed_tags.add(tag)
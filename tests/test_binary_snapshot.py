@@ -0,0 +1,39 @@
+import pytest
+from kivy.storage.jsonstore import JsonStore
+
+from binary_snapshot import SessionSnapshot
+from session_library import SessionLibrary
+
+
+def open_library():
+    library = SessionLibrary(JsonStore('sessions_data.json'), 'binary')
+    library.load()
+    return library
+
+
+def close_library(library):
+    library.persistence.flush(wait=True)
+    getattr(library.persistence, 'close', lambda: None)()
+
+
+def test_corrupt_snapshot_falls_back_to_the_json_backup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    library = open_library()
+    library.add("Scales", practice_count=4)
+    library.add("Arpeggios", practice_count=1)
+    close_library(library)  # Writes the snapshot and brings sessions_data.json up to date
+
+    path = tmp_path / 'sessions_data.bin'
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF  # Flip a byte of the body, leaving the header and size intact
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="checksum"):
+        SessionSnapshot(str(path))
+
+    library = open_library()
+    try:
+        assert sorted(library.sessions) == ["Arpeggios", "Scales"]
+        assert library.sessions["Scales"].practice_count == 4
+    finally:
+        close_library(library)
+    SessionSnapshot(str(path)).close()  # Rewritten from the JSON records
@@ -0,0 +1,26 @@
+from practice_journal import PracticeJournal
+
+
+def open_journal(tmp_path):
+    return PracticeJournal(dict, path=str(tmp_path / 'journal.log'), snapshot_path=str(tmp_path / 'snapshot.json'))
+
+
+def test_torn_last_line_is_discarded_and_earlier_events_survive(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.record('add', 'Scales', practice_count=2)
+    journal.record('add', 'Arpeggios')
+    journal.record('count', 'Scales', practice_count=3)
+    intact = (tmp_path / 'journal.log').stat().st_size
+    with open(tmp_path / 'journal.log', 'ab') as f:
+        f.write(b'{"op":"add","name":"Etu')  # A crash in the middle of an append
+
+    sessions = open_journal(tmp_path).load()
+    assert list(sessions) == ['Scales', 'Arpeggios']
+    assert sessions['Scales']['practice_count'] == 3
+    assert (tmp_path / 'journal.log').stat().st_size == intact
+
+    # Appends after the recovery start on a line of their own
+    journal = open_journal(tmp_path)
+    journal.load()
+    journal.record('add', 'Etudes')
+    assert list(open_journal(tmp_path).load()) == ['Scales', 'Arpeggios', 'Etudes']
@@ -0,0 +1,33 @@
+from practice_scheduler import PracticeSchedule, due_key
+from session_model import Session
+from session_repository import SessionRepository
+
+
+def make_sessions():
+    sessions = {}
+    for number in range(40):
+        session = Session(f"S{number:02d}", practice_count=number % 7, is_favorite=number % 5 == 0,
+                          session_type=number % 4)
+        session.last_practiced = 739800 + number % 11 if number % 9 else session.last_practiced
+        sessions[session.name] = session
+    return sessions
+
+
+def test_session_type_does_not_move_the_due_day():
+    session = Session("Scales", practice_count=3)
+    session.last_practiced = 739800
+    keys = set()
+    for session_type in range(4):
+        session.session_type = session_type
+        keys.add(due_key(session))
+    assert len(keys) == 1
+
+
+def test_heap_and_database_agree_on_up_next(tmp_path):
+    sessions = make_sessions()
+    repository = SessionRepository(str(tmp_path / 'sessions.db'))
+    with repository.transaction('seed'):
+        for name, session in sessions.items():
+            repository.upsert(name, session.to_json())
+
+    assert PracticeSchedule(sessions).up_next(15) == repository.up_next(15)
@@ -0,0 +1,31 @@
+import datetime
+
+import pytest
+from kivy.storage.jsonstore import JsonStore
+
+from session_library import SessionLibrary
+
+
+def open_library(backend):
+    library = SessionLibrary(JsonStore('sessions_data.json'), backend)
+    library.load()
+    return library
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "sqlite", "binary"])
+def test_changing_a_missing_session_records_nothing(backend, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    library = open_library(backend)
+    library.add("Scales")
+    assert library.set_session_type("Gone", 2) is None
+    assert library.set_last_practiced("Gone", datetime.date(2024, 5, 1)) is None
+    assert library.set_tags("Gone", ["x"]) is None
+    library.persistence.flush(wait=True)
+    getattr(library.persistence, 'close', lambda: None)()
+
+    library = open_library(backend)
+    try:
+        assert list(library.sessions) == ["Scales"]
+    finally:
+        library.persistence.flush(wait=True)
+        getattr(library.persistence, 'close', lambda: None)()
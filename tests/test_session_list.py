@@ -0,0 +1,93 @@
+import os
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+from session_list import SessionRows  # noqa: E402
+
+
+class ListView:
+    """The parts of the RecycleView SessionRows uses, counting how often the data is replaced."""
+
+    def __init__(self):
+        self._data = []
+        self.height = 800
+        self.assignments = 0
+
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self.assignments += 1
+
+
+def make_rows(names=()):
+    built = []
+
+    def build_row(name):
+        built.append(name)
+        return {'session_name': name}
+
+    rows = SessionRows(ListView(), build_row)
+    if names:
+        rows.show(names)
+    rows.view.assignments = 0
+    built.clear()
+    return rows, built
+
+
+def shown(rows):
+    return [row['session_name'] for row in rows.view.data]
+
+
+def test_show_into_an_empty_list_builds_every_row():
+    rows, built = make_rows()
+    rows.show(['A', 'B', 'C'])
+    assert shown(rows) == ['A', 'B', 'C']
+    assert built == ['A', 'B', 'C']
+
+
+def test_pure_reorder_reuses_every_row():
+    rows, built = make_rows(['A', 'B', 'C'])
+    before = {row['session_name']: row for row in rows.view.data}
+    rows.show(['C', 'A', 'B'])
+    assert shown(rows) == ['C', 'A', 'B']
+    assert built == []
+    assert all(row is before[row['session_name']] for row in rows.view.data)
+
+
+def test_insert_builds_only_the_new_row():
+    rows, built = make_rows(['A', 'C'])
+    rows.show(['A', 'B', 'C'])
+    assert shown(rows) == ['A', 'B', 'C']
+    assert built == ['B']
+
+
+def test_remove_drops_the_cached_row():
+    rows, built = make_rows(['A', 'B', 'C'])
+    rows.show(['A', 'C'])
+    assert shown(rows) == ['A', 'C']
+    assert 'B' not in rows.rows
+    assert rows.index_of('C') == 1
+
+
+def test_unchanged_order_leaves_the_data_alone():
+    rows, built = make_rows(['A', 'B'])
+    rows.show(['A', 'B'])
+    assert rows.view.assignments == 0
+
+
+def test_hide_keeps_the_cached_row_up_to_date():
+    labels = {'A': 'old', 'B': 'old'}
+    rows = SessionRows(ListView(), lambda name: {'session_name': name, 'label': labels[name]})
+    rows.show(['A', 'B'])
+    row = rows.rows['A']
+    labels['A'] = 'new'
+    assert rows.hide('A')
+    assert shown(rows) == ['B']
+    rows.show_subset(['A', 'B'])
+    assert rows.view.data[0] is row
+    assert row['label'] == 'new'
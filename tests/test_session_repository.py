@@ -0,0 +1,23 @@
+from session_repository import SessionRepository
+
+
+def test_upsert_without_history_drops_the_replaced_practices(tmp_path):
+    repository = SessionRepository(str(tmp_path / 'sessions.db'))
+    repository.upsert('Scales', {'last_practiced': '2026-10-01', 'practice_count': 2,
+                                 'history': [739890, 739891], 'durations': [600, 300]})
+    repository.upsert('Scales', {'last_practiced': None, 'practice_count': 0})
+    repository.flush()
+
+    assert 'history' not in repository.load()['Scales']
+    assert repository.count_day(739891, 'Scales') == 0
+
+
+def test_upsert_with_history_replaces_the_practices(tmp_path):
+    repository = SessionRepository(str(tmp_path / 'sessions.db'))
+    repository.upsert('Scales', {'practice_count': 2, 'history': [739890, 739891], 'durations': [600, 300]})
+    repository.upsert('Scales', {'practice_count': 1, 'history': [739895], 'durations': [120]})
+    repository.flush()
+
+    session = repository.load()['Scales']
+    assert session['history'] == [739895]
+    assert session['durations'] == [120]
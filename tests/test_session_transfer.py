@@ -0,0 +1,21 @@
+import os
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+from session_transfer import read_sessions  # noqa: E402
+
+
+def test_out_of_range_counts_and_types_are_rejected(tmp_path):
+    path = tmp_path / 'sessions.csv'
+    path.write_text('name,practice_count,session_type\n'
+                    'Scales,3,1\n'
+                    'Negative,-1,0\n'
+                    'No color,2,4\n'
+                    'Below colors,2,-1\n'
+                    'Arpeggios,0,3\n', encoding='utf-8')
+
+    chunks = list(read_sessions(str(path)))
+    sessions = [session for chunk, rejected in chunks for session in chunk]
+    assert [session.name for session in sessions] == ['Scales', 'Arpeggios']
+    assert sum(rejected for chunk, rejected in chunks) == 3
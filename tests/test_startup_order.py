@@ -0,0 +1,41 @@
+import pytest
+from kivy.storage.jsonstore import JsonStore
+
+from session_library import SessionLibrary
+
+BACKENDS = ["json", "journal", "sqlite", "binary", "paged"]
+
+
+def open_library(backend):
+    library = SessionLibrary(JsonStore('sessions_data.json'), 'sqlite' if backend == 'paged' else backend,
+                             paged=backend == 'paged')
+    library.load()
+    return library
+
+
+def close_library(library):
+    library.persistence.flush(wait=True)
+    close = getattr(library.persistence, 'close', None)
+    if close is not None:
+        close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_saved_sort_mode_survives_a_restart(backend, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # The journal and SQLite backends use paths relative to the app directory
+    library = open_library(backend)
+    for number in range(50):
+        library.add(f"S{number:03d}", practice_count=(number * 37) % 50)
+    sorted_names = list(library.ordering('practice_count'))
+    assert sorted_names[:5] != [f"S{number:03d}" for number in range(5)]
+
+    # What MainApp does when a sort is picked: the list shows the ordering, then the library saves it
+    library.display_order = lambda: sorted_names
+    library.sort_changed()
+    close_library(library)
+
+    library = open_library(backend)
+    try:
+        assert list(library.startup_order('practice_count')) == sorted_names
+    finally:
+        close_library(library)
@@ -0,0 +1,211 @@
+"""Practice timer dialog: times a session's practice, with a metronome, and logs the duration on stop.
+
+The elapsed time is read from the timer each time the label is redrawn, twice a second and only
+while the dialog is open, so the display never accumulates rounding. The metronome keeps its
+beat grid on its own thread, but clicks are played on the UI thread through the Clock: Kivy
+sounds set properties and dispatch events (and drive a Java MediaPlayer on Android), which is
+not safe from another thread. A click can so land up to a frame after its beat, without pushing
+the next one back, and clicks still waiting half a beat late are dropped instead of being played
+in a burst after a stalled frame.
+"""
+import os
+import time
+from collections import deque
+
+from kivy.animation import Animation
+from kivy.clock import Clock
+from kivy.core.audio import SoundLoader
+from kivy.uix.boxlayout import BoxLayout
+from kivymd.uix.button import MDFlatButton, MDIconButton, MDRaisedButton
+from kivymd.uix.dialog import MDDialog
+from kivymd.uix.label import MDIcon, MDLabel
+
+from item_popup import reopen
+from practice_timer import Metronome, format_elapsed, write_click
+
+CLICK_FILE = 'metronome_click.wav'
+BPM_STEP = 5
+
+
+class TimerPopup:
+
+    def __init__(self, callback, bpm=60):
+        """A dialog timing one session's practice; callback(action, timer) reports starts, pauses and the stop."""
+        self.callback = callback
+        self.timer = None  # PracticeTimer shown; None once stopped
+        self.metronome = Metronome(self.on_beat, bpm)
+        self.resume_metronome = False  # The metronome was playing when the app was paused
+        self.click = None  # Sound played on each beat; the beat is only shown when no audio provider loads it
+        self.lateness = deque(maxlen=64)  # Seconds recent clicks were played after their beat
+        self.dropped = 0  # Clicks dropped because the UI thread reached them more than half a beat late
+        self.dialog = None
+        self._refresh_event = None
+
+    def create_popup(self):
+        if not self.dialog:
+            title_label = MDLabel(
+                size_hint=(1, None),
+                height="40dp",
+                halign="center",
+                font_style="H6"
+            )
+            elapsed_label = MDLabel(
+                size_hint=(1, None),
+                height="72dp",
+                halign="center",
+                font_style="H3"
+            )
+            start_button = MDRaisedButton(
+                size_hint=(1, None),
+                height="48dp",
+                on_release=lambda x: self.toggle_timer()
+            )
+
+            # Metronome: tempo down, beat indicator and tempo, tempo up, on/off
+            beat_icon = MDIcon(icon="circle", theme_text_color="Primary", opacity=0.2,
+                               size_hint=(None, None), size=("24dp", "48dp"))
+            bpm_label = MDLabel(halign="center", size_hint=(1, None), height="48dp")
+            metronome_button = MDIconButton(icon="metronome", on_release=lambda x: self.toggle_metronome())
+            metronome_layout = BoxLayout(
+                orientation='horizontal',
+                size_hint=(1, None),
+                height="48dp"
+            )
+            metronome_layout.add_widget(MDIconButton(icon="minus", on_release=lambda x: self.change_bpm(-BPM_STEP)))
+            metronome_layout.add_widget(beat_icon)
+            metronome_layout.add_widget(bpm_label)
+            metronome_layout.add_widget(MDIconButton(icon="plus", on_release=lambda x: self.change_bpm(BPM_STEP)))
+            metronome_layout.add_widget(metronome_button)
+
+            layout = BoxLayout(
+                orientation='vertical',
+                size_hint=(1, None),
+                spacing=10,
+                height="238dp"
+            )
+            layout.add_widget(title_label)
+            layout.add_widget(elapsed_label)
+            layout.add_widget(start_button)
+            layout.add_widget(metronome_layout)
+
+            self.dialog = MDDialog(
+                type="custom",
+                content_cls=layout,
+                size_hint=(None, None),
+                width='300dp',
+                auto_dismiss=False,  # Only DISCARD or STOP & SAVE end the practice
+                buttons=[
+                    MDFlatButton(text="DISCARD", on_release=lambda x: self.stop(save=False)),
+                    MDFlatButton(text="STOP & SAVE", on_release=lambda x: self.stop(save=True)),
+                ],
+            )
+            self.title_label = title_label
+            self.elapsed_label = elapsed_label
+            self.start_button = start_button
+            self.beat_icon = beat_icon
+            self.bpm_label = bpm_label
+            self.metronome_button = metronome_button
+            self.refresh()
+            self.dialog.update_height()  # The dialog sizes itself to its content once
+        return self.dialog
+
+    def open(self, timer):
+        """Show a timer (started already, or restored paused); the label refreshes only while open."""
+        self.timer = timer
+        reopen(self.create_popup())
+        self.refresh()
+        if self._refresh_event is None:
+            self._refresh_event = Clock.schedule_interval(self.refresh_elapsed, 0.5)
+
+    def refresh(self):
+        self.title_label.text = self.timer.session_name
+        self.start_button.text = "Pause" if self.timer.running else "Resume"
+        self.bpm_label.text = f"{self.metronome.bpm} BPM"
+        self.metronome_button.theme_icon_color = "Custom" if self.metronome.running else "Hint"
+        self.metronome_button.icon_color = self.dialog.theme_cls.primary_color
+        self.refresh_elapsed()
+
+    def refresh_elapsed(self, *args):
+        self.elapsed_label.text = format_elapsed(self.timer.elapsed())
+
+    def toggle_timer(self):
+        if self.timer.running:
+            self.timer.pause()
+        else:
+            self.timer.start()
+        self.refresh()
+        self.callback("Timer Changed", self.timer)
+
+    def toggle_metronome(self):
+        if self.metronome.running:
+            self.stop_metronome()
+        else:
+            if self.click is None:
+                self.click = self.load_click()
+            self.metronome.start()
+        self.refresh()
+
+    def change_bpm(self, step):
+        self.metronome.set_bpm(self.metronome.bpm + step)
+        self.refresh()
+        self.callback("Set BPM", self.timer)
+
+    def stop(self, save):
+        """Stop the timer and the metronome; the callback logs the practice when saved."""
+        self.stop_metronome()
+        self.timer.pause()
+        if self._refresh_event is not None:
+            self._refresh_event.cancel()
+            self._refresh_event = None
+        self.dialog.dismiss()
+        timer, self.timer = self.timer, None
+        self.callback("Save Practice" if save else "Discard Practice", timer)
+
+    def stop_metronome(self):
+        if self.metronome.running:
+            self.metronome.stop()
+            mean, worst = self.metronome.jitter()
+            heard = [late * 1000 for late in self.lateness] or [0.0]
+            print(f"MusApp- Metronome: {self.metronome.beats} beat(s), {self.metronome.skipped} skipped, "
+                  f"lateness {mean:.1f} ms mean, {worst:.1f} ms worst; clicks {sum(heard) / len(heard):.1f} ms "
+                  f"mean, {max(heard):.1f} ms worst, {self.dropped} dropped.")
+
+    def pause(self):
+        """Stop the metronome thread while the app is suspended (the timer keeps counting)."""
+        self.resume_metronome = self.metronome.running
+        self.stop_metronome()
+
+    def resume(self):
+        if self.resume_metronome and self.timer is not None:
+            self.metronome.start()
+        self.resume_metronome = False
+
+    def on_beat(self, beat, deadline):
+        """Hand a beat from the metronome thread to the UI thread, where the click is played."""
+        Clock.schedule_once(lambda dt: self.play_beat(deadline))
+
+    def play_beat(self, deadline):
+        """Play the click and flash the indicator, unless the beat is stale or the metronome stopped meanwhile."""
+        if not self.metronome.running:
+            return
+        late = time.monotonic() - deadline
+        if late > 30.0 / self.metronome.bpm:  # Half a beat
+            self.dropped += 1
+            return
+        if self.click:
+            if self.click.state == 'play':
+                self.click.stop()
+            self.click.play()
+        self.lateness.append(late)
+        Animation.cancel_all(self.beat_icon, 'opacity')
+        self.beat_icon.opacity = 1
+        Animation(opacity=0.2, duration=0.15).start(self.beat_icon)
+
+    def load_click(self):
+        if not os.path.exists(CLICK_FILE):
+            write_click(CLICK_FILE)
+        sound = SoundLoader.load(CLICK_FILE)
+        if sound is None:
+            print("MusApp- No audio provider for the metronome click; beats are shown only.")
+            return False  # Not None, so loading is not tried on every start
+        return sound